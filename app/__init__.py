@@ -2,32 +2,47 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
+from sqlalchemy import event
 import os
 
 # Инициализация расширений
 db = SQLAlchemy()
 login_manager = LoginManager()
-migrate = Migrate()
+# Каталог миграций - в корне проекта, независимо от текущей директории
+migrate = Migrate(directory=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations'))
 
-def create_app():
-    app = Flask(__name__)
+def apply_sqlite_pragmas(engine, pragmas):
+    """Выполнять PRAGMA при каждом новом соединении с SQLite"""
+    if not pragmas:
+        return
     
-    # Конфигурация
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+def create_app(config_class=None):
+    if config_class is None:
+        from config import Config as config_class
     
-    # База данных
-    database_url = os.environ.get('DATABASE_URL')
-    if database_url and database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    app = Flask(__name__)
     
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url or 'sqlite:///time_tracker.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Конфигурация
+    app.config.from_object(config_class)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          config_class.engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
     
     # Инициализация расширений
     db.init_app(app)
     login_manager.init_app(app)
     migrate.init_app(app, db)
     
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        with app.app_context():
+            apply_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS') or {})
+    
     # Настройка Flask-Login
     login_manager.login_view = 'auth.login'
     login_manager.login_message_category = 'info'
@@ -40,18 +55,20 @@ def create_app():
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp)
     
-    # Создание таблиц при первом запуске
-    with app.app_context():
-        from app import models
-        db.create_all()
-        
-        # Создаем администратора по умолчанию (для демонстрации)
-        from app.models import User
-        if not User.query.filter_by(username='admin').first():
-            admin = User(username='admin', telegram_id='000000')
-            admin.set_password('admin123')
-            db.session.add(admin)
-            db.session.commit()
-            print("✅ Created default admin user")
+    # Инструментирование запросов и SQL
+    from app.metrics import init_metrics
+    init_metrics(app)
+    
+    # Лимиты запросов API бота и сброс нагрузки
+    from app.ratelimit import init_rate_limits
+    init_rate_limits(app)
+    
+    # CLI-команды (flask rebuild-rollups и др.)
+    from app.commands import register_commands
+    register_commands(app)
+    
+    # Модели регистрируются в метаданных (для миграций и CLI);
+    # схема и администратор создаются командами flask init-db / flask seed-admin
+    from app import models
     
     return app
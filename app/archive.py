@@ -0,0 +1,71 @@
+from datetime import datetime
+from sqlalchemy import select, insert, delete, func, text
+from app import db
+from app.models import Event, ArchivedEvent, archive_cutoff
+from app.cache import mark_changed
+
+ARCHIVE_COLUMNS = ('id', 'user_id', 'category_id', 'start_time', 'end_time', 'type', 'created_at', 'source')
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+def next_month(moment):
+    return datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+def ensure_partitions(connection, first, last):
+    """Месячные секции events_archive на PostgreSQL для [first, last)"""
+    month = month_start(first)
+    while month < last:
+        following = next_month(month)
+        connection.execute(text(
+            f'CREATE TABLE IF NOT EXISTS events_archive_{month:%Y_%m} PARTITION OF events_archive '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')"
+        ))
+        month = following
+
+def archive_events(user_id=None, batch_size=5000, dry_run=False, cutoff=None, progress=None):
+    """Перенос событий старше archive_cutoff() из events в events_archive.
+
+    Пачки по batch_size: INSERT ... SELECT и DELETE по тем же id в одной
+    транзакции. Агрегаты daily_rollups и ключи идемпотентности не меняются
+    (событие остается учтенным, повтор пакета бота не создаст дубликат).
+    progress(moved) вызывается после каждой пачки.
+    Возвращает число перенесенных (при dry_run - подлежащих переносу) событий.
+    """
+    cutoff = cutoff or archive_cutoff()
+    conditions = [Event.start_time < cutoff]
+    if user_id is not None:
+        conditions.append(Event.user_id == user_id)
+
+    if dry_run:
+        return db.session.query(func.count(Event.id)).filter(*conditions).scalar()
+
+    if db.engine.dialect.name == 'postgresql':
+        first = db.session.query(func.min(Event.start_time)).filter(*conditions).scalar()
+        if first is not None:
+            ensure_partitions(db.session.connection(), first, cutoff)
+            db.session.commit()
+
+    moved = 0
+    while True:
+        batch = db.session.execute(
+            select(Event.id, Event.user_id).where(*conditions).order_by(Event.id).limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        event_ids = [event_id for event_id, _ in batch]
+
+        columns = [getattr(Event, name) for name in ARCHIVE_COLUMNS]
+        db.session.execute(
+            insert(ArchivedEvent).from_select(list(ARCHIVE_COLUMNS), select(*columns).where(Event.id.in_(event_ids)))
+        )
+        db.session.execute(delete(Event).where(Event.id.in_(event_ids)))
+        for affected_user in {user for _, user in batch}:
+            mark_changed(db.session, affected_user, 'events')
+        db.session.commit()
+
+        moved += len(event_ids)
+        if progress:
+            progress(moved)
+
+    return moved
@@ -1,7 +1,14 @@
-from flask_login import LoginManager
+from flask_login import LoginManager, UserMixin
 from functools import wraps
-from flask import redirect, url_for, flash, request
+from collections import namedtuple
+from flask import redirect, url_for, flash, request, session
 from flask_login import current_user
+from sqlalchemy import event, inspect as db_inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.cache import TTLCache
+from app.models import User
+import time
 
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
@@ -18,6 +25,58 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Снимок пользователя для API бота: без загрузки полной ORM-модели
+TelegramIdentity = namedtuple('TelegramIdentity', ['id', 'username', 'telegram_id'])
+
+# telegram_id -> TelegramIdentity или NOT_REGISTERED (промахи кэшируются коротко,
+# чтобы незарегистрированные пользователи, повторяющие /start, не нагружали БД)
+identity_cache = TTLCache(ttl=300, maxsize=10000, name='telegram_identity')
+NOT_REGISTERED = object()
+NEGATIVE_TTL = 15
+
+def resolve_telegram_identity(telegram_id):
+    """Найти пользователя по telegram_id (через кэш). None - не зарегистрирован"""
+    telegram_id = str(telegram_id)
+    identity = identity_cache.get(telegram_id)
+    if identity is None:
+        row = User.query.with_entities(User.id, User.username, User.telegram_id) \
+            .filter_by(telegram_id=telegram_id).first()
+        if row:
+            identity = TelegramIdentity(*row)
+            identity_cache.set(telegram_id, identity)
+        else:
+            identity = NOT_REGISTERED
+            identity_cache.set(telegram_id, identity, ttl=NEGATIVE_TTL)
+    return None if identity is NOT_REGISTERED else identity
+
+# Старый telegram_id нужен для инвалидации, даже если атрибут не был загружен
+event.listen(User.telegram_id, 'set', lambda *args: None, active_history=True)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_telegram_ids(session, flush_context):
+    """Запомнить старые и новые telegram_id измененных пользователей"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if getattr(obj, '__tablename__', None) != 'users':
+            continue
+        session.info.setdefault('user_ids', set()).add(obj.id)
+        history = db_inspect(obj).attrs.telegram_id.history
+        ids = session.info.setdefault('telegram_ids', set())
+        ids.update(str(value) for value in
+                   list(history.deleted) + list(history.added) + list(history.unchanged)
+                   if value)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_telegram_ids(session):
+    for telegram_id in session.info.pop('telegram_ids', ()):
+        identity_cache.invalidate(telegram_id)
+    for user_id in session.info.pop('user_ids', ()):
+        session_user_cache.invalidate(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_telegram_ids(session):
+    session.info.pop('telegram_ids', None)
+    session.info.pop('user_ids', None)
+
 def telegram_auth_required(f):
     """Декоратор для проверки Telegram аутентификации (для API)"""
     @wraps(f)
@@ -27,13 +86,71 @@ def telegram_auth_required(f):
         if not telegram_id:
             return {'error': 'Telegram ID required'}, 401
         
-        from app.models import User
-        user = User.query.filter_by(telegram_id=telegram_id).first()
+        user = resolve_telegram_identity(telegram_id)
         
         if not user:
             return {'error': 'User not found. Please register first via web.'}, 404
         
-        # Привязываем пользователя к запросу
+        # Привязываем пользователя к запросу (снимок id/username/telegram_id)
         request.current_user = user
         return f(*args, **kwargs)
     return decorated_function
+
+class SessionUser(UserMixin):
+    """Легкий current_user: id, username и telegram_id без запроса к БД.
+
+    Полная модель User загружается лениво при обращении к любому другому
+    атрибуту (created_at, categories и т.д.).
+    """
+    
+    def __init__(self, id, username, telegram_id):
+        self.id = id
+        self.username = username
+        self.telegram_id = telegram_id
+        self._user = None
+    
+    @property
+    def user(self):
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+# user_id -> (username, telegram_id); сбрасывается при изменении пользователя
+session_user_cache = TTLCache(ttl=300, maxsize=10000, name='session_users')
+
+# Снимок в cookie-сессии перепроверяется по БД не чаще этого интервала (сек)
+SESSION_IDENTITY_MAX_AGE = 300
+
+def remember_identity(user):
+    """Сохранить снимок пользователя в сессии (вызывается при входе)"""
+    session['identity'] = [user.id, user.username, user.telegram_id, int(time.time())]
+    session_user_cache.set(user.id, (user.username, user.telegram_id))
+
+def forget_identity():
+    session.pop('identity', None)
+
+def load_session_user(user_id):
+    """user_loader: кэш процесса -> снимок в сессии -> один запрос по колонкам"""
+    user_id = int(user_id)
+    
+    cached = session_user_cache.get(user_id)
+    if cached is not None:
+        return SessionUser(user_id, *cached)
+    
+    snapshot = session.get('identity')
+    if snapshot and snapshot[0] == user_id and time.time() - snapshot[3] < SESSION_IDENTITY_MAX_AGE:
+        session_user_cache.set(user_id, (snapshot[1], snapshot[2]))
+        return SessionUser(user_id, snapshot[1], snapshot[2])
+    
+    row = User.query.with_entities(User.id, User.username, User.telegram_id) \
+        .filter_by(id=user_id).first()
+    if not row:
+        return None
+    
+    remember_identity(row)
+    return SessionUser(*row)
@@ -0,0 +1,49 @@
+from datetime import timezone
+from sqlalchemy import insert
+from app import db
+from app.models import Category, Event
+from app.cache import mark_changed
+from app.rollups import new_deltas, add_event_delta, apply_deltas
+
+def naive_utc(moment):
+    """Время для БД (без пояса): время с поясом переводится в UTC, без пояса - как есть"""
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def owned_category_ids(user_id, category_ids):
+    """Какие из category_ids принадлежат пользователю (один запрос IN)"""
+    category_ids = {cid for cid in category_ids if cid is not None}
+    if not category_ids:
+        return set()
+    return {cid for (cid,) in db.session.query(Category.id).filter(
+        Category.user_id == user_id,
+        Category.id.in_(category_ids)
+    )}
+
+def bulk_insert_events(user_id, rows):
+    """Вставка событий одним executemany в текущей транзакции.
+
+    rows - словари с полями Event (category_id, type, start_time, end_time, source).
+    Агрегаты и кэши обновляются здесь же, т.к. bulk insert обходит события ORM.
+    Возвращает список id в порядке rows. Коммит делает вызывающий код.
+    """
+    if not rows:
+        return []
+
+    for row in rows:
+        row['user_id'] = user_id
+
+    result = db.session.execute(
+        insert(Event).returning(Event.id, sort_by_parameter_order=True),
+        rows
+    )
+    event_ids = [event_id for (event_id,) in result]
+
+    deltas = new_deltas()
+    for row in rows:
+        add_event_delta(deltas, row, 1)
+    apply_deltas(db.session.connection(), deltas)
+    mark_changed(db.session, user_id, 'events')
+
+    return event_ids
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from threading import Lock
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Все именованные кэши процесса (для метрик)
+CACHES = {}
+
+class TTLCache:
+    """Потокобезопасный кэш в памяти процесса с TTL и вытеснением LRU"""
+
+    def __init__(self, ttl=60, maxsize=10000, name=None):
+        if name:
+            CACHES[name] = self
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Счетчики попаданий/промахов и размер"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+# Отслеживание изменений пользовательских данных.
+# После коммита слушатели получают user_id и множество изменённых таблиц.
+_change_listeners = []
+TRACKED_TABLES = ('events', 'categories', 'templates', 'category_codes')
+
+def on_user_data_changed(f):
+    """Регистрирует слушателя f(user_id, tables), вызываемого после коммита"""
+    _change_listeners.append(f)
+    return f
+
+def mark_changed(session, user_id, table):
+    """Отметить изменение, сделанное в обход ORM (bulk insert/update)"""
+    session.info.setdefault('changed_users', {}).setdefault(user_id, set()).add(table)
+
+def notify_changed(user_id, tables):
+    for listener in _change_listeners:
+        listener(user_id, tables)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table in TRACKED_TABLES and getattr(obj, 'user_id', None) is not None:
+            mark_changed(session, obj.user_id, table)
+    for obj in session.deleted:
+        if getattr(obj, '__tablename__', None) == 'users':
+            session.info.setdefault('deleted_users', set()).add(obj.id)
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_changes(session):
+    session.info.pop('deleted_users', None)
+    changed = session.info.pop('changed_users', None)
+    if changed:
+        for user_id, tables in changed.items():
+            notify_changed(user_id, tables)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('changed_users', None)
+    session.info.pop('deleted_users', None)
@@ -0,0 +1,139 @@
+import os
+import click
+from flask.cli import with_appcontext
+
+DEFAULT_ADMIN_USERNAME = 'admin'
+DEFAULT_ADMIN_TELEGRAM_ID = '000000'
+
+# Ревизия, соответствующая схеме, которую раньше создавал db.create_all()
+INITIAL_REVISION = '0001'
+
+def init_db():
+    """Применить миграции (migrations/) до последней ревизии.
+
+    База, созданная до появления миграций (есть таблицы, нет alembic_version),
+    сначала помечается начальной ревизией.
+    """
+    from flask_migrate import upgrade, stamp
+    from sqlalchemy import inspect
+    from app import db
+    
+    tables = inspect(db.engine).get_table_names()
+    if tables and 'alembic_version' not in tables:
+        stamp(revision=INITIAL_REVISION)
+    upgrade()
+
+def seed_admin(username=DEFAULT_ADMIN_USERNAME, password=None, telegram_id=DEFAULT_ADMIN_TELEGRAM_ID):
+    """Создать администратора по умолчанию (для демонстрации), если его еще нет.
+
+    Возвращает True, если пользователь создан. Параллельный запуск безопасен:
+    гонка за уникальный Telegram ID завершается откатом.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from app import db
+    from app.models import User
+    
+    if db.session.query(User.id).filter_by(username=username).first():
+        return False
+    
+    admin = User(username=username, telegram_id=telegram_id)
+    admin.set_password(password or os.environ.get('ADMIN_PASSWORD', 'admin123'))
+    db.session.add(admin)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+@click.command('init-db')
+@click.option('--seed/--no-seed', default=True, show_default=True, help='Создать администратора по умолчанию')
+@with_appcontext
+def init_db_command(seed):
+    """Применить миграции схемы БД (один раз при развертывании, а не при старте воркера)"""
+    init_db()
+    click.echo('✅ Database schema is up to date')
+    if seed and seed_admin():
+        click.echo('✅ Created default admin user')
+
+@click.command('seed-admin')
+@click.option('--username', default=DEFAULT_ADMIN_USERNAME, show_default=True)
+@click.option('--password', default=None, help='По умолчанию $ADMIN_PASSWORD или admin123')
+@click.option('--telegram-id', default=DEFAULT_ADMIN_TELEGRAM_ID, show_default=True)
+@with_appcontext
+def seed_admin_command(username, password, telegram_id):
+    """Создать администратора, если его еще нет"""
+    if seed_admin(username, password, telegram_id):
+        click.echo(f'✅ Created admin user {username}')
+    else:
+        click.echo(f'User {username} already exists (or Telegram ID {telegram_id} is taken)')
+
+@click.command('rebuild-rollups')
+@click.option('--user-id', type=int, default=None, help='Пересчитать только одного пользователя')
+@with_appcontext
+def rebuild_rollups_command(user_id):
+    """Пересчитать таблицу daily_rollups по существующим событиям"""
+    from app.rollups import rebuild_rollups
+    
+    rows = rebuild_rollups(user_id)
+    click.echo(f'✅ Rebuilt daily rollups: {rows} rows')
+
+@click.command('import-events')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'username', required=True, help='Имя пользователя')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ics']), default=None,
+              help='Формат файла (по умолчанию - по расширению)')
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='Событий в одной транзакции')
+@with_appcontext
+def import_events_command(path, username, fmt, chunk_size):
+    """Импорт событий из CSV или iCalendar"""
+    from app.models import User
+    from app.importer import import_events, detect_format
+    
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f'User not found: {username}')
+    
+    fmt = fmt or detect_format(path)
+    if not fmt:
+        raise click.ClickException('Cannot detect file format, use --format')
+    
+    def progress(imported, errors):
+        click.echo(f'  imported {imported}, errors {errors}')
+    
+    result = import_events(user.id, path, fmt, chunk_size=chunk_size, progress=progress)
+    
+    for error in result['error_report']:
+        click.echo(f'  line {error["line"]}: {error["error"]}', err=True)
+    click.echo(f'✅ Imported {result["imported"]} events '
+               f'({result["categories_created"]} new categories, {result["errors"]} errors)')
+
+@click.command('archive-events')
+@click.option('--user-id', type=int, default=None, help='Архивировать только одного пользователя')
+@click.option('--batch-size', type=int, default=5000, show_default=True, help='Событий в одной транзакции')
+@click.option('--dry-run', is_flag=True, help='Только посчитать события для переноса')
+@with_appcontext
+def archive_events_command(user_id, batch_size, dry_run):
+    """Перенести события старше EVENTS_HOT_MONTHS месяцев в events_archive"""
+    from app.models import archive_cutoff
+    from app.archive import archive_events
+    
+    cutoff = archive_cutoff()
+    if dry_run:
+        count = archive_events(user_id, dry_run=True, cutoff=cutoff)
+        click.echo(f'{count} events before {cutoff:%Y-%m-%d} would be archived')
+        return
+    
+    def progress(moved):
+        click.echo(f'  archived {moved}')
+    
+    moved = archive_events(user_id, batch_size=batch_size, cutoff=cutoff, progress=progress)
+    click.echo(f'✅ Archived {moved} events before {cutoff:%Y-%m-%d}')
+
+def register_commands(app):
+    """Регистрация CLI-команд приложения"""
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_admin_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(import_events_command)
+    app.cli.add_command(archive_events_command)
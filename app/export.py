@@ -0,0 +1,103 @@
+import csv
+import io
+from datetime import datetime
+from app import db
+from app.models import Category, select_events
+
+CSV_COLUMNS = ['id', 'category', 'type', 'start_time', 'end_time', 'duration_minutes', 'source', 'created_at']
+
+# Сколько строк кодируется в один кусок ответа
+CHUNK_ROWS = 500
+
+def export_rows(user_id, start=None, end=None):
+    """Строки событий пользователя (включая архив) через серверный курсор.
+
+    Выбираются только колонки (без ORM-объектов и identity map), категории
+    загружаются заранее одним запросом.
+    """
+    categories = dict(db.session.query(Category.id, Category.name).filter(Category.user_id == user_id))
+
+    query = select_events(
+        user_id, ('id', 'category_id', 'type', 'start_time', 'end_time', 'source', 'created_at'),
+        start, where=lambda model: [model.start_time <= end] if end else []
+    )
+    query = query.order_by(query.selected_columns.start_time, query.selected_columns.id)
+
+    try:
+        for row in db.session.execute(query.execution_options(yield_per=1000)):
+            yield row, categories.get(row.category_id, '')
+    finally:
+        db.session.close()
+
+def generate_csv(user_id, start=None, end=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+
+    for count, (row, category) in enumerate(export_rows(user_id, start, end), 1):
+        writer.writerow([
+            row.id,
+            category,
+            row.type,
+            row.start_time.isoformat(),
+            row.end_time.isoformat(),
+            int((row.end_time - row.start_time).total_seconds() / 60),
+            row.source or '',
+            row.created_at.isoformat() if row.created_at else ''
+        ])
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+def ics_escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def ics_time(moment):
+    # Время в БД хранится в UTC
+    return moment.strftime('%Y%m%dT%H%M%SZ')
+
+def ics_fold(line):
+    """Перенос строк длиннее 75 октетов (RFC 5545, 3.1)"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        # Не разрезаем многобайтовый символ UTF-8
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+def generate_ics(user_id, start=None, end=None):
+    stamp = ics_time(datetime.utcnow())
+    yield ('BEGIN:VCALENDAR\r\n'
+           'VERSION:2.0\r\n'
+           'PRODID:-//Time Tracker//Export//RU\r\n'
+           'CALSCALE:GREGORIAN\r\n')
+
+    chunk = []
+    for count, (row, category) in enumerate(export_rows(user_id, start, end), 1):
+        kind = 'План' if row.type == 'plan' else 'Факт'
+        chunk.append(
+            'BEGIN:VEVENT\r\n'
+            f'UID:event-{row.id}@time-tracker\r\n'
+            f'DTSTAMP:{stamp}\r\n'
+            f'DTSTART:{ics_time(row.start_time)}\r\n'
+            f'DTEND:{ics_time(row.end_time)}\r\n'
+            + ics_fold(f'SUMMARY:{ics_escape(category)} ({kind})')
+            + ics_fold(f'CATEGORIES:{ics_escape(category)}')
+            + 'END:VEVENT\r\n'
+        )
+        if count % CHUNK_ROWS == 0:
+            yield ''.join(chunk)
+            chunk = []
+
+    chunk.append('END:VCALENDAR\r\n')
+    yield ''.join(chunk)
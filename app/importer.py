@@ -0,0 +1,232 @@
+import csv
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import insert
+from app import db
+from app.models import Category
+from app.cache import mark_changed
+from app.bulk import bulk_insert_events, naive_utc
+
+IMPORT_FORMATS = ('csv', 'ics')
+MAX_REPORTED_ERRORS = 1000
+
+EVENT_TYPES = {'plan': 'plan', 'fact': 'fact', 'план': 'plan', 'факт': 'fact'}
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in IMPORT_FORMATS else None
+
+def open_text(path):
+    return open(path, encoding='utf-8-sig', newline='')
+
+def iter_csv(path):
+    """(номер строки, запись) из CSV с заголовком (формат как у экспорта)"""
+    with open_text(path) as stream:
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+
+def ics_lines(stream):
+    """Строки iCalendar с учетом переносов (RFC 5545, 3.1)"""
+    current, current_no = None, 0
+    for line_no, line in enumerate(stream, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current_no, current
+        current, current_no = line, line_no
+    if current is not None:
+        yield current_no, current
+
+def ics_unescape(text):
+    return text.replace('\\n', '\n').replace('\\N', '\n').replace('\\,', ',') \
+        .replace('\\;', ';').replace('\\\\', '\\')
+
+# Длительность по RFC 5545, 3.3.6: P1W, P1D, PT1H30M, P1DT2H...
+ICS_DURATION = re.compile(r'^\+?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+def parse_ics_time(value, params=None):
+    """DATE-TIME/DATE из iCalendar: с Z или TZID - время с поясом, иначе "плавающее" как есть"""
+    tzid = (params or {}).get('TZID')
+    if value.endswith('Z'):
+        tz = timezone.utc
+    elif tzid:
+        try:
+            tz = ZoneInfo(tzid.strip('"'))
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f'unknown TZID: {tzid}')
+    else:
+        tz = None
+    value = value.rstrip('Z')
+    try:
+        if 'T' in value:
+            moment = datetime.strptime(value[:15], '%Y%m%dT%H%M%S')
+        else:
+            moment = datetime.strptime(value[:8], '%Y%m%d')
+    except ValueError:
+        raise ValueError(f'invalid date-time: {value}')
+    return moment.replace(tzinfo=tz) if tz else moment
+
+def parse_ics_duration(value):
+    match = ICS_DURATION.match(value.strip())
+    if not match or not any(match.groups()):
+        raise ValueError(f'invalid DURATION: {value}')
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+def iter_ics(path):
+    """(номер строки, запись) для каждого VEVENT: имя свойства -> (значение, параметры)"""
+    with open_text(path) as stream:
+        record, start_no = None, 0
+        for line_no, line in ics_lines(stream):
+            if line == 'BEGIN:VEVENT':
+                record, start_no = {}, line_no
+            elif line == 'END:VEVENT' and record is not None:
+                yield start_no, record
+                record = None
+            elif record is not None and ':' in line:
+                name, value = line.split(':', 1)
+                name, *raw_params = name.split(';')
+                params = {key.upper(): param for key, param in
+                          (raw.split('=', 1) for raw in raw_params if '=' in raw)}
+                record[name.upper()] = (ics_unescape(value), params)
+
+def ics_record(record):
+    """VEVENT -> запись в формате CSV"""
+    def text(name):
+        return record[name][0] if name in record else ''
+
+    summary = text('SUMMARY').strip()
+    event_type = 'fact'
+    # Экспорт пишет SUMMARY как "Категория (План)" / "Категория (Факт)"
+    for suffix, kind in ((' (План)', 'plan'), (' (Факт)', 'fact')):
+        if summary.endswith(suffix):
+            summary, event_type = summary[:-len(suffix)], kind
+    category = text('CATEGORIES').split(',')[0].strip() if text('CATEGORIES') else summary
+    if 'DTSTART' not in record:
+        raise ValueError('DTSTART required')
+    start_time = parse_ics_time(*record['DTSTART'])
+    end_time = parse_ics_time(*record['DTEND']) if 'DTEND' in record else None
+    # Без DTEND конец задает DURATION (RFC 5545), DURATION_MINUTES - как в CSV
+    if end_time is None and 'DURATION' in record:
+        end_time = start_time + parse_ics_duration(text('DURATION'))
+    return {
+        'category': category,
+        'type': event_type,
+        'start_time': start_time,
+        'end_time': end_time,
+        'duration_minutes': text('DURATION_MINUTES') or None
+    }
+
+def parse_record(record):
+    """Проверка записи: (категория, row) или ValueError"""
+    category = (record.get('category') or '').strip()[:50]
+    if not category:
+        raise ValueError('category required')
+
+    event_type = EVENT_TYPES.get((record.get('type') or 'fact').strip().lower())
+    if not event_type:
+        raise ValueError("type must be 'plan' or 'fact'")
+
+    start_time, end_time = record.get('start_time'), record.get('end_time')
+    try:
+        if isinstance(start_time, str):
+            start_time = datetime.fromisoformat(start_time.strip())
+        if not isinstance(start_time, datetime):
+            raise ValueError
+        if isinstance(end_time, str) and end_time.strip():
+            end_time = datetime.fromisoformat(end_time.strip())
+        elif not isinstance(end_time, datetime):
+            end_time = start_time + timedelta(minutes=int(record.get('duration_minutes')))
+    except (TypeError, ValueError):
+        raise ValueError('start_time and end_time (or duration_minutes) must be valid')
+
+    # Время с поясом (пояса в файле могут различаться) сравнивается и хранится в UTC
+    start_time, end_time = naive_utc(start_time), naive_utc(end_time)
+    if end_time <= start_time:
+        raise ValueError('end_time must be later than start_time')
+
+    return category, {
+        'type': event_type,
+        'start_time': start_time,
+        'end_time': end_time
+    }
+
+def iter_records(path, fmt):
+    if fmt == 'ics':
+        for line_no, record in iter_ics(path):
+            try:
+                yield line_no, ics_record(record)
+            except ValueError as e:
+                yield line_no, e
+    else:
+        yield from iter_csv(path)
+
+def ensure_categories(user_id, names):
+    """Создать недостающие категории одной вставкой: (name -> id, сколько создано)"""
+    existing = dict(db.session.query(Category.name, Category.id).filter(Category.user_id == user_id))
+    missing = sorted(set(names) - set(existing))
+    if missing:
+        db.session.execute(insert(Category), [{'user_id': user_id, 'name': name} for name in missing])
+        mark_changed(db.session, user_id, 'categories')
+        existing = dict(db.session.query(Category.name, Category.id).filter(Category.user_id == user_id))
+        db.session.commit()
+    return existing, len(missing)
+
+def import_events(user_id, path, fmt, chunk_size=1000, source='import', progress=None):
+    """Потоковый импорт событий из файла.
+
+    Первый проход проверяет записи и создает недостающие категории только
+    для прошедших проверку, второй вставляет события пачками по chunk_size,
+    каждая в своей транзакции. progress(imported, errors) вызывается после
+    каждой пачки. Файл не в UTF-8 дает UnicodeDecodeError до любых записей в БД.
+    """
+    names = set()
+    for _, record in iter_records(path, fmt):
+        if isinstance(record, dict):
+            try:
+                names.add(parse_record(record)[0])
+            except ValueError:
+                pass
+    categories, created = ensure_categories(user_id, names)
+
+    imported, error_count, errors = 0, 0, []
+    chunk = []
+
+    def flush():
+        nonlocal imported
+        if chunk:
+            bulk_insert_events(user_id, chunk)
+            db.session.commit()
+            imported += len(chunk)
+            chunk.clear()
+            if progress:
+                progress(imported, error_count)
+
+    for line_no, record in iter_records(path, fmt):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            category, row = parse_record(record)
+        except ValueError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'line': line_no, 'error': str(e)})
+            continue
+
+        row['category_id'] = categories[category]
+        row['source'] = source
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    return {
+        'imported': imported,
+        'errors': error_count,
+        'error_report': errors,
+        'categories_created': created
+    }
@@ -0,0 +1,94 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from app import db
+from app.models import select_events
+from app.cache import TTLCache
+from app.versions import get_versions
+
+# События длиннее этого срока не учитываются при поиске пересечений:
+# ограничивает просмотр индекса idx_event_user_time назад по времени
+MAX_EVENT_SPAN = timedelta(days=7)
+
+class IntervalIndex:
+    """Интервалы событий одной недели, отсортированные по началу.
+
+    Для каждой позиции хранится максимум концов слева (prefix max), поэтому
+    поиск пересечений - бинарный поиск по началу и проход назад, пока
+    интервалы слева еще могут заканчиваться позже запрошенного начала:
+    O(log n + k) для обычного расписания без вложенных событий.
+    """
+
+    def __init__(self, rows):
+        # rows: [(id, start_time, end_time, type, category_id)]
+        self.items = sorted(rows, key=lambda r: (r[1], r[0]))
+        self.starts = [r[1] for r in self.items]
+        self.max_ends = []
+        running = None
+        for r in self.items:
+            running = r[2] if running is None or r[2] > running else running
+            self.max_ends.append(running)
+
+    def overlapping(self, start, end, event_type=None):
+        """События, пересекающиеся с [start, end), в порядке начала"""
+        found = []
+        i = bisect_left(self.starts, end) - 1
+        while i >= 0 and self.max_ends[i] > start:
+            item = self.items[i]
+            if item[2] > start and (event_type is None or item[3] == event_type):
+                found.append(item)
+            i -= 1
+        found.reverse()
+        return found
+
+def week_start(moment):
+    day = moment.date() - timedelta(days=moment.weekday())
+    return datetime.combine(day, datetime.min.time())
+
+# (user_id, версия событий) -> {начало недели: IntervalIndex}. Запись через
+# любой воркер меняет версию в data_versions, поэтому устаревший индекс живет
+# не дольше TTL кэша версий; свой воркер сбрасывает версию сразу.
+interval_cache = TTLCache(ttl=600, maxsize=2000, name='interval_indexes')
+
+def get_week_index(user_id, week):
+    key = (user_id, get_versions(user_id, ('events',))['events'])
+    weeks = interval_cache.get(key)
+    if weeks is None:
+        weeks = {}
+        interval_cache.set(key, weeks)
+
+    index = weeks.get(week)
+    if index is None:
+        week_end = week + timedelta(days=7)
+        # Диапазон по (user_id, start_time) - индекс idx_event_user_time
+        # (для прошлых недель до границы архива - и по архиву)
+        rows = db.session.execute(select_events(
+            user_id, ('id', 'start_time', 'end_time', 'type', 'category_id'),
+            week - MAX_EVENT_SPAN, week_end, where=lambda model: [model.end_time > week]
+        )).all()
+        index = IntervalIndex([tuple(r) for r in rows])
+        weeks[week] = index
+    return index
+
+def find_overlaps(user_id, start, end, event_type=None):
+    """События пользователя, пересекающиеся с [start, end)"""
+    found = {}
+    week = week_start(start)
+    while week < end:
+        for item in get_week_index(user_id, week).overlapping(start, end, event_type):
+            found[item[0]] = item
+        week += timedelta(days=7)
+    return sorted(found.values(), key=lambda r: (r[1], r[0]))
+
+def free_slots(user_id, start, end, min_minutes=30, event_type=None):
+    """Свободные промежутки в [start, end) длиной не меньше min_minutes"""
+    min_length = timedelta(minutes=min_minutes)
+    slots = []
+    cursor = start
+    for _, busy_start, busy_end, _, _ in find_overlaps(user_id, start, end, event_type):
+        if busy_start - cursor >= min_length:
+            slots.append((cursor, busy_start))
+        if busy_end > cursor:
+            cursor = busy_end
+    if end - cursor >= min_length:
+        slots.append((cursor, end))
+    return slots
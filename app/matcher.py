@@ -0,0 +1,115 @@
+import re
+from app.models import Category, CategoryCode
+from app.cache import TTLCache
+from app.versions import get_versions
+
+# Уровни совпадения в порядке приоритета
+MATCH_CODE, MATCH_EXACT, MATCH_PREFIX, MATCH_INITIALS, MATCH_SUBSTRING = range(5)
+
+WORD_SPLIT = re.compile(r'[\s\-_./]+')
+
+# Ключ лучшей категории в узле trie: не строка, чтобы не совпасть с символом имени
+_END = object()
+
+def normalize(text):
+    """Нижний регистр, ё -> е, схлопнутые пробелы"""
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+def initials(name):
+    words = [w for w in WORD_SPLIT.split(name) if w]
+    return ''.join(w[0] for w in words) if len(words) > 1 else None
+
+class CategoryMatcher:
+    """Индекс категорий пользователя для поиска по коду без запросов к БД.
+
+    Точное имя и явные коды - словари, префиксы - дерево (trie), в каждом узле
+    которого хранится лучшая категория для этого префикса, аббревиатуры
+    ("ая" для "Английский язык") - словарь. Поиск по ним O(len(code)).
+    Подстрока проверяется последней линейным проходом по именам.
+    При равенстве побеждает более короткое имя, затем меньший id.
+    """
+
+    def __init__(self, categories, codes=()):
+        # categories: [(id, name)], codes: [(code, category_id)]
+        self.names = {}
+        self.codes = {}
+        self.exact = {}
+        self.initials = {}
+        self.trie = {}
+
+        ordered = sorted(categories, key=lambda c: (len(c[1]), c[0]))
+        for category_id, name in ordered:
+            self.names[category_id] = name
+            key = normalize(name)
+            self.exact.setdefault(key, category_id)
+
+            node = self.trie
+            for char in key:
+                node = node.setdefault(char, {})
+                node.setdefault(_END, category_id)
+
+            abbr = initials(key)
+            if abbr:
+                self.initials.setdefault(abbr, category_id)
+
+        for code, category_id in codes:
+            if category_id in self.names:
+                self.codes.setdefault(normalize(code), category_id)
+
+        self._ordered = [(normalize(name), category_id) for category_id, name in ordered]
+
+    def match(self, code):
+        """(category_id, уровень совпадения) или None"""
+        key = normalize(code or '')
+        if not key:
+            return None
+
+        if key in self.codes:
+            return self.codes[key], MATCH_CODE
+        if key in self.exact:
+            return self.exact[key], MATCH_EXACT
+
+        node = self.trie
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            return node[_END], MATCH_PREFIX
+
+        if key in self.initials:
+            return self.initials[key], MATCH_INITIALS
+
+        for name, category_id in self._ordered:
+            if key in name:
+                return category_id, MATCH_SUBSTRING
+        return None
+
+# Ключ кэша - (user_id, версии категорий и кодов). Запись через любой воркер
+# меняет версию в data_versions, поэтому устаревший индекс не используется
+# дольше TTL кэша версий; свой воркер сбрасывает версию сразу.
+MATCHER_KINDS = ('categories', 'category_codes')
+
+matcher_cache = TTLCache(ttl=600, maxsize=5000, name='category_matchers')
+
+def get_matcher(user_id):
+    versions = get_versions(user_id, MATCHER_KINDS)
+    key = (user_id,) + tuple(versions[kind] for kind in MATCHER_KINDS)
+    matcher = matcher_cache.get(key)
+    if matcher is None:
+        categories = Category.query.with_entities(Category.id, Category.name) \
+            .filter_by(user_id=user_id).all()
+        codes = CategoryCode.query.with_entities(CategoryCode.code, CategoryCode.category_id) \
+            .filter_by(user_id=user_id).all()
+        matcher = CategoryMatcher(categories, codes)
+        matcher_cache.set(key, matcher)
+    return matcher
+
+def match_category(user_id, code):
+    """Найти категорию по коду: (id, name) или None"""
+    matcher = get_matcher(user_id)
+    found = matcher.match(code)
+    if found is None:
+        return None
+    category_id = found[0]
+    return category_id, matcher.names[category_id]
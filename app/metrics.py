@@ -0,0 +1,183 @@
+from collections import Counter
+from threading import Lock
+import re
+import time
+
+from flask import g, request, has_request_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.cache import cache_stats
+
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Сколько одинаковых по форме SELECT в одном запросе считается подозрением на N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+METRIC_PREFIX = 'time_tracker'
+
+# Списки параметров IN (?, ?, ?) разной длины сводятся к одной форме
+_IN_LIST = re.compile(r'IN \((?:\s*(?:\?|%s|%\(\w+\)s)\s*,?)+\)')
+
+def statement_shape(statement):
+    if ' IN (' in statement:
+        return _IN_LIST.sub('IN (?)', statement)
+    return statement
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Метрики процесса: задержки по эндпоинтам, запросы к БД, подозрения на N+1"""
+
+    def __init__(self):
+        self.latency = {}        # (endpoint, method) -> Histogram
+        self.responses = Counter()  # (endpoint, method, status)
+        self.queries = Counter()    # endpoint -> число SQL-запросов
+        self.db_seconds = Counter()  # endpoint -> время в БД
+        self.n_plus_one = Counter()  # endpoint -> запросов с подозрением на N+1
+        self._lock = Lock()
+
+    def observe_request(self, endpoint, method, status, seconds, queries, db_seconds, suspected):
+        with self._lock:
+            histogram = self.latency.get((endpoint, method))
+            if histogram is None:
+                histogram = self.latency[(endpoint, method)] = Histogram()
+            histogram.observe(seconds)
+            self.responses[(endpoint, method, status)] += 1
+            self.queries[endpoint] += queries
+            self.db_seconds[endpoint] += db_seconds
+            if suspected:
+                self.n_plus_one[endpoint] += 1
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.responses.clear()
+            self.queries.clear()
+            self.db_seconds.clear()
+            self.n_plus_one.clear()
+
+registry = MetricsRegistry()
+
+# Учет SQL: счетчики живут в g текущего запроса, вне запросов ничего не делается
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_shapes' in g:
+        conn.info['query_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is None or not has_request_context() or 'sql_shapes' not in g:
+        return
+    g.sql_time += time.perf_counter() - started
+    g.sql_count += 1
+    if statement.lstrip()[:6].upper() == 'SELECT':
+        g.sql_shapes[statement_shape(statement)] += 1
+
+def suspected_n_plus_one(shapes):
+    return [(shape, count) for shape, count in shapes.items() if count >= N_PLUS_ONE_THRESHOLD]
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+    g.sql_shapes = Counter()
+
+def _finish_request(response):
+    if 'request_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or 'unmatched'
+
+    suspected = suspected_n_plus_one(g.sql_shapes)
+    for shape, count in suspected:
+        current_app.logger.warning('Possible N+1 in %s: %d x %s', endpoint, count, shape[:200])
+
+    registry.observe_request(endpoint, request.method, response.status_code,
+                             elapsed, g.sql_count, g.sql_time, bool(suspected))
+
+    if current_app.config.get('METRICS_SERVER_TIMING'):
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={g.sql_time * 1000:.1f};desc="{g.sql_count} queries", app;dur={elapsed * 1000:.1f}'
+        )
+    return response
+
+def init_metrics(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+def render_metrics():
+    """Метрики в текстовом формате Prometheus"""
+    p = METRIC_PREFIX
+    lines = []
+
+    with registry._lock:
+        lines.append(f'# HELP {p}_http_request_duration_seconds Request latency by endpoint')
+        lines.append(f'# TYPE {p}_http_request_duration_seconds histogram')
+        for (endpoint, method), histogram in sorted(registry.latency.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{p}_http_request_duration_seconds_bucket'
+                             f'{_labels(endpoint=endpoint, method=method, le=bound)} {cumulative}')
+            labels = _labels(endpoint=endpoint, method=method)
+            lines.append(f'{p}_http_request_duration_seconds_sum{labels} {histogram.sum:.6f}')
+            lines.append(f'{p}_http_request_duration_seconds_count{labels} {histogram.count}')
+
+        lines.append(f'# HELP {p}_http_responses_total Responses by endpoint and status')
+        lines.append(f'# TYPE {p}_http_responses_total counter')
+        for (endpoint, method, status), count in sorted(registry.responses.items()):
+            lines.append(f'{p}_http_responses_total'
+                         f'{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+        for name, values, help_text in (
+            ('db_queries_total', registry.queries, 'SQL statements executed by endpoint'),
+            ('db_query_seconds_total', registry.db_seconds, 'Time spent in SQL by endpoint'),
+            ('db_n_plus_one_total', registry.n_plus_one, 'Requests with repeated statement shapes (suspected N+1)')
+        ):
+            lines.append(f'# HELP {p}_{name} {help_text}')
+            lines.append(f'# TYPE {p}_{name} counter')
+            for endpoint, value in sorted(values.items()):
+                value = f'{value:.6f}' if isinstance(value, float) else value
+                lines.append(f'{p}_{name}{_labels(endpoint=endpoint)} {value}')
+
+    caches = cache_stats()
+    for name, key, kind in (('cache_hits_total', 'hits', 'counter'),
+                            ('cache_misses_total', 'misses', 'counter'),
+                            ('cache_entries', 'size', 'gauge')):
+        lines.append(f'# TYPE {p}_{name} {kind}')
+        for cache, stats in sorted(caches.items()):
+            lines.append(f'{p}_{name}{_labels(cache=cache)} {stats[key]}')
+
+    state = current_app.extensions.get('ratelimit')
+    if state is not None:
+        shedder = state[1]
+        for name, value, kind in (('inflight_requests', shedder.inflight, 'gauge'),
+                                  ('db_pool_wait_seconds', f'{shedder.pool_wait:.6f}', 'gauge'),
+                                  ('shed_requests_total', shedder.shed, 'counter')):
+            lines.append(f'# TYPE {p}_{name} {kind}')
+            lines.append(f'{p}_{name} {value}')
+
+    return '\n'.join(lines) + '\n'
@@ -1,12 +1,16 @@
 from app import db, login_manager
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy import select, union_all
 from datetime import datetime
 import json
 from werkzeug.security import generate_password_hash, check_password_hash
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Без запроса к БД на каждый запрос: см. app.auth.load_session_user
+    from app.auth import load_session_user
+    return load_session_user(user_id)
 
 class User(UserMixin, db.Model):
     """Пользователь с аутентификацией"""
@@ -22,6 +26,17 @@ class User(UserMixin, db.Model):
     categories = db.relationship('Category', backref='user', lazy=True, cascade='all, delete-orphan')
     events = db.relationship('Event', backref='user', lazy=True, cascade='all, delete-orphan')
     templates = db.relationship('Template', backref='user', lazy=True, cascade='all, delete-orphan')
+    daily_rollups = db.relationship('DailyRollup', lazy=True, cascade='all, delete-orphan')
+    idempotency_keys = db.relationship('IdempotencyKey', lazy=True, cascade='all, delete-orphan')
+    data_versions = db.relationship('DataVersion', lazy=True, cascade='all, delete-orphan')
+    category_codes = db.relationship('CategoryCode', lazy=True, cascade='all, delete-orphan')
+    archived_events = db.relationship('ArchivedEvent', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        # Вход и регистрация ищут по имени. Индекс не уникальный: в старых
+        # базах имена могут повторяться, уникальность новых проверяет регистрация
+        db.Index('idx_user_username', 'username'),
+    )
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -44,6 +59,7 @@ class Category(db.Model):
     
     # Связь с событиями (только конкретного пользователя)
     events = db.relationship('Event', backref='category', lazy=True)
+    codes = db.relationship('CategoryCode', lazy=True, cascade='all, delete-orphan')
     
     __table_args__ = (
         db.UniqueConstraint('user_id', 'name', name='unique_category_per_user'),
@@ -65,10 +81,18 @@ class Event(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     source = db.Column(db.String(20), default='web')  # 'web' или 'telegram'
     
-    # Индексы
+    # Индексы (планы горячих запросов проверяет benchmarks/plans.py).
+    # Отдельный индекс по user_id не нужен: его заменяет префикс составных.
     __table_args__ = (
-        db.Index('idx_event_user', 'user_id'),
+        # Лента событий, периоды, отчеты, экспорт
         db.Index('idx_event_user_time', 'user_id', 'start_time'),
+        # Фильтр по типу (лента, свободные окна, пересечения) с тем же порядком
+        db.Index('idx_event_user_type_time', 'user_id', 'type', 'start_time'),
+        # Фильтр по категории; категория принадлежит одному пользователю,
+        # поэтому user_id в ключе не нужен, а Category.events тоже использует индекс
+        db.Index('idx_event_category_time', 'category_id', 'start_time'),
+        # На SQLite id не выдаются повторно: они не должны совпасть с архивными
+        {'sqlite_autoincrement': True}
     )
     
     def __repr__(self):
@@ -84,5 +108,126 @@ class Template(db.Model):
     data = db.Column(db.JSON, nullable=False)  # JSON структура
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_template_user', 'user_id'),
+    )
+    
     def __repr__(self):
         return f'<Template {self.name}>'
+
+class DailyRollup(db.Model):
+    """Агрегаты событий по дням (поддерживаются инкрементально, см. app/rollups.py)"""
+    __tablename__ = 'daily_rollups'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    type = db.Column(db.String(10), primary_key=True)  # 'plan' или 'fact'
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyRollup {self.user_id} {self.day} {self.type}>'
+
+class IdempotencyKey(db.Model):
+    """Ключи идемпотентности пакетной загрузки событий"""
+    __tablename__ = 'idempotency_keys'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    key = db.Column(db.String(128), primary_key=True)
+    # Событие в events или events_archive, поэтому без внешнего ключа:
+    # ключ переживает архивацию, и повтор пакета не создает дубликат
+    event_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key}>'
+
+class DataVersion(db.Model):
+    """Версия данных пользователя по таблицам (для ETag)"""
+    __tablename__ = 'data_versions'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True)  # 'events', 'categories', 'templates'
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.user_id} {self.kind} {self.version}>'
+
+class CategoryCode(db.Model):
+    """Короткие коды категорий для быстрого ввода в Telegram"""
+    __tablename__ = 'category_codes'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    code = db.Column(db.String(20), primary_key=True)  # нормализованный (нижний регистр)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), nullable=False)
+    
+    def __repr__(self):
+        return f'<CategoryCode {self.code}>'
+
+class ArchivedEvent(db.Model):
+    """Архив старых событий (перенос - flask archive-events), только для чтения.
+    
+    На PostgreSQL - таблица, секционированная по месяцам start_time (секции
+    создает команда архивации), поэтому start_time входит в первичный ключ.
+    Агрегаты daily_rollups при переносе не меняются.
+    """
+    __tablename__ = 'events_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # id из events
+    start_time = db.Column(db.DateTime, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    type = db.Column(db.String(10), nullable=False)
+    created_at = db.Column(db.DateTime)
+    source = db.Column(db.String(20))
+    
+    category = db.relationship('Category', lazy=True)
+    
+    __table_args__ = (
+        db.Index('idx_event_archive_user_time', 'user_id', 'start_time'),
+        {'postgresql_partition_by': 'RANGE (start_time)'}
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedEvent {self.type} {self.start_time}>'
+
+# Горячие и архивные события.
+# События старше EVENTS_HOT_MONTHS полных месяцев может перенести в архив
+# flask archive-events; более новые всегда лежат в events.
+
+def archive_cutoff(now=None):
+    """Начало горячего периода: первое число месяца EVENTS_HOT_MONTHS назад"""
+    now = now or datetime.utcnow()
+    month = now.year * 12 + now.month - 1 - current_app.config.get('EVENTS_HOT_MONTHS', 6)
+    return datetime(month // 12, month % 12 + 1, 1)
+
+def event_models(start=None):
+    """Модели для чтения событий с start_time >= start: архив - только если нужен"""
+    if start is not None and start >= archive_cutoff():
+        return (Event,)
+    return (Event, ArchivedEvent)
+
+def select_events(user_id, columns, start=None, end=None, where=None):
+    """SELECT колонок событий пользователя за [start, end) из events и архива.
+    
+    where(model) - дополнительные условия для каждой из таблиц. Если период
+    целиком горячий, запрос к архиву не строится. Колонки результата доступны
+    через .selected_columns (для order_by).
+    """
+    selects = []
+    for model in event_models(start):
+        query = select(*(getattr(model, name) for name in columns)).where(model.user_id == user_id)
+        if start is not None:
+            query = query.where(model.start_time >= start)
+        if end is not None:
+            query = query.where(model.start_time < end)
+        if where is not None:
+            query = query.where(*where(model))
+        selects.append(query)
+    
+    if len(selects) == 1:
+        return selects[0]
+    combined = union_all(*selects).subquery()
+    return select(*combined.c)
@@ -0,0 +1,48 @@
+from collections import defaultdict
+from threading import Lock
+import queue
+from app.cache import on_user_data_changed
+# Слушатель кэша статистики должен сработать раньше публикации
+import app.stats  # noqa: F401
+
+class Broker:
+    """Pub/sub в памяти процесса: уведомления об изменении данных пользователя"""
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._subscribers = defaultdict(set)
+        self._lock = Lock()
+
+    def subscribe(self, user_id):
+        q = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subscribers[user_id].add(q)
+        return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # Подписчик не успевает - он все равно получит актуальное состояние
+                pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+broker = Broker()
+
+@on_user_data_changed
+def _publish_change(user_id, tables):
+    broker.publish(user_id, set(tables))
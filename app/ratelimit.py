@@ -0,0 +1,239 @@
+from collections import OrderedDict
+from threading import Lock, local
+import math
+import sqlite3
+import time
+
+from flask import g, request, jsonify, current_app
+from sqlalchemy import event
+
+# Ограничение частоты запросов API бота (token bucket) и сброс нагрузки.
+# Лимит - (запросов в минуту, размер пачки): пачка запросов проходит сразу,
+# дальше токены восстанавливаются равномерно.
+
+class MemoryStore:
+    """Корзины в памяти процесса (у каждого воркера свои), LRU по ключам"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = Lock()
+
+    def take(self, key, per_minute, burst, now=None):
+        """Взять токен: (True, 0) или (False, секунд до появления токена)"""
+        now = time.time() if now is None else now
+        rate = per_minute / 60.0
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens, allowed, retry_after = refill_and_take(tokens, updated, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+class SQLiteStore:
+    """Корзины в файле SQLite: общие для всех воркеров на одной машине"""
+
+    # Корзины, не менявшиеся дольше этого (секунд), давно полные - удаляются
+    IDLE_SECONDS = 3600
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = local()
+        self._operations = 0
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, per_minute, burst, now=None):
+        now = time.time() if now is None else now
+        rate = per_minute / 60.0
+        connection = self._connect()
+        # IMMEDIATE: чтение и запись корзины атомарны между процессами
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens, allowed, retry_after = refill_and_take(tokens, updated, now, rate, burst)
+            connection.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                               (key, tokens, now))
+            self._operations += 1
+            if self._operations % self.CLEANUP_EVERY == 0:
+                connection.execute('DELETE FROM buckets WHERE updated < ?', (now - self.IDLE_SECONDS,))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+def refill_and_take(tokens, updated, now, rate, burst):
+    """Пополнить корзину за прошедшее время и взять токен: (tokens, allowed, retry_after)"""
+    tokens = min(burst, tokens + max(now - updated, 0) * rate)
+    if tokens >= 1:
+        return tokens - 1, True, 0
+    return tokens, False, (1 - tokens) / rate
+
+def create_store(url):
+    """'memory' или 'sqlite:///путь/к/файлу.db'"""
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    if url == 'memory':
+        return MemoryStore()
+    raise ValueError(f'Unknown RATELIMIT_STORAGE: {url}')
+
+class LoadShedder:
+    """Сброс дешевых запросов на чтение при перегрузке.
+
+    Перегрузка - слишком много одновременных запросов в процессе или
+    выросшее ожидание соединения из пула БД (экспоненциальное среднее,
+    затухающее со временем, чтобы без новых замеров сброс прекращался).
+    """
+
+    def __init__(self, max_inflight, max_pool_wait, decay_seconds=5.0):
+        self.max_inflight = max_inflight
+        self.max_pool_wait = max_pool_wait
+        self.decay_seconds = decay_seconds
+        self.inflight = 0
+        self.shed = 0
+        self._pool_wait = 0.0
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def _decayed(self, now):
+        return self._pool_wait * math.exp(-(now - self._updated) / self.decay_seconds)
+
+    @property
+    def pool_wait(self):
+        with self._lock:
+            return self._decayed(time.monotonic())
+
+    def observe_pool_wait(self, seconds, weight=0.2):
+        now = time.monotonic()
+        with self._lock:
+            self._pool_wait = self._decayed(now) * (1 - weight) + seconds * weight
+            self._updated = now
+
+    def overloaded(self):
+        return self.inflight > self.max_inflight or self.pool_wait > self.max_pool_wait
+
+    def enter(self):
+        with self._lock:
+            self.inflight += 1
+
+    def leave(self):
+        with self._lock:
+            self.inflight -= 1
+
+# Момент, с которого поток запроса ждет соединение из пула (после проверки лимитов)
+_pool_wait_started = local()
+
+def begin_pool_wait():
+    _pool_wait_started.value = time.perf_counter()
+
+def end_pool_wait():
+    _pool_wait_started.value = None
+
+def observe_pool_checkouts(engine, shedder):
+    """Первый checkout после begin_pool_wait - замер ожидания пула"""
+    @event.listens_for(engine.pool, 'checkout')
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        started = getattr(_pool_wait_started, 'value', None)
+        if started is not None:
+            shedder.observe_pool_wait(time.perf_counter() - started)
+            end_pool_wait()
+
+def client_ip():
+    """IP клиента: X-Forwarded-For учитывается только за доверенными прокси"""
+    hops = current_app.config.get('RATELIMIT_TRUSTED_PROXIES', 0)
+    forwarded = request.headers.get('X-Forwarded-For')
+    if hops and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-hops] if len(addresses) >= hops else addresses[0]
+    return request.remote_addr or 'unknown'
+
+def endpoint_limits(endpoint):
+    """{'telegram_id': (в минуту, пачка), 'ip': (...)} для эндпоинта"""
+    limits = dict(current_app.config['RATELIMIT_DEFAULT'])
+    limits.update(current_app.config['RATELIMIT_ENDPOINTS'].get(endpoint, {}))
+    return limits
+
+def too_many_requests(retry_after, status=429, error='Too many requests'):
+    seconds = max(1, math.ceil(retry_after))
+    response = jsonify({'error': error, 'retry_after': seconds})
+    response.status_code = status
+    response.headers['Retry-After'] = str(seconds)
+    return response
+
+def check_request():
+    """before_request API: None - пропустить, иначе ответ 429/503"""
+    state = current_app.extensions.get('ratelimit')
+    if state is None or not current_app.config.get('RATELIMIT_ENABLED', True):
+        return None
+    store, shedder = state
+    endpoint = request.endpoint or 'unmatched'
+
+    # Дешевое чтение при перегрузке отклоняется до любой работы с БД
+    if endpoint in current_app.config['SHED_ENDPOINTS'] and shedder.overloaded():
+        shedder.shed += 1
+        return too_many_requests(1, status=503, error='Server is busy, retry later')
+
+    limits = endpoint_limits(endpoint)
+    telegram_id = request.headers.get('X-Telegram-ID') or request.args.get('telegram_id')
+    keys = [('ip', client_ip())]
+    if telegram_id:
+        keys.append(('telegram_id', telegram_id))
+
+    for kind, value in keys:
+        if limits.get(kind) is None:
+            continue
+        per_minute, burst = limits[kind]
+        allowed, retry_after = store.take(f'{endpoint}:{kind}:{value}', per_minute, burst)
+        if not allowed:
+            return too_many_requests(retry_after)
+
+    begin_pool_wait()
+    return None
+
+def init_rate_limits(app):
+    """Хранилище корзин и учет нагрузки; проверка подключается к api_bp"""
+    from app import db
+
+    store = create_store(app.config.get('RATELIMIT_STORAGE', 'memory'))
+    shedder = LoadShedder(app.config['SHED_MAX_INFLIGHT'], app.config['SHED_POOL_WAIT_MS'] / 1000)
+    app.extensions['ratelimit'] = (store, shedder)
+
+    with app.app_context():
+        observe_pool_checkouts(db.engine, shedder)
+
+    # Одновременные запросы считаются по всему приложению (веб тоже нагружает БД)
+    @app.before_request
+    def _enter():
+        shedder.enter()
+        g.inflight_counted = True
+
+    # Потоковые ответы (SSE, NDJSON, выгрузки) перестают считаться, как только
+    # отданы заголовки: открытые вкладки дашборда не должны вызывать сброс
+    @app.after_request
+    def _streamed(response):
+        if response.is_streamed and g.pop('inflight_counted', False):
+            shedder.leave()
+        return response
+    
+    @app.teardown_request
+    def _leave(exc):
+        end_pool_wait()
+        if g.pop('inflight_counted', False):
+            shedder.leave()
@@ -0,0 +1,190 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+import numpy as np
+from app import db
+from app.models import Category, select_events
+
+# События пользователя за период в виде колонок NumPy
+EventArrays = namedtuple('EventArrays', ['starts', 'ends', 'categories', 'category_ids', 'is_plan'])
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+HOURS_PER_WEEK = 168
+
+def load_event_arrays(user_id, start, end):
+    """Один запрос только по нужным колонкам -> компактные массивы.
+
+    starts/ends - секунды эпохи (int64), categories - коды категорий
+    (индексы в category_ids), is_plan - флаг типа.
+    """
+    rows = db.session.execute(select_events(
+        user_id, ('start_time', 'end_time', 'category_id', 'type'), start, end
+    )).all()
+
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return EventArrays(empty, empty, empty, empty, np.empty(0, dtype=bool))
+
+    start_times, end_times, category_ids, types = zip(*rows)
+    starts = np.array(start_times, dtype='datetime64[s]').astype(np.int64)
+    ends = np.array(end_times, dtype='datetime64[s]').astype(np.int64)
+    unique_ids, codes = np.unique(np.array(category_ids, dtype=np.int64), return_inverse=True)
+    is_plan = np.array(types) == 'plan'
+    return EventArrays(starts, ends, codes, unique_ids, is_plan)
+
+def durations(arrays):
+    return np.maximum(arrays.ends - arrays.starts, 0)
+
+def category_totals(arrays):
+    """Минуты плана и факта по категориям"""
+    size = len(arrays.category_ids)
+    seconds = durations(arrays)
+    plan = np.bincount(arrays.categories, weights=seconds * arrays.is_plan, minlength=size)
+    fact = np.bincount(arrays.categories, weights=seconds * ~arrays.is_plan, minlength=size)
+    return plan // 60, fact // 60
+
+def merge_intervals(starts, ends):
+    """Объединение пересекающихся интервалов (векторно): отсортированные непересекающиеся"""
+    if len(starts) == 0:
+        return starts, ends
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # Новый блок начинается там, где начало позже всех предыдущих концов
+    new_block = np.empty(len(starts), dtype=bool)
+    new_block[0] = True
+    new_block[1:] = starts[1:] > reach[:-1]
+    block_ids = np.cumsum(new_block) - 1
+    merged_starts = starts[new_block]
+    merged_ends = np.zeros(len(merged_starts), dtype=ends.dtype)
+    np.maximum.at(merged_ends, block_ids, ends)
+    return merged_starts, merged_ends
+
+def covered_before(points, starts, ends):
+    """Сколько секунд непересекающихся интервалов лежит левее каждой точки"""
+    if len(starts) == 0:
+        return np.zeros(len(points), dtype=np.int64)
+    cumulative = np.concatenate(([0], np.cumsum(ends - starts)))
+    idx = np.searchsorted(starts, points, side='right') - 1
+    inside = np.clip(points - starts[np.maximum(idx, 0)], 0, None)
+    inside = np.minimum(inside, (ends - starts)[np.maximum(idx, 0)])
+    return np.where(idx >= 0, cumulative[np.maximum(idx, 0)] + inside, 0)
+
+def intersection_seconds(a_starts, a_ends, b_starts, b_ends):
+    """Длина пересечения двух объединений интервалов"""
+    a_starts, a_ends = merge_intervals(a_starts, a_ends)
+    b_starts, b_ends = merge_intervals(b_starts, b_ends)
+    if len(a_starts) == 0 or len(b_starts) == 0:
+        return 0
+    return int(np.sum(covered_before(a_ends, b_starts, b_ends) - covered_before(a_starts, b_starts, b_ends)))
+
+def plan_adherence(arrays):
+    """Доля запланированного времени, покрытая фактом (в целом и по категориям)"""
+    def adherence(mask):
+        plan, fact = mask & arrays.is_plan, mask & ~arrays.is_plan
+        planned = merge_intervals(arrays.starts[plan], arrays.ends[plan])
+        planned_seconds = int(np.sum(planned[1] - planned[0]))
+        done = intersection_seconds(arrays.starts[plan], arrays.ends[plan],
+                                    arrays.starts[fact], arrays.ends[fact])
+        return {
+            'planned_minutes': planned_seconds // 60,
+            'done_minutes': done // 60,
+            'adherence': round(done / planned_seconds, 4) if planned_seconds else None
+        }
+
+    everything = np.ones(len(arrays.starts), dtype=bool)
+    overall = adherence(everything)
+    by_category = {
+        int(category_id): adherence(arrays.categories == code)
+        for code, category_id in enumerate(arrays.category_ids)
+    }
+    return overall, by_category
+
+def hour_of_week_heatmap(arrays, plan=False):
+    """Минуты по часам недели (7x24, понедельник 00:00 - первая ячейка)"""
+    mask = arrays.is_plan if plan else ~arrays.is_plan
+    starts, ends = arrays.starts[mask], arrays.ends[mask]
+    ends = np.maximum(ends, starts)
+    if len(starts) == 0:
+        return np.zeros((7, 24), dtype=np.int64)
+
+    # Каждое событие разбивается на часовые ячейки, которые оно затрагивает
+    first_hour = starts // SECONDS_PER_HOUR
+    hours = (np.maximum(ends - 1, starts) // SECONDS_PER_HOUR) - first_hour + 1
+    event_index = np.repeat(np.arange(len(starts)), hours)
+    offsets = np.arange(len(event_index)) - np.repeat(np.cumsum(hours) - hours, hours)
+    bucket = first_hour[event_index] + offsets
+    bucket_start = bucket * SECONDS_PER_HOUR
+    seconds = (np.minimum(ends[event_index], bucket_start + SECONDS_PER_HOUR)
+               - np.maximum(starts[event_index], bucket_start))
+
+    # 1970-01-01 - четверг: сдвиг на 3 дня дает понедельник = 0
+    weekday = (bucket // 24 + 3) % 7
+    slot = weekday * 24 + bucket % 24
+    totals = np.bincount(slot, weights=np.clip(seconds, 0, None), minlength=HOURS_PER_WEEK)
+    return (totals // 60).astype(np.int64).reshape(7, 24)
+
+def streaks(arrays, today):
+    """Серии дней подряд с хотя бы одним фактическим событием"""
+    days = np.unique(arrays.starts[~arrays.is_plan] // SECONDS_PER_DAY)
+    if len(days) == 0:
+        return {'current': 0, 'longest': 0, 'active_days': 0}
+
+    breaks = np.flatnonzero(np.diff(days) != 1)
+    run_starts = np.concatenate(([0], breaks + 1))
+    run_ends = np.concatenate((breaks, [len(days) - 1]))
+    lengths = run_ends - run_starts + 1
+
+    today_number = (today - datetime(1970, 1, 1).date()).days
+    # Текущая серия не прерывается, пока сегодня еще не закончилось
+    current = int(lengths[-1]) if days[-1] >= today_number - 1 else 0
+    return {'current': current, 'longest': int(lengths.max()), 'active_days': int(len(days))}
+
+def category_names(user_id, category_ids):
+    if len(category_ids) == 0:
+        return {}
+    return {cid: (name, color) for cid, name, color in db.session.query(
+        Category.id, Category.name, Category.color
+    ).filter(Category.user_id == user_id, Category.id.in_([int(c) for c in category_ids]))}
+
+REPORTS = ('categories', 'adherence', 'heatmap', 'streaks')
+
+def build_report(name, user_id, date_from, date_to):
+    """Отчет по имени за период [date_from, date_to]"""
+    start = datetime.combine(date_from, datetime.min.time())
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    arrays = load_event_arrays(user_id, start, end)
+
+    if name == 'categories':
+        plan, fact = category_totals(arrays)
+        names = category_names(user_id, arrays.category_ids)
+        items = [{
+            'category_id': int(category_id),
+            'category': names.get(int(category_id), (None, None))[0],
+            'category_color': names.get(int(category_id), (None, None))[1],
+            'plan_minutes': int(plan[code]),
+            'fact_minutes': int(fact[code])
+        } for code, category_id in enumerate(arrays.category_ids)]
+        items.sort(key=lambda item: item['plan_minutes'] + item['fact_minutes'], reverse=True)
+        return {'items': items}
+
+    if name == 'adherence':
+        overall, by_category = plan_adherence(arrays)
+        names = category_names(user_id, arrays.category_ids)
+        return {
+            'overall': overall,
+            'categories': [dict(value, category_id=category_id,
+                                category=names.get(category_id, (None, None))[0])
+                           for category_id, value in by_category.items()]
+        }
+
+    if name == 'heatmap':
+        return {
+            'fact': hour_of_week_heatmap(arrays).tolist(),
+            'plan': hour_of_week_heatmap(arrays, plan=True).tolist()
+        }
+
+    if name == 'streaks':
+        return streaks(arrays, datetime.utcnow().date())
+
+    raise ValueError(f'Unknown report: {name}')
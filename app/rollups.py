@@ -0,0 +1,192 @@
+from collections import defaultdict
+from datetime import timedelta
+from sqlalchemy import event, func, delete
+from sqlalchemy.orm import Session
+from app import db
+from app.models import User, Category, Event, ArchivedEvent, DailyRollup
+
+# Поля события, от которых зависит строка агрегата
+ROLLUP_FIELDS = ('user_id', 'category_id', 'start_time', 'end_time', 'type')
+
+def event_minutes(start_time, end_time):
+    """Длительность события в минутах (как в api_my_events)"""
+    return int((end_time - start_time).total_seconds() / 60)
+
+def add_event_delta(deltas, values, sign):
+    """Добавить вклад события (+1 при вставке, -1 при удалении) в словарь дельт"""
+    key = (values['user_id'], values['start_time'].date(), values['category_id'], values['type'])
+    delta = deltas[key]
+    delta[0] += sign * event_minutes(values['start_time'], values['end_time'])
+    delta[1] += sign
+
+def new_deltas():
+    return defaultdict(lambda: [0, 0])
+
+def dialect_insert(connection):
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def apply_deltas(connection, deltas):
+    """Применить дельты к daily_rollups одним upsert (executemany)"""
+    rows = [{
+        'user_id': user_id,
+        'day': day,
+        'category_id': category_id,
+        'type': event_type,
+        'total_minutes': minutes,
+        'event_count': count
+    } for (user_id, day, category_id, event_type), (minutes, count) in deltas.items()
+        if minutes or count]
+
+    if not rows:
+        return
+
+    table = DailyRollup.__table__
+    stmt = dialect_insert(connection)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'day', 'category_id', 'type'],
+        set_={
+            'total_minutes': table.c.total_minutes + stmt.excluded.total_minutes,
+            'event_count': table.c.event_count + stmt.excluded.event_count
+        }
+    )
+    connection.execute(stmt, rows)
+
+    # Пустые строки не храним, чтобы не мешать удалению категорий
+    connection.execute(delete(table).where(
+        table.c.user_id.in_({row['user_id'] for row in rows}),
+        table.c.event_count <= 0
+    ))
+
+def _current_values(obj):
+    return {field: getattr(obj, field) for field in ROLLUP_FIELDS}
+
+def _original_values(obj):
+    state = db.inspect(obj)
+    values = {}
+    for field in ROLLUP_FIELDS:
+        history = state.attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        else:
+            values[field] = getattr(obj, field)
+    return values
+
+# Старое значение нужно даже для полей, которые не были загружены до изменения
+for _field in ROLLUP_FIELDS:
+    event.listen(getattr(Event, _field), 'set', lambda *args: None, active_history=True)
+
+@event.listens_for(Session, 'after_flush')
+def _update_rollups(session, flush_context):
+    """Обновление агрегатов в той же транзакции, что и изменение событий"""
+    deltas = new_deltas()
+
+    for obj in session.new:
+        if isinstance(obj, Event):
+            add_event_delta(deltas, _current_values(obj), 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Event):
+            add_event_delta(deltas, _original_values(obj), -1)
+
+    for obj in session.dirty:
+        if isinstance(obj, Event) and session.is_modified(obj, include_collections=False):
+            original = _original_values(obj)
+            current = _current_values(obj)
+            if original != current:
+                add_event_delta(deltas, original, -1)
+                add_event_delta(deltas, current, 1)
+
+    if not deltas:
+        return
+
+    # Агрегаты удаляемых пользователей удаляются каскадом
+    deleted_users = {obj.id for obj in session.deleted if isinstance(obj, User)}
+    if deleted_users:
+        deltas = {key: value for key, value in deltas.items() if key[0] not in deleted_users}
+
+    apply_deltas(session.connection(), deltas)
+
+def rebuild_rollups(user_id=None):
+    """Полный пересчет агрегатов по событиям, включая архив (для бэкфилла)"""
+    table = DailyRollup.__table__
+    cleanup = delete(table)
+    if user_id is not None:
+        cleanup = cleanup.where(table.c.user_id == user_id)
+
+    deltas = new_deltas()
+    for model in (Event, ArchivedEvent):
+        query = db.session.query(
+            model.user_id, model.category_id, model.start_time, model.end_time, model.type
+        )
+        if user_id is not None:
+            query = query.filter(model.user_id == user_id)
+        for row in query.yield_per(1000):
+            add_event_delta(deltas, row._asdict(), 1)
+
+    db.session.execute(cleanup)
+    apply_deltas(db.session.connection(), deltas)
+    db.session.commit()
+    return len(deltas)
+
+ANALYTICS_GROUPS = ('day', 'week', 'category')
+
+def query_analytics(user_id, date_from, date_to, group_by='day'):
+    """План/факт по дням, неделям или категориям только по таблице агрегатов"""
+    rollup = DailyRollup
+    filters = (
+        rollup.user_id == user_id,
+        rollup.day >= date_from,
+        rollup.day <= date_to
+    )
+
+    if group_by == 'category':
+        rows = db.session.query(
+            rollup.category_id, rollup.type,
+            func.sum(rollup.total_minutes), func.sum(rollup.event_count)
+        ).filter(*filters).group_by(rollup.category_id, rollup.type).all()
+    else:
+        rows = db.session.query(
+            rollup.day, rollup.type,
+            func.sum(rollup.total_minutes), func.sum(rollup.event_count)
+        ).filter(*filters).group_by(rollup.day, rollup.type).all()
+
+    groups = {}
+    totals = {'plan_minutes': 0, 'fact_minutes': 0, 'plan_events': 0, 'fact_events': 0}
+    for key, event_type, minutes, count in rows:
+        if group_by == 'week':
+            key = key - timedelta(days=key.weekday())
+        item = groups.setdefault(key, {
+            'plan_minutes': 0, 'fact_minutes': 0, 'plan_events': 0, 'fact_events': 0
+        })
+        if event_type not in ('plan', 'fact'):
+            continue
+        item[f'{event_type}_minutes'] += minutes or 0
+        item[f'{event_type}_events'] += count or 0
+        totals[f'{event_type}_minutes'] += minutes or 0
+        totals[f'{event_type}_events'] += count or 0
+
+    items = []
+    if group_by == 'category':
+        categories = {cat.id: cat for cat in Category.query.filter(
+            Category.user_id == user_id, Category.id.in_(list(groups))
+        )} if groups else {}
+        for category_id, item in groups.items():
+            category = categories.get(category_id)
+            item.update({
+                'category_id': category_id,
+                'category': category.name if category else None,
+                'category_color': category.color if category else None
+            })
+            items.append(item)
+        items.sort(key=lambda item: item['fact_minutes'] + item['plan_minutes'], reverse=True)
+    else:
+        for key in sorted(groups):
+            item = groups[key]
+            item['key'] = key.isoformat()
+            items.append(item)
+
+    return {'items': items, 'totals': totals}
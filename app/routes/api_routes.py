@@ -1,12 +1,23 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import User, Category, Event
-from app.auth import telegram_auth_required
-from datetime import datetime
-import re
+from app.models import User, Category, Event, IdempotencyKey
+from app.auth import telegram_auth_required, resolve_telegram_identity
+from app.stats import get_user_stats
+from app.matcher import match_category
+from app.intervals import find_overlaps
+from app.versions import versioned
+from app.bulk import owned_category_ids, bulk_insert_events, naive_utc
+from app.textparse import parse_message, resolve_entries
+from app.ratelimit import check_request
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
 
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
 
+# Лимиты по X-Telegram-ID и IP, 429 + Retry-After (см. RATELIMIT_* в config.py)
+api_bp.before_request(check_request)
+
 @api_bp.route('/telegram/auth', methods=['POST'])
 def telegram_auth():
     """Авторизация/регистрация через Telegram"""
@@ -18,8 +29,8 @@ def telegram_auth():
     if not telegram_id:
         return jsonify({'error': 'telegram_id required'}), 400
     
-    # Ищем пользователя
-    user = User.query.filter_by(telegram_id=telegram_id).first()
+    # Ищем пользователя (снимок из кэша идентификаций)
+    user = resolve_telegram_identity(telegram_id)
     
     if user:
         # Пользователь уже существует
@@ -27,7 +38,7 @@ def telegram_auth():
             'status': 'authenticated',
             'user_id': user.id,
             'username': user.username,
-            'has_categories': Category.query.filter_by(user_id=user.id).count() > 0
+            'has_categories': get_user_stats(user.id)['categories'] > 0
         }), 200
     else:
         # Новый пользователь - нужно зарегистрироваться через веб
@@ -39,6 +50,7 @@ def telegram_auth():
 
 @api_bp.route('/telegram/categories', methods=['GET'])
 @telegram_auth_required
+@versioned('categories')
 def telegram_categories():
     """Получить категории пользователя для Telegram-бота"""
     user = request.current_user
@@ -69,20 +81,16 @@ def telegram_create_event():
     category_id = data.get('category_id')
     event_type = data.get('type', 'fact')  # По умолчанию факт
     
-    # Парсинг времени (пример: "14:30-16:00" или "2 часа")
+    # Парсинг времени (пример: "14:30-16:00", "9-10" или "2 часа")
     try:
-        if '-' in time_input:
-            # Формат "14:30-16:00"
-            start_str, end_str = time_input.split('-')
-            start_time = parse_time(start_str.strip())
-            end_time = parse_time(end_str.strip())
-        else:
-            # Формат "2 часа" или "90 минут"
-            duration = parse_duration(time_input)
-            start_time = datetime.utcnow()
-            end_time = start_time + duration
+        entries = parse_message(str(time_input))
     except ValueError as e:
         return jsonify({'error': f'Invalid time format: {str(e)}'}), 400
+    if len(entries) > 1:
+        return jsonify({'error': 'Several entries given, use /telegram/message'}), 400
+    if entries[0].code:
+        return jsonify({'error': f'Invalid time format: unexpected text "{entries[0].code}"'}), 400
+    start_time, end_time = entries[0].start_time, entries[0].end_time
     
     # Проверяем, что категория принадлежит пользователю
     category = Category.query.filter_by(
@@ -93,6 +101,8 @@ def telegram_create_event():
     if not category:
         return jsonify({'error': 'Category not found'}), 404
     
+    overlaps = find_overlaps(user.id, start_time, end_time, event_type)
+    
     # Создаем событие
     event = Event(
         user_id=user.id,
@@ -106,11 +116,16 @@ def telegram_create_event():
     db.session.add(event)
     db.session.commit()
     
-    return jsonify({
+    response = {
         'status': 'success',
         'event_id': event.id,
         'message': f'Event added: {category.name} ({event_type})'
-    }), 201
+    }
+    if overlaps:
+        response['warning'] = 'Event overlaps existing events'
+        response['overlaps'] = [item[0] for item in overlaps]
+    
+    return jsonify(response), 201
 
 @api_bp.route('/telegram/quick', methods=['POST'])
 @telegram_auth_required
@@ -122,22 +137,24 @@ def telegram_quick_event():
     code = data.get('code')  # Например, "ПАРА" или "ОБЕД"
     duration_minutes = data.get('duration', 90)  # По умолчанию 1,5 час
     
-    # Ищем категорию по коду/сокращению
-    category = Category.query.filter_by(user_id=user.id).filter(
-        (Category.name.ilike(f'%{code}%')) |
-        (db.func.lower(Category.name) == code.lower())
-    ).first()
+    if not code:
+        return jsonify({'error': 'code required'}), 400
+    
+    # Ищем категорию по коду/сокращению (индекс в памяти; к БД - только за версией категорий)
+    category = match_category(user.id, code)
     
     if not category:
         return jsonify({'error': f'Category not found for code: {code}'}), 404
     
+    category_id, category_name = category
+    
     # Создаем событие
     start_time = datetime.utcnow()
     end_time = start_time + timedelta(minutes=int(duration_minutes))
     
     event = Event(
         user_id=user.id,
-        category_id=category.id,
+        category_id=category_id,
         type='fact',
         start_time=start_time,
         end_time=end_time,
@@ -149,31 +166,210 @@ def telegram_quick_event():
     
     return jsonify({
         'status': 'success',
-        'category': category.name,
+        'category': category_name,
         'duration': duration_minutes
-    })
+    }), 201
+
+@api_bp.route('/telegram/message', methods=['POST'])
+@telegram_auth_required
+def telegram_message():
+    """Несколько событий из одного сообщения.
+
+    Пример: {"text": "вчера 9:00-10:30 пара; 11-12 обед; 40 мин спорт"}.
+    "date" - время отправки сообщения (ISO 8601), от него считаются
+    "вчера", "пн" и т.п. Все события пишутся одной вставкой или не пишутся вовсе.
+    """
+    user = request.current_user
+    data = request.get_json(silent=True) or {}
+    
+    text = data.get('text')
+    if not text or not isinstance(text, str):
+        return jsonify({'error': 'text required'}), 400
+    
+    try:
+        now = naive_utc(datetime.fromisoformat(data['date'])) if data.get('date') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'date must be ISO 8601'}), 400
+    
+    event_type = data.get('type', 'fact')
+    if event_type not in ('plan', 'fact'):
+        return jsonify({'error': "type must be 'plan' or 'fact'"}), 400
+    
+    try:
+        entries = parse_message(text, now)
+        rows, names = resolve_entries(user.id, entries, default_type=event_type)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    event_ids = bulk_insert_events(user.id, rows)
+    db.session.commit()
+    
+    return jsonify({
+        'status': 'success',
+        'created': len(event_ids),
+        'events': [{
+            'event_id': event_id,
+            'category': name,
+            'type': row['type'],
+            'start_time': row['start_time'].isoformat(),
+            'end_time': row['end_time'].isoformat()
+        } for event_id, name, row in zip(event_ids, names, rows)]
+    }), 201
 
-# Вспомогательные функции для парсинга времени
-def parse_time(time_str):
-    """Парсинг времени в формате '14:30' или '2:30 PM'"""
-    # Простая реализация
-    if ':' in time_str:
-        hours, minutes = map(int, time_str.split(':'))
-        now = datetime.utcnow()
-        return now.replace(hour=hours % 24, minute=minutes, second=0, microsecond=0)
-    raise ValueError(f"Can't parse time: {time_str}")
+MAX_BATCH_SIZE = 5000
 
-def parse_duration(duration_str):
-    """Парсинг длительности '2 часа', '90 минут' и т.д."""
-    duration_str = duration_str.lower()
-    
-    if 'час' in duration_str or 'hour' in duration_str:
-        hours = float(re.search(r'[\d.]+', duration_str).group())
-        return timedelta(hours=hours)
-    elif 'мин' in duration_str or 'min' in duration_str:
-        minutes = float(re.search(r'[\d.]+', duration_str).group())
-        return timedelta(minutes=minutes)
+@api_bp.route('/events/batch', methods=['POST'])
+@telegram_auth_required
+def batch_create_events():
+    """Пакетная загрузка событий одной транзакцией.
+
+    Формат: {"events": [{"category_id" или "code", "start_time", "end_time",
+    "type", "idempotency_key"}]}, время в ISO 8601. Элемент {"text", "date"}
+    - сообщение из нескольких записей, как в /telegram/message. Ошибки
+    возвращаются по каждому элементу, повтор с тем же idempotency_key не
+    создает дубликат.
+    """
+    user = request.current_user
+    data = request.get_json(silent=True) or {}
+    items = data.get('events')
+    
+    if not isinstance(items, list):
+        return jsonify({'error': 'events list required'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Too many events, max {MAX_BATCH_SIZE}'}), 413
+    
+    results = [None] * len(items)
+    valid = []  # (index, rows, idempotency_key)
+    
+    for index, item in enumerate(items):
+        try:
+            rows, key = parse_batch_item(item, user.id)
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+            continue
+        valid.append((index, rows, key))
+    
+    # Владение категориями - один запрос IN
+    owned = owned_category_ids(user.id, {row['category_id'] for _, rows, _ in valid for row in rows})
+    
+    # Уже загруженные ранее ключи идемпотентности
+    keys = {key for _, _, key in valid if key}
+    existing = dict(db.session.query(IdempotencyKey.key, IdempotencyKey.event_id).filter(
+        IdempotencyKey.user_id == user.id,
+        IdempotencyKey.key.in_(keys)
+    )) if keys else {}
+    
+    to_insert = []
+    seen_keys = set()
+    for index, rows, key in valid:
+        if key in existing:
+            results[index] = {'index': index, 'status': 'duplicate', 'event_id': existing[key]}
+        elif key and key in seen_keys:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Duplicate idempotency_key in batch'}
+        elif any(row['category_id'] not in owned for row in rows):
+            results[index] = {'index': index, 'status': 'error', 'error': 'Category not found'}
+        else:
+            if key:
+                seen_keys.add(key)
+            to_insert.append((index, rows, key))
+    
+    if to_insert:
+        try:
+            event_ids = bulk_insert_events(user.id, [row for _, rows, _ in to_insert for row in rows])
+            # id событий каждого элемента; ключ ссылается на первое из них
+            created, position = [], 0
+            for index, rows, key in to_insert:
+                created.append((index, key, event_ids[position:position + len(rows)]))
+                position += len(rows)
+            key_rows = [
+                {'user_id': user.id, 'key': key, 'event_id': ids[0]}
+                for _, key, ids in created if key
+            ]
+            if key_rows:
+                db.session.execute(insert(IdempotencyKey), key_rows)
+            db.session.commit()
+        except IntegrityError:
+            # Параллельный повтор того же пакета - клиенту достаточно повторить запрос
+            db.session.rollback()
+            return jsonify({'error': 'Conflicting concurrent batch, please retry'}), 409
+        
+        for index, _, ids in created:
+            results[index] = {'index': index, 'status': 'created', 'event_id': ids[0]}
+            if 'text' in items[index]:
+                results[index]['event_ids'] = ids
+    
+    summary = {status: sum(1 for r in results if r['status'] == status)
+               for status in ('created', 'duplicate', 'error')}
+    
+    return jsonify({
+        'status': 'success' if not summary['error'] else 'partial',
+        **summary,
+        'results': results
+    }), 201 if summary['created'] else 200
+
+def parse_batch_item(item, user_id):
+    """Проверка одного элемента пакета, возвращает ([row], idempotency_key)"""
+    if not isinstance(item, dict):
+        raise ValueError('Event must be an object')
+    
+    key = item.get('idempotency_key')
+    if key is not None:
+        key = str(key)
+        if not key or len(key) > 128:
+            raise ValueError('idempotency_key must be 1-128 characters')
+    
+    if 'text' in item:
+        return parse_message_item(item, user_id), key
+    
+    if item.get('category_id') is None and item.get('code'):
+        # Код категории, как в быстром добавлении (очередь бота отправляет коды)
+        category = match_category(user_id, str(item['code']))
+        if not category:
+            raise ValueError(f'Category not found for code: {item["code"]}')
+        category_id = category[0]
     else:
-        # По умолчанию считаем минутами
-        minutes = float(re.search(r'[\d.]+', duration_str).group())
-        return timedelta(minutes=minutes)
+        try:
+            category_id = int(item.get('category_id'))
+        except (TypeError, ValueError):
+            raise ValueError('category_id or code required')
+    
+    event_type = item.get('type', 'fact')
+    if event_type not in ('plan', 'fact'):
+        raise ValueError("type must be 'plan' or 'fact'")
+    
+    try:
+        # Время с поясом (в т.ч. с разными поясами) сравнивается и хранится в UTC
+        start_time = naive_utc(datetime.fromisoformat(item['start_time']))
+        end_time = naive_utc(datetime.fromisoformat(item['end_time']))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('start_time and end_time must be ISO 8601')
+    
+    if end_time <= start_time:
+        raise ValueError('end_time must be later than start_time')
+    
+    return [{
+        'category_id': category_id,
+        'type': event_type,
+        'start_time': start_time,
+        'end_time': end_time,
+        'source': str(item.get('source', 'batch'))[:20]
+    }], key
+
+def parse_message_item(item, user_id):
+    """Строки событий элемента-сообщения {"text", "date", "type"}"""
+    text = item['text']
+    if not text or not isinstance(text, str):
+        raise ValueError('text must be a non-empty string')
+    
+    try:
+        now = naive_utc(datetime.fromisoformat(item['date'])) if item.get('date') else None
+    except (TypeError, ValueError):
+        raise ValueError('date must be ISO 8601')
+    
+    event_type = item.get('type', 'fact')
+    if event_type not in ('plan', 'fact'):
+        raise ValueError("type must be 'plan' or 'fact'")
+    
+    rows, _ = resolve_entries(user_id, parse_message(text, now), default_type=event_type,
+                              source=str(item.get('source', 'telegram'))[:20])
+    return rows
@@ -2,7 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, current_user
 from app import db
 from app.models import User
-from app.auth import login_required
+from app.auth import login_required, remember_identity, forget_identity
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -24,6 +24,7 @@ def login():
         
         if user and user.check_password(password):
             login_user(user, remember=remember)
+            remember_identity(user)
             next_page = request.args.get('next')
             flash('Вы успешно вошли в систему!', 'success')
             return redirect(next_page or url_for('main.dashboard'))
@@ -71,6 +72,7 @@ def register():
         
         # Автоматический вход после регистрации
         login_user(user)
+        remember_identity(user)
         flash('Регистрация успешна! Создайте свою первую категорию.', 'success')
         return redirect(url_for('main.dashboard'))
     
@@ -81,5 +83,6 @@ def register():
 def logout():
     """Выход из системы"""
     logout_user()
+    forget_identity()
     flash('Вы вышли из системы', 'info')
     return redirect(url_for('auth.login'))
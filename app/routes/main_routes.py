@@ -1,10 +1,30 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, Response, stream_with_context, current_app
 from flask_login import current_user
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import User, Category, Event, Template
+from app.models import User, Category, CategoryCode, Event, Template, event_models
 from app.auth import login_required
+from app.stats import get_user_stats, stats_cache, category_event_counts
+from app.rollups import query_analytics, ANALYTICS_GROUPS
+from app.pubsub import broker
+from app.versions import get_versions
+from app.matcher import normalize
+from app.intervals import find_overlaps, free_slots
+from app.schedule import parse_schedule, expand_template
+from app.export import generate_csv, generate_ics
+from app.importer import import_events, detect_format
+from app.metrics import render_metrics
 from datetime import datetime, timedelta
 import json
+import heapq
+import base64
+import binascii
+import hmac
+import queue
+import time
+import os
+import tempfile
 
 main_bp = Blueprint('main', __name__)
 
@@ -12,31 +32,32 @@ main_bp = Blueprint('main', __name__)
 @login_required
 def dashboard():
     """Главная страница личного кабинета"""
-    # Статистика пользователя
+    # Статистика пользователя (один запрос, кэшируется до изменения данных)
+    user_stats = get_user_stats(current_user.id)
     stats = {
-        'categories': Category.query.filter_by(user_id=current_user.id).count(),
-        'events_today': Event.query.filter(
-            Event.user_id == current_user.id,
-            Event.start_time >= datetime.utcnow().date(),
-            Event.start_time < datetime.utcnow().date() + timedelta(days=1)
-        ).count(),
-        'total_events': Event.query.filter_by(user_id=current_user.id).count(),
-        'templates': Template.query.filter_by(user_id=current_user.id).count()
+        'categories': user_stats['categories'],
+        'events_today': user_stats['events_today'],
+        'total_events': user_stats['events_total'],
+        'templates': user_stats['templates']
     }
     
-    # Последние события
-    recent_events = Event.query.filter_by(
+    # Последние события (категория - тем же запросом)
+    recent_events = Event.query.options(joinedload(Event.category, innerjoin=True)).filter_by(
         user_id=current_user.id
-    ).order_by(Event.start_time.desc()).limit(5).all()
+    ).order_by(Event.start_time.desc(), Event.id.desc()).limit(5).all()
     
-    # Категории для формы
+    # Категории для формы и число событий в каждой (без загрузки самих событий)
     categories = Category.query.filter_by(user_id=current_user.id).all()
+    event_counts = category_event_counts(current_user.id) if categories else {}
     
     return render_template('dashboard.html', 
                          stats=stats, 
                          recent_events=recent_events,
                          categories=categories,
-                         user=current_user)
+                         event_counts=event_counts,
+                         user=current_user,
+                         now=datetime.utcnow(),
+                         live_updates=current_app.config.get('LIVE_UPDATES_SSE', False))
 
 @main_bp.route('/profile')
 @login_required
@@ -51,6 +72,7 @@ def manage_categories():
     if request.method == 'POST':
         name = request.form.get('name')
         color = request.form.get('color', '#007bff')
+        code = normalize(request.form.get('code', ''))  # Короткий код для Telegram
         
         if not name:
             flash('Название категории обязательно', 'danger')
@@ -66,11 +88,17 @@ def manage_categories():
             flash('Категория с таким названием уже существует', 'warning')
             return redirect(url_for('main.manage_categories'))
         
+        if code and CategoryCode.query.filter_by(user_id=current_user.id, code=code).first():
+            flash(f'Код "{code}" уже используется', 'warning')
+            return redirect(url_for('main.manage_categories'))
+        
         category = Category(
             name=name,
             color=color,
             user_id=current_user.id
         )
+        if code:
+            category.codes.append(CategoryCode(user_id=current_user.id, code=code[:20]))
         
         db.session.add(category)
         db.session.commit()
@@ -82,6 +110,37 @@ def manage_categories():
     categories = Category.query.filter_by(user_id=current_user.id).all()
     return render_template('categories.html', categories=categories)
 
+@main_bp.route('/templates', methods=['GET', 'POST'])
+@login_required
+def manage_templates():
+    """Управление шаблонами (расписаниями) пользователя"""
+    if request.method == 'POST':
+        name = request.form.get('name')
+        
+        if not name:
+            flash('Название шаблона обязательно', 'danger')
+            return redirect(url_for('main.manage_templates'))
+        
+        try:
+            data = json.loads(request.form.get('data', ''))
+            parse_schedule(data)
+        except ValueError as e:
+            flash(f'Неверный формат расписания: {e}', 'danger')
+            return redirect(url_for('main.manage_templates'))
+        
+        template = Template(name=name, data=data, user_id=current_user.id)
+        
+        db.session.add(template)
+        db.session.commit()
+        
+        flash(f'Шаблон "{name}" создан!', 'success')
+        return redirect(url_for('main.dashboard'))
+    
+    # все шаблоны пользователя и категории для подсказки в форме
+    templates = Template.query.filter_by(user_id=current_user.id).order_by(Template.created_at.desc()).all()
+    categories = Category.query.filter_by(user_id=current_user.id).order_by(Category.name).all()
+    return render_template('templates.html', templates=templates, categories=categories)
+
 @main_bp.route('/events', methods=['GET', 'POST'])
 @login_required
 def manage_events():
@@ -111,6 +170,8 @@ def manage_events():
                 flash('Время окончания должно быть позже времени начала', 'danger')
                 return redirect(url_for('main.manage_events'))
             
+            overlaps = find_overlaps(current_user.id, start_dt, end_dt, event_type)
+            
             event = Event(
                 user_id=current_user.id,
                 category_id=category_id,
@@ -123,6 +184,8 @@ def manage_events():
             db.session.add(event)
             db.session.commit()
             
+            if overlaps:
+                flash(f'Событие пересекается с другими событиями: {len(overlaps)}', 'warning')
             flash('Событие успешно добавлено!', 'success')
             return redirect(url_for('main.dashboard'))
             
@@ -134,12 +197,20 @@ def manage_events():
     categories = Category.query.filter_by(user_id=current_user.id).all()
     return render_template('events.html', categories=categories)
 
+def stats_payload(stats):
+    return {
+        'categories': stats['categories'],
+        'templates': stats['templates'],
+        'events_today': stats['events_today'],
+        'events_total': stats['events_total'],
+        'plans_vs_facts': {'plan': stats['plan'], 'fact': stats['fact']}
+    }
+
 @main_bp.route('/api/my/stats')
 @login_required
 def api_my_stats():
     """Статистика текущего пользователя"""
-    today = datetime.utcnow().date()
-    tomorrow = today + timedelta(days=1)
+    stats = get_user_stats(current_user.id)
     
     return jsonify({
         'user': {
@@ -147,52 +218,378 @@ def api_my_stats():
             'username': current_user.username,
             'telegram_linked': bool(current_user.telegram_id)
         },
-        'stats': {
-            'categories': Category.query.filter_by(user_id=current_user.id).count(),
-            'events_today': Event.query.filter(
-                Event.user_id == current_user.id,
-                Event.start_time >= today,
-                Event.start_time < tomorrow
-            ).count(),
-            'events_total': Event.query.filter_by(user_id=current_user.id).count(),
-            'plans_vs_facts': {
-                'plan': Event.query.filter_by(user_id=current_user.id, type='plan').count(),
-                'fact': Event.query.filter_by(user_id=current_user.id, type='fact').count()
-            }
-        }
+        'stats': stats_payload(stats)
     })
 
+EVENTS_PAGE_SIZE = 100
+EVENTS_MAX_PAGE_SIZE = 500
+
+def encode_cursor(start_time, event_id):
+    """Непрозрачный курсор пагинации по (start_time, id)"""
+    raw = f'{start_time.isoformat()}|{event_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    start_str, event_id = raw.split('|')
+    return datetime.fromisoformat(start_str), int(event_id)
+
+def event_to_dict(e):
+    return {
+        'id': e.id,
+        'category': e.category.name,
+        'category_color': e.category.color,
+        'type': e.type,
+        'start_time': e.start_time.isoformat(),
+        'end_time': e.end_time.isoformat(),
+        'duration_minutes': int((e.end_time - e.start_time).total_seconds() / 60),
+        'source': e.source,
+        'created_at': e.created_at.isoformat()
+    }
+
 @main_bp.route('/api/my/events')
 @login_required
 def api_my_events():
-    """События текущего пользователя с фильтрацией"""
+    """События текущего пользователя с фильтрацией и пагинацией по курсору"""
     # Параметры фильтрации
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     category_id = request.args.get('category_id')
     event_type = request.args.get('type')
     
-    query = Event.query.filter_by(user_id=current_user.id)
+    try:
+        start_time = datetime.fromisoformat(start_date) if start_date else None
+        end_time = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
     
-    if start_date:
-        query = query.filter(Event.start_time >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Event.start_time <= datetime.fromisoformat(end_date))
-    if category_id:
-        query = query.filter(Event.category_id == category_id)
-    if event_type:
-        query = query.filter(Event.type == event_type)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_time, cursor_id = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            return jsonify({'error': 'Invalid cursor'}), 400
     
-    events = query.order_by(Event.start_time.desc()).limit(100).all()
+    def build_query(model):
+        # Категория подгружается тем же запросом (без N+1)
+        query = model.query.options(joinedload(model.category, innerjoin=True)) \
+            .filter(model.user_id == current_user.id)
+        if start_time:
+            query = query.filter(model.start_time >= start_time)
+        if end_time:
+            query = query.filter(model.start_time <= end_time)
+        if category_id:
+            query = query.filter(model.category_id == category_id)
+        if event_type:
+            query = query.filter(model.type == event_type)
+        if cursor:
+            query = query.filter(tuple_(model.start_time, model.id) < tuple_(cursor_time, cursor_id))
+        # Порядок совпадает с индексом (user_id, start_time), id - для уникальности
+        return query.order_by(model.start_time.desc(), model.id.desc())
     
-    return jsonify([{
-        'id': e.id,
-        'category': e.category.name,
-        'category_color': e.category.color,
-        'type': e.type,
-        'start_time': e.start_time.isoformat(),
-        'end_time': e.end_time.isoformat(),
-        'duration_minutes': int((e.end_time - e.start_time).total_seconds() / 60),
-        'source': e.source,
-        'created_at': e.created_at.isoformat()
-    } for e in events])
+    # Архив читается, только если период начинается раньше горячих данных
+    queries = [build_query(model) for model in event_models(start_time)]
+    newest_first = lambda e: (e.start_time, e.id)
+    
+    # Потоковая выгрузка всей истории: серверный курсор, постоянная память
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        def generate():
+            streams = [query.yield_per(1000) for query in queries]
+            for e in heapq.merge(*streams, key=newest_first, reverse=True):
+                yield json.dumps(event_to_dict(e), ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    limit = min(max(request.args.get('limit', EVENTS_PAGE_SIZE, type=int), 1), EVENTS_MAX_PAGE_SIZE)
+    events = heapq.nlargest(limit + 1, (e for query in queries for e in query.limit(limit + 1)),
+                            key=newest_first)
+    has_more = len(events) > limit
+    events = events[:limit]
+    
+    response = jsonify([event_to_dict(e) for e in events])
+    if has_more:
+        # Следующая страница: ?cursor=<X-Next-Cursor>
+        response.headers['X-Next-Cursor'] = encode_cursor(events[-1].start_time, events[-1].id)
+    return response
+
+@main_bp.route('/api/my/analytics')
+@login_required
+def api_my_analytics():
+    """План/факт за период по дням, неделям или категориям (из таблицы агрегатов)"""
+    group_by = request.args.get('group_by', 'day')
+    if group_by not in ANALYTICS_GROUPS:
+        return jsonify({'error': f'group_by must be one of: {", ".join(ANALYTICS_GROUPS)}'}), 400
+    
+    try:
+        date_to = datetime.fromisoformat(request.args['to']).date() \
+            if request.args.get('to') else datetime.utcnow().date()
+        date_from = datetime.fromisoformat(request.args['from']).date() \
+            if request.args.get('from') else date_to - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    
+    if date_from > date_to:
+        return jsonify({'error': '"from" must not be later than "to"'}), 400
+    
+    report = query_analytics(current_user.id, date_from, date_to, group_by)
+    
+    return jsonify({
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'group_by': group_by,
+        'items': report['items'],
+        'totals': report['totals']
+    })
+
+# Параметры потока SSE: пинг для прокси и максимальная длительность соединения.
+# Поток занимает поток воркера, поэтому живет недолго: браузер сам
+# переподключается через retry. Записи через другие воркеры (уведомления
+# broker видны только в своем процессе) замечаются по data_versions.
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_MAX_SECONDS = 60
+STREAM_POLL_SECONDS = 5
+STREAM_KINDS = ('events', 'categories', 'templates')
+
+def sse_message(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+@main_bp.route('/api/my/stream')
+@login_required
+def api_my_stream():
+    """Server-Sent Events: статистика и последние события при изменении данных"""
+    if not current_app.config.get('LIVE_UPDATES_SSE', False):
+        # Поток занял бы sync-воркер; дашборд в этом режиме опрашивает статистику
+        return jsonify({'error': 'Live updates are disabled (LIVE_UPDATES_SSE)'}), 404
+    user_id = current_user.id
+    
+    def recent_events():
+        events = Event.query.options(joinedload(Event.category, innerjoin=True)) \
+            .filter(Event.user_id == user_id) \
+            .order_by(Event.start_time.desc(), Event.id.desc()).limit(5).all()
+        return [event_to_dict(e) for e in events]
+    
+    def generate():
+        subscription = broker.subscribe(user_id)
+        started = last_sent = time.monotonic()
+        try:
+            yield 'retry: 3000\n\n'
+            versions = get_versions(user_id, STREAM_KINDS)
+            yield sse_message('stats', stats_payload(get_user_stats(user_id)))
+            db.session.close()
+            
+            while time.monotonic() - started < STREAM_MAX_SECONDS:
+                try:
+                    tables = subscription.get(timeout=STREAM_POLL_SECONDS)
+                except queue.Empty:
+                    tables = set()
+                
+                # Склеиваем пачку изменений в одно обновление
+                while True:
+                    try:
+                        tables |= subscription.get_nowait()
+                    except queue.Empty:
+                        break
+                
+                # Изменения через другие воркеры: версии данных (кэш версий с коротким TTL)
+                current = get_versions(user_id, STREAM_KINDS)
+                remote = {kind for kind in STREAM_KINDS if current[kind] != versions[kind]} - tables
+                versions = current
+                if remote:
+                    # Кэш статистики этого процесса о чужой записи не знает
+                    stats_cache.invalidate(user_id)
+                    tables |= remote
+                
+                if not tables:
+                    db.session.close()
+                    if time.monotonic() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+                        yield ': keepalive\n\n'
+                        last_sent = time.monotonic()
+                    continue
+                
+                yield sse_message('stats', stats_payload(get_user_stats(user_id)))
+                if 'events' in tables:
+                    yield sse_message('events', recent_events())
+                last_sent = time.monotonic()
+                # Не держим соединение с БД между обновлениями
+                db.session.close()
+        finally:
+            broker.unsubscribe(user_id, subscription)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+FREE_SLOTS_MAX_DAYS = 92
+
+@main_bp.route('/api/my/free-slots')
+@login_required
+def api_my_free_slots():
+    """Свободные промежутки времени за период"""
+    try:
+        start = datetime.fromisoformat(request.args['from']) \
+            if request.args.get('from') else datetime.utcnow().replace(second=0, microsecond=0)
+        end = datetime.fromisoformat(request.args['to']) \
+            if request.args.get('to') else start + timedelta(days=7)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    min_minutes = request.args.get('min_minutes', 30, type=int)
+    event_type = request.args.get('type')
+    
+    if end <= start:
+        return jsonify({'error': '"to" must be later than "from"'}), 400
+    if end - start > timedelta(days=FREE_SLOTS_MAX_DAYS):
+        return jsonify({'error': f'Range is limited to {FREE_SLOTS_MAX_DAYS} days'}), 400
+    
+    slots = free_slots(current_user.id, start, end, max(min_minutes, 1), event_type)
+    
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'min_minutes': min_minutes,
+        'slots': [{
+            'start_time': slot_start.isoformat(),
+            'end_time': slot_end.isoformat(),
+            'duration_minutes': int((slot_end - slot_start).total_seconds() / 60)
+        } for slot_start, slot_end in slots]
+    })
+
+@main_bp.route('/api/my/templates/<int:template_id>/expand', methods=['POST'])
+@login_required
+def api_expand_template(template_id):
+    """Развернуть шаблон в события за период (dry_run - только предпросмотр)"""
+    template = Template.query.filter_by(id=template_id, user_id=current_user.id).first()
+    if not template:
+        return jsonify({'error': 'Template not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        date_from = datetime.fromisoformat(data['from']).date()
+        date_to = datetime.fromisoformat(data['to']).date()
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': '"from" and "to" dates are required (YYYY-MM-DD)'}), 400
+    
+    dry_run = bool(data.get('dry_run', False))
+    try:
+        result = expand_template(current_user.id, template, date_from, date_to, dry_run)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'template': template.name,
+        'dry_run': dry_run,
+        'created': result['created'],
+        'skipped': result['skipped'],
+        'events': [{
+            'category_id': row['category_id'],
+            'type': row['type'],
+            'start_time': row['start_time'].isoformat(),
+            'end_time': row['end_time'].isoformat()
+        } for row in result['events']]
+    }), 201 if result['created'] else 200
+
+def export_response(generator, mimetype, extension):
+    """Потоковая выгрузка событий текущего пользователя"""
+    try:
+        start = datetime.fromisoformat(request.args['start_date']) if request.args.get('start_date') else None
+        end = datetime.fromisoformat(request.args['end_date']) if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    response = Response(stream_with_context(generator(current_user.id, start, end)), mimetype=mimetype)
+    filename = f'time-tracker-{datetime.utcnow().strftime("%Y%m%d")}.{extension}'
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@main_bp.route('/api/my/export.csv')
+@login_required
+def api_export_csv():
+    """Экспорт событий в CSV"""
+    return export_response(generate_csv, 'text/csv', 'csv')
+
+@main_bp.route('/api/my/export.ics')
+@login_required
+def api_export_ics():
+    """Экспорт событий в iCalendar"""
+    return export_response(generate_ics, 'text/calendar', 'ics')
+
+IMPORT_MAX_CHUNK_SIZE = 5000
+
+@main_bp.route('/api/my/import', methods=['POST'])
+@login_required
+def api_import_events():
+    """Импорт событий из CSV или iCalendar (multipart, поле file)"""
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'file required'}), 400
+    
+    fmt = request.form.get('format') or detect_format(upload.filename)
+    if fmt not in ('csv', 'ics'):
+        return jsonify({'error': 'Unsupported format, expected csv or ics'}), 400
+    
+    chunk_size = min(max(request.form.get('chunk_size', 1000, type=int), 1), IMPORT_MAX_CHUNK_SIZE)
+    
+    # Файл читается с диска в два прохода, в память целиком не загружается
+    fd, path = tempfile.mkstemp(suffix=f'.{fmt}')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            upload.save(tmp)
+        result = import_events(current_user.id, path, fmt, chunk_size=chunk_size)
+    except UnicodeDecodeError:
+        return jsonify({'error': 'File must be UTF-8 encoded'}), 400
+    finally:
+        os.remove(path)
+    
+    return jsonify({
+        'status': 'success' if not result['errors'] else 'partial',
+        **result
+    }), 201 if result['imported'] else 200
+
+REPORTS_MAX_DAYS = 3660
+
+@main_bp.route('/api/my/reports/<name>')
+@login_required
+def api_my_report(name):
+    """Отчеты за длинные периоды: categories, adherence, heatmap, streaks"""
+    # NumPy загружается при первом отчете, а не при старте воркера
+    from app.reports import build_report, REPORTS
+    
+    if name not in REPORTS:
+        return jsonify({'error': f'Unknown report, expected one of: {", ".join(REPORTS)}'}), 404
+    
+    try:
+        date_to = datetime.fromisoformat(request.args['to']).date() \
+            if request.args.get('to') else datetime.utcnow().date()
+        date_from = datetime.fromisoformat(request.args['from']).date() \
+            if request.args.get('from') else date_to - timedelta(days=364)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format, expected YYYY-MM-DD'}), 400
+    
+    if date_from > date_to:
+        return jsonify({'error': '"from" must not be later than "to"'}), 400
+    if (date_to - date_from).days >= REPORTS_MAX_DAYS:
+        return jsonify({'error': f'Range is limited to {REPORTS_MAX_DAYS} days'}), 400
+    
+    report = build_report(name, current_user.id, date_from, date_to)
+    
+    return jsonify({
+        'report': name,
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        **report
+    })
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+@main_bp.route('/metrics')
+def metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({'error': 'Unauthorized'}), 401
+    elif request.remote_addr not in LOCAL_ADDRESSES:
+        # Без токена метрики отдаются только с самой машины
+        return jsonify({'error': 'Metrics are available only locally unless METRICS_TOKEN is set'}), 403
+    
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
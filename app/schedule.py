@@ -0,0 +1,118 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from app import db
+from app.models import select_events
+from app.bulk import owned_category_ids, bulk_insert_events
+
+# Формат Template.data:
+# {"slots": [{"weekday": "пн" | 0 | [0, 2], "time": "09:00", "duration": 90,
+#             "category_id": 3, "type": "plan"}]}
+Slot = namedtuple('Slot', ['weekdays', 'hour', 'minute', 'duration', 'category_id', 'type'])
+
+WEEKDAYS = {
+    'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6,
+    'пон': 0, 'вто': 1, 'сре': 2, 'чет': 3, 'пят': 4, 'суб': 5, 'вос': 6,
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6
+}
+
+MAX_EXPAND_DAYS = 366
+
+def parse_weekday(value):
+    if isinstance(value, int) and 0 <= value <= 6:
+        return value
+    if isinstance(value, str):
+        key = value.strip().lower()
+        for length in (3, 2):
+            if key[:length] in WEEKDAYS:
+                return WEEKDAYS[key[:length]]
+    raise ValueError(f'Invalid weekday: {value}')
+
+def parse_schedule(data):
+    """Разбор Template.data в список слотов. ValueError при ошибке формата"""
+    if not isinstance(data, dict) or not isinstance(data.get('slots'), list):
+        raise ValueError('Template data must contain a "slots" list')
+
+    slots = []
+    for number, item in enumerate(data['slots'], 1):
+        try:
+            weekdays = item['weekday']
+            weekdays = weekdays if isinstance(weekdays, list) else [weekdays]
+            hour, minute = map(int, str(item['time']).split(':'))
+            duration = int(item['duration'])
+            category_id = int(item['category_id'])
+            event_type = item.get('type', 'plan')
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Slot {number}: weekday, time, duration and category_id are required')
+
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f'Slot {number}: invalid time')
+        if duration <= 0:
+            raise ValueError(f'Slot {number}: duration must be positive')
+        if event_type not in ('plan', 'fact'):
+            raise ValueError(f"Slot {number}: type must be 'plan' or 'fact'")
+
+        slots.append(Slot(
+            tuple(sorted({parse_weekday(day) for day in weekdays})),
+            hour, minute, duration, category_id, event_type
+        ))
+    return slots
+
+def expand_slots(slots, date_from, date_to):
+    """События слотов за период [date_from, date_to] (даты включительно)"""
+    rows = []
+    day = date_from
+    while day <= date_to:
+        for slot in slots:
+            if day.weekday() in slot.weekdays:
+                start_time = datetime(day.year, day.month, day.day, slot.hour, slot.minute)
+                rows.append({
+                    'category_id': slot.category_id,
+                    'type': slot.type,
+                    'start_time': start_time,
+                    'end_time': start_time + timedelta(minutes=slot.duration),
+                    'source': 'template'
+                })
+        day += timedelta(days=1)
+    return rows
+
+def expand_template(user_id, template, date_from, date_to, dry_run=False):
+    """Развернуть шаблон в события за период одной вставкой.
+
+    Уже существующие события (та же категория, тип и время) пропускаются.
+    При dry_run ничего не пишется - возвращается только предпросмотр.
+    """
+    if date_to < date_from:
+        raise ValueError('"from" must not be later than "to"')
+    if (date_to - date_from).days >= MAX_EXPAND_DAYS:
+        raise ValueError(f'Range is limited to {MAX_EXPAND_DAYS} days')
+
+    slots = parse_schedule(template.data)
+
+    # Владение категориями - один запрос
+    owned = owned_category_ids(user_id, {slot.category_id for slot in slots})
+    missing = sorted({slot.category_id for slot in slots} - owned)
+    if missing:
+        raise ValueError(f'Categories not found: {", ".join(map(str, missing))}')
+
+    rows = expand_slots(slots, date_from, date_to)
+
+    # Уже существующие события за период - один запрос по idx_event_user_time (и архиву)
+    range_start = datetime.combine(date_from, datetime.min.time())
+    range_end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    existing = set(db.session.execute(select_events(
+        user_id, ('category_id', 'type', 'start_time', 'end_time'), range_start, range_end
+    )))
+
+    new_rows = [row for row in rows if (
+        row['category_id'], row['type'], row['start_time'], row['end_time']
+    ) not in existing]
+
+    if not dry_run and new_rows:
+        bulk_insert_events(user_id, new_rows)
+        db.session.commit()
+
+    return {
+        'created': 0 if dry_run else len(new_rows),
+        'skipped': len(rows) - len(new_rows),
+        'events': new_rows
+    }
@@ -0,0 +1,62 @@
+from datetime import datetime
+from sqlalchemy import func, case, select
+from app import db
+from app.models import Category, Template, DailyRollup
+from app.cache import TTLCache, on_user_data_changed
+
+# Кэш статистики: user_id -> (дата, stats). Дата в ключе нужна для events_today.
+# TTL ограничивает устаревание, если запись прошла через другой воркер.
+stats_cache = TTLCache(ttl=60, maxsize=10000, name='stats')
+
+@on_user_data_changed
+def _invalidate_stats(user_id, tables):
+    stats_cache.invalidate(user_id)
+
+def get_user_stats(user_id):
+    """Статистика пользователя одним агрегирующим запросом (с кэшем)"""
+    today = datetime.utcnow().date()
+    cached = stats_cache.get(user_id)
+    if cached is not None and cached[0] == today:
+        return cached[1]
+    
+    stats = query_user_stats(user_id, today)
+    stats_cache.set(user_id, (today, stats))
+    return stats
+
+def query_user_stats(user_id, today):
+    """Один запрос по daily_rollups + счетчики категорий и шаблонов.
+    
+    Агрегаты учитывают и архивные события, а их размер растет с числом
+    дней, а не событий, поэтому стоимость не зависит от объема истории.
+    """
+    categories_count = select(func.count(Category.id)).where(
+        Category.user_id == user_id
+    ).scalar_subquery()
+    templates_count = select(func.count(Template.id)).where(
+        Template.user_id == user_id
+    ).scalar_subquery()
+    
+    row = db.session.query(
+        func.sum(DailyRollup.event_count),
+        func.sum(case((DailyRollup.day == today, DailyRollup.event_count), else_=0)),
+        func.sum(case((DailyRollup.type == 'plan', DailyRollup.event_count), else_=0)),
+        func.sum(case((DailyRollup.type == 'fact', DailyRollup.event_count), else_=0)),
+        categories_count,
+        templates_count
+    ).filter(DailyRollup.user_id == user_id).one()
+    
+    total, events_today, plan, fact, categories, templates = row
+    return {
+        'categories': categories or 0,
+        'templates': templates or 0,
+        'events_today': events_today or 0,
+        'events_total': total or 0,
+        'plan': plan or 0,
+        'fact': fact or 0
+    }
+
+def category_event_counts(user_id):
+    """category_id -> число событий (включая архив), один GROUP BY по daily_rollups"""
+    return dict(db.session.query(DailyRollup.category_id, func.sum(DailyRollup.event_count))
+                .filter(DailyRollup.user_id == user_id)
+                .group_by(DailyRollup.category_id))
@@ -0,0 +1,224 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+import re
+from app.matcher import get_matcher
+
+# Разбор сообщений вида "вчера 9:00-10:30 пара; 11-12 обед; 40 мин спорт".
+# Один проход токенизатора по сообщению, записи разделяются ";", "," или переводом строки.
+Entry = namedtuple('Entry', ['start_time', 'end_time', 'type', 'code'])
+
+DEFAULT_MINUTES = 60
+MAX_ENTRY_MINUTES = 24 * 60
+MAX_ENTRIES = 50
+
+TOKEN_RE = re.compile(r'''
+    (?P<sep>[;,\n]+)
+  | (?P<range>(?P<h1>\d{1,2})(?:[:.](?P<m1>\d{2}))?\s*[-–—]\s*(?P<h2>\d{1,2})(?:[:.](?P<m2>\d{2}))?)(?![\d.:])
+  | (?P<date>(?P<day>\d{1,2})\.(?P<month>\d{1,2})(?:\.(?P<year>\d{4}|\d{2}))?)(?![\d:])
+  | (?P<clock>(?P<h>\d{1,2}):(?P<m>\d{2}))(?!\d)
+  | (?P<duration>(?P<amount>\d{1,5}(?:[.,]\d{1,2})?)\s*(?P<unit>[a-zа-яё]+))
+  | (?P<number>\d{1,5})(?![\d.:])
+  | (?P<word>[^\W\d_][\w-]*)
+  | (?P<unknown>\d+|\S)
+''', re.X)
+
+HOUR_UNITS = {'ч', 'час', 'часа', 'часов', 'h', 'hr', 'hour', 'hours'}
+MINUTE_UNITS = {'м', 'мин', 'минута', 'минуты', 'минут', 'm', 'min', 'mins', 'minute', 'minutes'}
+
+DAY_OFFSETS = {
+    'сегодня': 0, 'вчера': -1, 'позавчера': -2, 'завтра': 1, 'послезавтра': 2,
+    'today': 0, 'yesterday': -1, 'tomorrow': 1
+}
+
+# Сокращения дней недели целиком и основы полных названий (с падежами: "в среду")
+WEEKDAY_ABBREVIATIONS = {
+    'пн': 0, 'вт': 1, 'ср': 2, 'чт': 3, 'пт': 4, 'сб': 5, 'вс': 6,
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6
+}
+WEEKDAY_STEMS = (
+    ('понедельник', 0), ('вторник', 1), ('сред', 2), ('четверг', 3), ('пятниц', 4),
+    ('суббот', 5), ('воскресен', 6), ('monday', 0), ('tuesday', 1), ('wednesday', 2),
+    ('thursday', 3), ('friday', 4), ('saturday', 5), ('sunday', 6)
+)
+
+EVENT_TYPES = {'план': 'plan', 'plan': 'plan', 'факт': 'fact', 'fact': 'fact'}
+
+# Предлоги перед датой ("в среду") в код категории не попадают
+STOP_WORDS = {'в', 'во', 'on', 'at'}
+
+def weekday_of(word):
+    if word in WEEKDAY_ABBREVIATIONS:
+        return WEEKDAY_ABBREVIATIONS[word]
+    for stem, weekday in WEEKDAY_STEMS:
+        if word.startswith(stem) and len(word) <= len(stem) + 3:
+            return weekday
+    return None
+
+def clock(day, hours, minutes, number, end=False):
+    hours, minutes = int(hours), int(minutes or 0)
+    if end and hours == 24 and minutes == 0:
+        return datetime.combine(day, datetime.min.time()) + timedelta(days=1)
+    if hours > 23 or minutes > 59:
+        raise ValueError(f'Entry {number}: invalid time {hours}:{minutes:02d}')
+    return datetime(day.year, day.month, day.day, hours, minutes)
+
+class _EntryBuilder:
+    """Состояние одной записи во время прохода токенизатора"""
+
+    def __init__(self, number):
+        self.number = number
+        self.range = None
+        self.clock = None
+        self.minutes = None
+        self.type = None
+        self.words = []
+        self.day = None
+
+    @property
+    def empty(self):
+        return (self.range is None and self.clock is None and self.minutes is None
+                and self.type is None and not self.words)
+
+    def set_time(self, kind, value):
+        if self.range is not None or self.clock is not None:
+            raise ValueError(f'Entry {self.number}: more than one time given')
+        setattr(self, kind, value)
+
+    def add_minutes(self, minutes):
+        self.minutes = (self.minutes or 0) + minutes
+
+    def build(self, day, now, default_minutes):
+        if self.range is not None:
+            h1, m1, h2, m2 = self.range
+            if self.minutes is not None:
+                raise ValueError(f'Entry {self.number}: both time range and duration given')
+            start_time = clock(day, h1, m1, self.number)
+            end_time = clock(day, h2, m2, self.number, end=True)
+            if end_time <= start_time:
+                # "23:00-1:00" - через полночь
+                end_time += timedelta(days=1)
+        else:
+            if self.clock is not None:
+                start_time = clock(day, *self.clock, self.number)
+            else:
+                start_time = datetime.combine(day, now.time()).replace(second=0, microsecond=0)
+            minutes = default_minutes if self.minutes is None else self.minutes
+            if minutes <= 0:
+                raise ValueError(f'Entry {self.number}: duration must be positive')
+            end_time = start_time + timedelta(minutes=minutes)
+
+        if end_time - start_time > timedelta(minutes=MAX_ENTRY_MINUTES):
+            raise ValueError(f'Entry {self.number}: duration is limited to {MAX_ENTRY_MINUTES // 60} hours')
+
+        return Entry(start_time, end_time, self.type, ' '.join(self.words))
+
+def parse_message(text, now=None, default_minutes=DEFAULT_MINUTES):
+    """Записи сообщения: [Entry]. ValueError с номером записи при ошибке.
+
+    Дата ("вчера", "пн", "17.10") действует на свою запись и следующие за ней.
+    Время - диапазон "9-10" / "9:00-10:30", начало "14:30" или длительность
+    ("40 мин", "1,5 ч", "1 ч 30 мин", просто "40" - минуты). Без времени
+    запись начинается сейчас. Оставшиеся слова - код категории. Все
+    остальное ("100500", "!") - ошибка, а не пропуск.
+    """
+    now = now or datetime.utcnow()
+    day = now.date()
+    entries = []
+    current = _EntryBuilder(1)
+
+    def finish():
+        nonlocal current
+        if not current.empty:
+            if len(entries) >= MAX_ENTRIES:
+                raise ValueError(f'Too many entries, max {MAX_ENTRIES}')
+            entries.append(current.build(current.day or day, now, default_minutes))
+            current = _EntryBuilder(len(entries) + 1)
+
+    for match in TOKEN_RE.finditer(text.lower()):
+        # Внешняя группа альтернативы закрывается последней
+        kind = match.lastgroup
+        if kind == 'sep':
+            finish()
+        elif kind == 'range':
+            current.set_time('range', (match['h1'], match['m1'], match['h2'], match['m2']))
+        elif kind == 'clock':
+            current.set_time('clock', (match['h'], match['m']))
+        elif kind == 'date':
+            year = int(match['year']) if match['year'] else now.year
+            year += 2000 if year < 100 else 0
+            try:
+                day = current.day = datetime(year, int(match['month']), int(match['day'])).date()
+            except ValueError:
+                raise ValueError(f'Entry {current.number}: invalid date {match["date"]}')
+        elif kind == 'duration':
+            unit = match['unit']
+            amount = float(match['amount'].replace(',', '.'))
+            if unit in HOUR_UNITS:
+                current.add_minutes(round(amount * 60))
+            elif unit in MINUTE_UNITS:
+                current.add_minutes(round(amount))
+            else:
+                # "40 спорт" - число минут и слово кода
+                current.add_minutes(round(amount))
+                current.words.append(unit)
+        elif kind == 'number':
+            current.add_minutes(int(match['number']))
+        elif kind == 'unknown':
+            raise ValueError(f'Entry {current.number}: unexpected "{match["unknown"]}"')
+        elif kind == 'word':
+            word = match['word']
+            if word in DAY_OFFSETS:
+                day = current.day = now.date() + timedelta(days=DAY_OFFSETS[word])
+            elif word in EVENT_TYPES:
+                current.type = EVENT_TYPES[word]
+            elif word in ('час', 'hour'):
+                current.add_minutes(60)
+            elif word in STOP_WORDS:
+                continue
+            else:
+                weekday = weekday_of(word)
+                if weekday is not None:
+                    # Последний такой день недели (сегодня - если совпадает)
+                    day = current.day = now.date() - timedelta(days=(now.weekday() - weekday) % 7)
+                else:
+                    current.words.append(word)
+    finish()
+
+    if not entries:
+        raise ValueError('Message contains no entries')
+    return entries
+
+def resolve_entries(user_id, entries, category_id=None, default_type='fact', source='telegram'):
+    """Записи -> строки для bulk_insert_events и имена категорий.
+
+    Коды разрешаются одним индексом категорий пользователя (без запросов
+    на запись); category_id используется для записей без кода.
+    """
+    matcher = get_matcher(user_id)
+    rows, names, errors = [], [], []
+
+    for number, entry in enumerate(entries, 1):
+        if entry.code:
+            found = matcher.match(entry.code)
+            if found is None:
+                errors.append(f'Entry {number}: category not found for code "{entry.code}"')
+                continue
+            entry_category_id = found[0]
+        elif category_id is not None:
+            entry_category_id = category_id
+        else:
+            errors.append(f'Entry {number}: category code required')
+            continue
+
+        rows.append({
+            'category_id': entry_category_id,
+            'type': entry.type or default_type,
+            'start_time': entry.start_time,
+            'end_time': entry.end_time,
+            'source': source
+        })
+        names.append(matcher.names.get(entry_category_id))
+
+    if errors:
+        raise ValueError('; '.join(errors))
+    return rows, names
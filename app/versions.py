@@ -0,0 +1,75 @@
+from functools import wraps
+from flask import request, make_response
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models import DataVersion
+from app.cache import TTLCache, on_user_data_changed
+from app.rollups import dialect_insert
+
+# Кэш версий: (user_id, kind) -> version. Локально сбрасывается при записи,
+# короткий TTL ограничивает устаревание при записи через другой воркер.
+version_cache = TTLCache(ttl=5, maxsize=20000, name='versions')
+
+@on_user_data_changed
+def _invalidate_versions(user_id, tables):
+    for kind in tables:
+        version_cache.invalidate((user_id, kind))
+
+@event.listens_for(Session, 'before_commit')
+def _bump_versions(session):
+    """Увеличить версии измененных таблиц в той же транзакции"""
+    session.flush()
+    changed = session.info.get('changed_users')
+    if not changed:
+        return
+    
+    deleted_users = session.info.get('deleted_users', set())
+    rows = [{'user_id': user_id, 'kind': kind, 'version': 1}
+            for user_id, tables in changed.items() if user_id not in deleted_users
+            for kind in tables]
+    if not rows:
+        return
+    
+    connection = session.connection()
+    table = DataVersion.__table__
+    stmt = dialect_insert(connection)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'kind'],
+        set_={'version': table.c.version + 1}
+    )
+    connection.execute(stmt, rows)
+
+def get_versions(user_id, kinds):
+    """Версии данных пользователя (из кэша или одним запросом)"""
+    versions = {kind: version_cache.get((user_id, kind)) for kind in kinds}
+    missing = [kind for kind, version in versions.items() if version is None]
+    if missing:
+        rows = dict(db.session.query(DataVersion.kind, DataVersion.version).filter(
+            DataVersion.user_id == user_id,
+            DataVersion.kind.in_(missing)
+        ))
+        for kind in missing:
+            versions[kind] = rows.get(kind, 0)
+            version_cache.set((user_id, kind), versions[kind])
+    return versions
+
+def versioned(*kinds):
+    """Декоратор GET-эндпоинта: ETag по версиям данных и ответ 304 без запроса данных"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user = getattr(request, 'current_user', None) or current_user
+            versions = get_versions(user.id, kinds)
+            etag = f'{user.id}-' + '-'.join(f'{kind}{versions[kind]}' for kind in kinds)
+            
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
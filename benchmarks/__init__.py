@@ -0,0 +1,4 @@
+"""Воспроизводимые бенчмарки эндпоинтов трекера.
+
+    python -m benchmarks.run --users 5 --events 2000 --requests 200 --output bench.json
+"""
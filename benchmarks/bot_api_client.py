@@ -0,0 +1,90 @@
+"""Сравнение блокирующих requests и асинхронного ApiClient бота.
+
+Поднимает локальный stub-сервер с задержкой ответа и запускает N
+"обработчиков" одновременно, как это делает python-telegram-bot.
+
+    python benchmarks/bot_api_client.py --requests 200 --delay 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'bot'))
+from api_client import ApiClient  # noqa: E402
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Отвечает как /telegram/categories с задержкой server.delay"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        body = json.dumps({'categories': [], 'quick_replies': []}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub(delay):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def run_blocking(url, count):
+    """Старое поведение: requests.get внутри async def"""
+    async def handler():
+        requests.get(f'{url}/telegram/categories', headers={'X-Telegram-ID': '1'})
+    await asyncio.gather(*(handler() for _ in range(count)))
+
+async def run_async(url, count, concurrency):
+    api = ApiClient(url, max_concurrency=concurrency, max_connections=concurrency)
+    try:
+        await asyncio.gather(*(
+            api.get('/telegram/categories', telegram_id=1) for _ in range(count)
+        ))
+    finally:
+        await api.close()
+
+def measure(coro):
+    started = time.perf_counter()
+    asyncio.run(coro)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=0.05, help='Задержка stub-сервера, с')
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+
+    server = start_stub(args.delay)
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    results = {}
+    for name, coro in (
+        ('blocking_requests', run_blocking(url, args.requests)),
+        ('async_api_client', run_async(url, args.requests, args.concurrency)),
+    ):
+        elapsed = measure(coro)
+        results[name] = {
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(args.requests / elapsed, 1)
+        }
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
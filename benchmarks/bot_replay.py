@@ -0,0 +1,224 @@
+"""Воспроизведение обновлений Telegram через приложение бота.
+
+Сравнивает последовательную обработку (как run_polling по умолчанию),
+диспетчер с порядком по чатам и полный путь через webhook-приемник.
+API трекера и Bot API подменяются локальными заглушками с задержкой;
+api_batches показывает, во сколько запросов очередь бота собрала записи.
+
+    python benchmarks/bot_replay.py --chats 50 --per-chat 10 --api-delay 0.05
+    python benchmarks/bot_replay.py --updates recorded.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'bot'))
+
+class StubApiHandler(BaseHTTPRequestHandler):
+    """Ответы API трекера для обработчиков бота с задержкой server.delay"""
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        self.reply(200, {'today': 1, 'total': 10, 'plan': 5, 'fact': 5})
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.server.delay)
+        if self.path.endswith('/telegram/quick'):
+            self.reply(201, {'category': data.get('code')})
+        elif self.path.endswith('/events/batch'):
+            self.server.batches += 1
+            self.server.batched_events += len(data['events'])
+            self.reply(201, {'results': [{'index': i, 'status': 'created', 'event_id': i}
+                                         for i in range(len(data['events']))]})
+        else:
+            self.reply(200, {'status': 'authenticated', 'username': 'replay'})
+
+    def log_message(self, *args):
+        pass
+
+def start_stub_api(delay):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubApiHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.batches = server.batched_events = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Номер сообщения буквами: сообщения с цифрами бот разбирает как время
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+def encode_number(number):
+    return LETTERS[number // 26 // 26 % 26] + LETTERS[number // 26 % 26] + LETTERS[number % 26]
+
+def decode_number(text):
+    return (LETTERS.index(text[0]) * 26 + LETTERS.index(text[1])) * 26 + LETTERS.index(text[2])
+
+def synthetic_updates(chats, per_chat):
+    """Сообщения-коды, перемешанные между чатами; номер в тексте проверяет порядок"""
+    updates, update_id = [], 1
+    for number in range(per_chat):
+        for chat in range(chats):
+            chat_id = 100000 + chat
+            updates.append({
+                'update_id': update_id,
+                'message': {
+                    'message_id': number + 1,
+                    'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private'},
+                    'from': {'id': chat_id, 'is_bot': False, 'first_name': f'User{chat}'},
+                    'text': f'K{encode_number(number)}'
+                }
+            })
+            update_id += 1
+    return updates
+
+def load_updates(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def make_fake_request(delay, sent):
+    from telegram.request import BaseRequest
+
+    class FakeTelegramRequest(BaseRequest):
+        """Bot API в памяти: отвечает успехом и записывает отправленные сообщения"""
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None,
+                             write_timeout=None, connect_timeout=None, pool_timeout=None):
+            endpoint = url.rsplit('/', 1)[-1]
+            params = request_data.parameters if request_data else {}
+            if endpoint == 'getMe':
+                result = {'id': 1, 'is_bot': True, 'first_name': 'Replay', 'username': 'replay_bot'}
+            elif endpoint == 'sendMessage':
+                await asyncio.sleep(delay)
+                sent.append((params['chat_id'], params.get('text', '')))
+                result = {'message_id': len(sent), 'date': int(time.time()),
+                          'chat': {'id': params['chat_id'], 'type': 'private'}, 'text': params.get('text')}
+            else:
+                await asyncio.sleep(delay)
+                result = True
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    return FakeTelegramRequest()
+
+def order_violations(sent):
+    """Сколько ответов пришло в чат не в порядке сообщений"""
+    last, violations = {}, 0
+    for chat_id, text in sent:
+        marker = text.split(': ', 1)[-1].split(' ', 1)[0]
+        if len(marker) != 4 or not marker.startswith('K') or not set(marker[1:]) <= set(LETTERS):
+            continue
+        number = decode_number(marker[1:])
+        if number < last.get(chat_id, -1):
+            violations += 1
+        last[chat_id] = number
+    return violations
+
+async def replay(mode, raw_updates, args):
+    import bot
+    from telegram import Update
+    from dispatcher import ChatOrderedDispatcher
+
+    sent = []
+    application = bot.build_application(
+        token='0:replay', request=make_fake_request(args.telegram_delay, sent), rate_limiter=args.rate_limit
+    )
+    await application.initialize()
+    await application.post_init(application)
+    started = time.perf_counter()
+
+    if mode == 'sequential':
+        for data in raw_updates:
+            await application.process_update(Update.de_json(data, application.bot))
+    elif mode == 'dispatcher':
+        dispatcher = ChatOrderedDispatcher(application.process_update, max_concurrency=args.concurrency)
+        for data in raw_updates:
+            dispatcher.submit(Update.de_json(data, application.bot))
+        await dispatcher.join()
+    else:
+        import aiohttp
+        from aiohttp import web
+        from webhook import create_webhook_app
+
+        dispatcher = ChatOrderedDispatcher(application.process_update, max_concurrency=args.concurrency)
+        runner = web.AppRunner(create_webhook_app(application, dispatcher, secret_token='replay'))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        async with aiohttp.ClientSession() as session:
+            # Telegram доставляет обновления последовательно на каждое соединение
+            for data in raw_updates:
+                async with session.post(f'http://127.0.0.1:{port}/telegram/webhook', json=data,
+                                        headers={'X-Telegram-Bot-Api-Secret-Token': 'replay'}) as response:
+                    response.raise_for_status()
+        await dispatcher.join()
+        await runner.cleanup()
+
+    elapsed = time.perf_counter() - started
+    await application.shutdown()
+    # Отправляет остаток очереди бота и закрывает клиент API
+    await application.post_shutdown(application)
+
+    return {
+        'mode': mode,
+        'updates': len(raw_updates),
+        'seconds': round(elapsed, 3),
+        'updates_per_second': round(len(raw_updates) / elapsed, 1),
+        'messages_sent': len(sent),
+        'order_violations': order_violations(sent)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', default=None, help='JSON lines с записанными обновлениями')
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--per-chat', type=int, default=10)
+    parser.add_argument('--api-delay', type=float, default=0.05, help='Задержка API трекера, с')
+    parser.add_argument('--telegram-delay', type=float, default=0.02, help='Задержка Bot API, с')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--rate-limit', action='store_true', help='Включить лимиты Telegram (медленно)')
+    parser.add_argument('--modes', default='sequential,dispatcher,webhook')
+    args = parser.parse_args()
+
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    server = start_stub_api(args.api_delay)
+    os.environ['API_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+    os.environ.setdefault('TELEGRAM_TOKEN', '0:replay')
+    os.environ['OUTBOX_PATH'] = os.path.join(tempfile.mkdtemp(prefix='tt-replay-'), 'outbox.db')
+
+    raw_updates = load_updates(args.updates) if args.updates else synthetic_updates(args.chats, args.per_chat)
+    results = []
+    for mode in args.modes.split(','):
+        server.batches = server.batched_events = 0
+        result = asyncio.run(replay(mode, raw_updates, args))
+        result.update(api_batches=server.batches, api_events=server.batched_events)
+        results.append(result)
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Пропускная способность при одновременном чтении и записи: с настройками движка и без.
+
+    python -m benchmarks.concurrency --readers 8 --writers 2 --seconds 10
+
+По умолчанию каждый режим работает со своей временной SQLite. С --database-url
+(например, PostgreSQL) база очищается (drop_all) перед каждым режимом.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from benchmarks.run import percentile, git_commit
+
+def make_config(uri, tuned):
+    # Лимиты запросов измеряли бы сами себя, а не пропускную способность БД
+    attributes = {'SQLALCHEMY_DATABASE_URI': uri, 'RATELIMIT_ENABLED': False}
+    if not tuned:
+        # Поведение до настройки: журнал отката SQLite, пул SQLAlchemy по умолчанию
+        attributes.update(SQLITE_PRAGMAS={}, SQLALCHEMY_ENGINE_OPTIONS={})
+    return type('BenchConfig', (Config,), attributes)
+
+def worker(operation, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            ok = operation()
+        except Exception:
+            ok = False
+        if ok:
+            latencies.append((time.perf_counter() - started) * 1000)
+        else:
+            errors.append(1)
+
+def run_mode(uri, tuned, args):
+    from app import create_app, db
+    from benchmarks.datagen import generate
+    from benchmarks.scenarios import logged_in_client
+
+    app = create_app(make_config(uri, tuned))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        users = generate(args.users, 8, args.events, args.seed)
+        journal = None
+        if uri.startswith('sqlite'):
+            journal = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+        db.session.remove()
+
+    def reader(number):
+        client = logged_in_client(app, users[number % len(users)][1])
+        return lambda: client.get('/api/my/events?limit=50').status_code == 200
+
+    def writer(number):
+        client = app.test_client()
+        _, _, telegram_id, categories = users[number % len(users)]
+        return lambda: client.post(
+            '/api/v1/telegram/events', headers={'X-Telegram-ID': telegram_id},
+            json={'time': '10:00-11:00', 'category_id': categories[0], 'type': 'fact'}
+        ).status_code == 201
+
+    operations = [('read', reader(i)) for i in range(args.readers)] + \
+                 [('write', writer(i)) for i in range(args.writers)]
+    results = {kind: ([], []) for kind in ('read', 'write')}
+
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=worker, args=(operation, deadline) + results[kind])
+               for kind, operation in operations]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        db.engine.dispose()
+
+    summary = {'tuned': tuned, 'journal_mode': journal}
+    for kind, (latencies, errors) in results.items():
+        summary[kind] = {
+            'ops_per_second': round(len(latencies) / args.seconds, 1),
+            'errors': len(errors),
+            'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95), 2) if latencies else None
+        }
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    modes = []
+    for tuned in (False, True):
+        uri = args.database_url or \
+            f'sqlite:///{os.path.join(tempfile.mkdtemp(prefix="tt-concurrency-"), "bench.db")}'
+        modes.append(run_mode(uri, tuned, args))
+
+    report = {
+        'commit': git_commit(),
+        'params': {'readers': args.readers, 'writers': args.writers, 'seconds': args.seconds,
+                   'users': args.users, 'events': args.events},
+        'modes': modes
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
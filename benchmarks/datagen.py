@@ -0,0 +1,57 @@
+"""Детерминированный генератор тестовых данных через модели app.models"""
+import random
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import User, Category, Event
+
+CATEGORY_NAMES = [
+    'Пара', 'Обед', 'Спорт', 'Английский язык', 'Домашнее задание', 'Сон', 'Дорога',
+    'Чтение', 'Работа', 'Проект', 'Встреча', 'Отдых', 'Курсовая', 'Лабораторная', 'Семинар'
+]
+
+PASSWORD = 'bench-password'
+
+def generate(users=5, categories=8, events=2000, seed=42, start=datetime(2025, 9, 1)):
+    """Создать users пользователей с categories категориями и events событиями каждый.
+
+    Возвращает список (user_id, username, telegram_id, [category_id]).
+    При одинаковом seed данные совпадают от запуска к запуску.
+    """
+    rng = random.Random(seed)
+    created = []
+
+    for number in range(users):
+        user = User(username=f'bench_user_{number}', telegram_id=str(900000 + number))
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.flush()
+
+        cats = []
+        for index in range(categories):
+            name = CATEGORY_NAMES[index % len(CATEGORY_NAMES)]
+            if index >= len(CATEGORY_NAMES):
+                name = f'{name} {index // len(CATEGORY_NAMES) + 1}'
+            cats.append(Category(name=name, user_id=user.id,
+                                 color='#%06x' % rng.randrange(0x1000000)))
+        db.session.add_all(cats)
+        db.session.flush()
+
+        span_minutes = max(events, 1) * 180
+        batch = []
+        for _ in range(events):
+            start_time = start + timedelta(minutes=rng.randrange(span_minutes) // 15 * 15)
+            batch.append(Event(
+                user_id=user.id,
+                category_id=rng.choice(cats).id,
+                type=rng.choice(('plan', 'fact')),
+                start_time=start_time,
+                end_time=start_time + timedelta(minutes=rng.choice((30, 45, 60, 90, 120))),
+                source=rng.choice(('web', 'telegram'))
+            ))
+        db.session.add_all(batch)
+        db.session.commit()
+
+        created.append((user.id, user.username, user.telegram_id, [c.id for c in cats]))
+
+    return created
@@ -0,0 +1,95 @@
+"""Микро-бенчмарк и фаззинг разбора сообщений (app.textparse).
+
+    python -m benchmarks.parser --iterations 2000 --fuzz 20000
+
+Корпус - benchmarks/parser_corpus.txt. Фаззинг собирает случайные
+сообщения из фрагментов грамматики и мусора; любое исключение, кроме
+ValueError, и любая запись с концом не позже начала считаются ошибкой.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.textparse import parse_message, MAX_ENTRY_MINUTES
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'parser_corpus.txt')
+NOW = datetime(2026, 10, 18, 15, 7)
+
+FRAGMENTS = [
+    '9', '10', '23', '24', '0', '99', ':', ':00', ':30', ':7', '.', '.10', '-', '–', '—', ' ', ' ', ' ',
+    ';', ',', '\n', 'мин', 'ч', 'часа', 'h', 'min', 'пара', 'обед', 'спорт', 'английский язык',
+    'вчера', 'завтра', 'пн', 'в', 'среду', 'sun', 'план', 'факт', '1,5', '17.10', '31.02.2026',
+    '40', '99999', 'ё', '😀', '\t', '#', '(', ')', 'x'
+]
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n').replace('\\n', '\n') for line in f
+                if line.strip() and not line.startswith('#')]
+
+def check(text):
+    """None, если разбор корректен, иначе описание ошибки"""
+    try:
+        entries = parse_message(text, NOW)
+    except ValueError:
+        return None
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+    for entry in entries:
+        if entry.end_time <= entry.start_time:
+            return f'end_time <= start_time: {entry}'
+        if entry.end_time - entry.start_time > timedelta(minutes=MAX_ENTRY_MINUTES):
+            return f'entry too long: {entry}'
+    return None
+
+def fuzz(count, seed):
+    rng = random.Random(seed)
+    failures = []
+    for _ in range(count):
+        text = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 12)))
+        error = check(text)
+        if error:
+            failures.append({'input': text, 'error': error})
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000, help='Проходов по корпусу')
+    parser.add_argument('--fuzz', type=int, default=20000, help='Случайных сообщений')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    corpus_failures = [{'input': text, 'error': error} for text in corpus for error in [check(text)] if error]
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        for text in corpus:
+            try:
+                parse_message(text, NOW)
+            except ValueError:
+                pass
+    elapsed = time.perf_counter() - started
+    messages = args.iterations * len(corpus)
+
+    fuzz_failures = fuzz(args.fuzz, args.seed)
+
+    print(json.dumps({
+        'corpus_messages': len(corpus),
+        'microseconds_per_message': round(elapsed / messages * 1e6, 2),
+        'messages_per_second': round(messages / elapsed),
+        'corpus_failures': corpus_failures,
+        'fuzz_cases': args.fuzz,
+        'fuzz_failures': fuzz_failures[:20],
+        'fuzz_failure_count': len(fuzz_failures)
+    }, indent=2, ensure_ascii=False))
+    sys.exit(1 if corpus_failures or fuzz_failures else 0)
+
+if __name__ == '__main__':
+    main()
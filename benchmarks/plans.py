@@ -0,0 +1,223 @@
+"""Проверка планов горячих запросов: полный просмотр таблицы - ошибка (код выхода 1).
+
+Схема создается миграциями (flask db upgrade) на временной SQLite или пустой
+Postgres (--database-url), данные - benchmarks.datagen. Каждый запрос рабочей
+нагрузки выполняется через test client, все его SELECT/UPDATE/DELETE
+перехватываются и прогоняются через EXPLAIN QUERY PLAN (SQLite) или
+EXPLAIN (FORMAT JSON) с enable_seqscan = off (Postgres: Seq Scan остается
+в плане, только если подходящего индекса нет).
+
+    python -m benchmarks.plans
+    python -m benchmarks.plans --database-url postgresql://... --verbose
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+# Таблицы, растущие с числом событий/пользователей: их полный просмотр запрещен
+WATCHED_TABLES = {
+    'users', 'categories', 'events', 'events_archive', 'templates',
+    'daily_rollups', 'idempotency_keys', 'data_versions', 'category_codes'
+}
+
+def add_idle_users(db, count):
+    """Пользователи без данных: таблица users реального размера для планировщика"""
+    from sqlalchemy import insert
+    from app.models import User
+
+    if count:
+        db.session.execute(insert(User), [
+            {'username': f'idle_user_{number}', 'telegram_id': str(800000 + number)}
+            for number in range(count)
+        ])
+        db.session.commit()
+
+def workload(app, users):
+    """(имя, функция(), ожидаемый статус, индексы, которые должны быть в плане)"""
+    from benchmarks.scenarios import logged_in_client
+    from benchmarks.datagen import PASSWORD
+
+    _, username, telegram_id, categories = users[0]
+    web = logged_in_client(app, username)
+    bot = app.test_client()
+    tg = {'X-Telegram-ID': telegram_id}
+    cursor = web.get('/api/my/events?limit=50').headers.get('X-Next-Cursor')
+
+    return [
+        ('login by username', lambda: app.test_client().post(
+            '/login', data={'identifier': username, 'password': PASSWORD}), 302, ('idx_user_username',)),
+        ('login by telegram_id', lambda: app.test_client().post(
+            '/login', data={'identifier': telegram_id, 'password': PASSWORD}), 302, ()),
+        ('dashboard', lambda: web.get('/dashboard'), 200, ('idx_template_user',)),
+        ('api_my_stats', lambda: web.get('/api/my/stats'), 200, ()),
+        ('api_my_events', lambda: web.get('/api/my/events?limit=50'), 200, ('idx_event_user_time',)),
+        ('api_my_events cursor', lambda: web.get(
+            f'/api/my/events?limit=50&cursor={cursor}'), 200, ('idx_event_user_time',)),
+        ('api_my_events category', lambda: web.get(
+            f'/api/my/events?category_id={categories[0]}&limit=50'), 200, ('idx_event_category_time',)),
+        ('api_my_events type', lambda: web.get(
+            '/api/my/events?type=plan&limit=50'), 200, ('idx_event_user_type_time',)),
+        ('api_my_events period', lambda: web.get(
+            '/api/my/events?start_date=2025-10-01&end_date=2025-11-01'), 200, ('idx_event_user_time',)),
+        ('api_my_analytics', lambda: web.get('/api/my/analytics?from=2025-09-01&to=2025-12-01'), 200, ()),
+        ('api_my_free_slots', lambda: web.get(
+            '/api/my/free-slots?from=2025-10-01T00:00&to=2025-10-08T00:00&type=fact'), 200, ()),
+        ('api_my_report', lambda: web.get(
+            '/api/my/reports/categories?from=2025-09-01&to=2026-08-31'), 200, ('idx_event_user_time',)),
+        ('api_my_export', lambda: web.get('/api/my/export.csv?from=2025-10-01&to=2025-11-01'), 200, ()),
+        ('telegram_categories', lambda: bot.get('/api/v1/telegram/categories', headers=tg), 200, ()),
+        ('telegram_create_event', lambda: bot.post('/api/v1/telegram/events', headers=tg, json={
+            'time': '14:30-16:00', 'category_id': categories[0], 'type': 'fact'}), 201, ()),
+        ('telegram_message', lambda: bot.post('/api/v1/telegram/message', headers=tg, json={
+            'text': '9-10 пара; 11-12 обед'}), 201, ()),
+        ('events_batch', lambda: bot.post('/api/v1/events/batch', headers=dict(tg, **{
+            'Idempotency-Key': 'plans-batch'}), json={'events': [{
+                'category_id': categories[1], 'type': 'fact',
+                'start_time': '2025-10-01T09:00:00', 'end_time': '2025-10-01T10:00:00'}]}), 201, ())
+    ]
+
+class StatementRecorder:
+    """SQL, выполненный на соединениях engine (без executemany)"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.statements = []
+        self.paused = False
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip()[:6].upper()
+        if not self.paused and not executemany and verb in ('SELECT', 'UPDATE', 'DELETE'):
+            self.statements.append((statement, parameters))
+
+def full_scans_sqlite(connection, statement, parameters):
+    """Строки плана SQLite с полным просмотром отслеживаемой таблицы"""
+    plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    details = [row[-1] for row in plan]
+    scans = []
+    for detail in details:
+        words = detail.split()
+        # "SCAN events" / "SCAN events USING INDEX ..." без условия по индексу
+        if words[:1] == ['SCAN'] and len(words) > 1 and words[1] in WATCHED_TABLES \
+                and 'COVERING INDEX' not in detail:
+            scans.append(detail)
+    return scans, details
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from plan_nodes(child)
+
+def full_scans_postgres(connection, statement, parameters):
+    """Узлы плана Postgres с Seq Scan по отслеживаемой таблице"""
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(plan_nodes(plan[0]['Plan']))
+    scans = [f"Seq Scan on {node['Relation Name']}" for node in nodes
+             if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in WATCHED_TABLES]
+    details = [f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".strip()
+               for node in nodes]
+    return scans, details
+
+def check_plans(engine, statements):
+    """[(statement, scans, details)] для уникальных выражений"""
+    explain = full_scans_postgres if engine.dialect.name == 'postgresql' else full_scans_sqlite
+    results, seen = [], set()
+    for statement, parameters in statements:
+        if statement in seen:
+            continue
+        seen.add(statement)
+        with engine.connect() as connection:
+            scans, details = explain(connection, statement, parameters)
+            # SET LOCAL действует до конца транзакции
+            connection.rollback()
+        results.append((statement, scans, details))
+    return results
+
+def schema_drift(db):
+    """Расхождения моделей и миграций (пустой список - схема совпадает)"""
+    from alembic.migration import MigrationContext
+    from alembic.autogenerate import compare_metadata
+
+    with db.engine.connect() as connection:
+        return compare_metadata(MigrationContext.configure(connection), db.metadata)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--events', type=int, default=3000, help='Событий на пользователя')
+    parser.add_argument('--idle-users', type=int, default=5000, help='Пользователей без событий')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--verbose', action='store_true', help='Печатать планы всех запросов')
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.mkdtemp(prefix='tt-plans-')
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmpdir, "plans.db")}'
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from flask_migrate import upgrade
+    from app import create_app, db
+    from app.cache import CACHES
+    from benchmarks.datagen import generate
+
+    app = create_app()
+    with app.app_context():
+        upgrade()
+        drift = schema_drift(db)
+        users = generate(args.users, 8, args.events, args.seed)
+        add_idle_users(db, args.idle_users)
+        # Статистика для планировщика, как после ANALYZE в рабочей базе
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+        recorder = StatementRecorder(db.engine)
+
+    failed = bool(drift)
+    for difference in drift:
+        print(f'SCHEMA DRIFT (models vs migrations): {difference}')
+
+    with app.app_context():
+        recorder.paused = True
+        items = workload(app, users)
+
+    for name, func, expected, indexes in items:
+        # Без кэшей: каждый запрос доходит до БД
+        for cache in CACHES.values():
+            cache.clear()
+        recorder.statements.clear()
+        recorder.paused = False
+        response = func()
+        recorder.paused = True
+        if expected is not None and response.status_code != expected:
+            print(f'FAIL {name}: status {response.status_code}, expected {expected}')
+            failed = True
+            continue
+
+        with app.app_context():
+            results = check_plans(db.engine, recorder.statements)
+        bad = [(statement, scans) for statement, scans, _ in results if scans]
+        plans = ' '.join(detail for _, _, details in results for detail in details)
+        missing = [index for index in indexes if index not in plans]
+        print(f'{"FAIL" if bad or missing else "ok  "} {name}: {len(results)} statements')
+        for statement, scans in bad:
+            print(f'     {"; ".join(scans)}\n     {" ".join(statement.split())[:300]}')
+        if missing:
+            print(f'     expected index not used: {", ".join(missing)}')
+        failed = failed or bool(bad or missing)
+        if args.verbose:
+            for statement, _, details in results:
+                print(f'     {" ".join(statement.split())[:160]}')
+                for detail in details:
+                    print(f'       {detail}')
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
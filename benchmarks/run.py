@@ -0,0 +1,130 @@
+"""Запуск сценариев через Flask test client с замером задержек, запросов к БД и памяти.
+
+По умолчанию - временная SQLite, для Postgres: --database-url postgresql://...
+(база должна быть пустой: схема создается, данные генерируются заново).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+class QueryCounter:
+    """Счетчик SQL-запросов через событие engine before_cursor_execute"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def measure(name, func, iterations, counter):
+    """Выполнить func iterations раз, вернуть сводку по сценарию"""
+    func()  # прогрев (кэши, подготовленные выражения)
+    latencies, queries, statuses = [], [], {}
+    tracemalloc.start()
+    for _ in range(iterations):
+        before = counter.count
+        started = time.perf_counter()
+        status = func()
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count - before)
+        statuses[status] = statuses.get(status, 0) + 1
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'scenario': name,
+        'iterations': iterations,
+        'statuses': {str(k): v for k, v in statuses.items()},
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'mean': round(sum(latencies) / len(latencies), 3)
+        },
+        'queries_per_request': round(sum(queries) / len(queries), 2),
+        'peak_memory_kb': round(peak / 1024, 1)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--categories', type=int, default=8)
+    parser.add_argument('--events', type=int, default=2000, help='Событий на пользователя')
+    parser.add_argument('--requests', type=int, default=200, help='Итераций на сценарий')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--scenarios', default=None, help='Через запятую (по умолчанию все)')
+    parser.add_argument('--output', default=None, help='Файл для JSON (по умолчанию stdout)')
+    args = parser.parse_args(argv)
+
+    tmpdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        tmpdir = tempfile.mkdtemp(prefix='tt-bench-')
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmpdir, "bench.db")}'
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app, db
+    from benchmarks.datagen import generate
+    from benchmarks.scenarios import SCENARIOS
+
+    app = create_app()
+    # Сценарии повторяют один запрос сотни раз - лимиты бота здесь не измеряются
+    app.config['RATELIMIT_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        users = generate(args.users, args.categories, args.events, args.seed)
+        generate_seconds = time.perf_counter() - started
+        counter = QueryCounter(db.engine)
+
+    selected = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    results = []
+    for name in selected:
+        func = SCENARIOS[name](app, users)
+        results.append(measure(name, func, args.requests, counter))
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'params': {
+            'users': args.users, 'categories': args.categories, 'events': args.events,
+            'requests': args.requests, 'seed': args.seed
+        },
+        'generate_seconds': round(generate_seconds, 3),
+        'results': results
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Сценарии: фабрика(app, users) -> функция одной итерации, возвращающая HTTP-статус"""
+import itertools
+
+from benchmarks.datagen import PASSWORD
+
+def logged_in_client(app, username):
+    client = app.test_client()
+    response = client.post('/login', data={'identifier': username, 'password': PASSWORD})
+    assert response.status_code == 302, 'login failed'
+    return client
+
+def round_robin(app, users):
+    """Клиенты всех пользователей по очереди"""
+    return itertools.cycle([logged_in_client(app, username) for _, username, _, _ in users])
+
+def dashboard(app, users):
+    clients = round_robin(app, users)
+    return lambda: next(clients).get('/dashboard').status_code
+
+def api_my_stats(app, users):
+    clients = round_robin(app, users)
+    return lambda: next(clients).get('/api/my/stats').status_code
+
+def api_my_events(app, users):
+    clients = round_robin(app, users)
+    return lambda: next(clients).get('/api/my/events').status_code
+
+def telegram_create_event(app, users):
+    client = app.test_client()
+    targets = itertools.cycle([(telegram_id, categories) for _, _, telegram_id, categories in users])
+
+    def run():
+        telegram_id, categories = next(targets)
+        return client.post('/api/v1/telegram/events', headers={'X-Telegram-ID': telegram_id},
+                           json={'time': '14:30-16:00', 'category_id': categories[0], 'type': 'fact'}).status_code
+    return run
+
+def telegram_quick_event(app, users):
+    client = app.test_client()
+    telegram_ids = itertools.cycle([telegram_id for _, _, telegram_id, _ in users])
+
+    def run():
+        return client.post('/api/v1/telegram/quick', headers={'X-Telegram-ID': next(telegram_ids)},
+                           json={'code': 'ПАР', 'duration': 60}).status_code
+    return run
+
+def login(app, users):
+    usernames = itertools.cycle([username for _, username, _, _ in users])
+
+    def run():
+        client = app.test_client()
+        return client.post('/login', data={'identifier': next(usernames), 'password': PASSWORD}).status_code
+    return run
+
+SCENARIOS = {
+    'dashboard': dashboard,
+    'api_my_stats': api_my_stats,
+    'api_my_events': api_my_events,
+    'telegram_create_event': telegram_create_event,
+    'telegram_quick_event': telegram_quick_event,
+    'login': login
+}
@@ -0,0 +1,66 @@
+"""Время холодного старта воркера: импорт пакета app и create_app() в отдельном процессе.
+
+    python -m benchmarks.startup --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.run import percentile, git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Выполняется в чистом интерпретаторе, печатает JSON с замерами
+PROBE = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000}))
+"""
+
+def measure_once(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    output = subprocess.check_output([sys.executable, '-c', PROBE], cwd=ROOT, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def summary(values):
+    return {
+        'p50': round(percentile(values, 50), 2),
+        'p95': round(percentile(values, 95), 2),
+        'max': round(max(values), 2)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f'sqlite:///{os.path.join(tempfile.mkdtemp(prefix="tt-startup-"), "startup.db")}'
+    runs = [measure_once(database_url) for _ in range(args.runs)]
+    totals = [run['import_ms'] + run['create_app_ms'] for run in runs]
+
+    report = {
+        'commit': git_commit(),
+        'runs': args.runs,
+        'import_ms': summary([run['import_ms'] for run in runs]),
+        'create_app_ms': summary([run['create_app_ms'] for run in runs]),
+        'total_ms': summary(totals)
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Ответы, при которых запрос не дошел до приложения (холодный старт хостинга)
+RETRY_STATUSES = {502, 503, 504}
+
+class ResponseCache:
+    """Кэш ответов API с TTL и ограничением размера (LRU)"""
+
+    def __init__(self, ttl=60, maxsize=5000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        """Свежее значение или None"""
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            return None
+        self._data.move_to_end(key)
+        return item[2]
+
+    def get_stale(self, key):
+        """(etag, value) даже для истекшей записи - для условного запроса"""
+        item = self._data.get(key)
+        return (item[1], item[2]) if item else (None, None)
+
+    def set(self, key, value, etag=None, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires, etag, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+class ApiClient:
+    """Асинхронный клиент API трекера для бота.
+
+    Один общий httpx.AsyncClient с пулом keep-alive соединений, таймаутами,
+    ограниченными повторами с экспоненциальной задержкой и лимитом
+    одновременных запросов. Обработчики бота не блокируют event loop.
+    """
+
+    def __init__(self, base_url, timeout=10.0, retries=2, backoff=0.5,
+                 max_concurrency=20, max_connections=20):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method, path, telegram_id=None, timeout=None, **kwargs):
+        """Запрос с повторами. Возвращает httpx.Response или бросает httpx.HTTPError"""
+        headers = kwargs.pop('headers', {})
+        if telegram_id is not None:
+            headers['X-Telegram-ID'] = str(telegram_id)
+        if timeout is None:
+            timeout = self.timeout
+
+        # Неидемпотентные запросы повторяем, только если они не дошли до сервера
+        idempotent = method in ('GET', 'HEAD')
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await self.client.request(
+                        method, path, headers=headers, timeout=timeout, **kwargs
+                    )
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if attempt == self.retries:
+                    raise
+            except httpx.TransportError:
+                if not idempotent or attempt == self.retries:
+                    raise
+
+            delay = self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+            logger.warning('API %s %s failed, retry in %.2fs', method, path, delay)
+            await asyncio.sleep(delay)
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def get_cached(self, path, cache, telegram_id=None, **kwargs):
+        """GET с локальным TTL-кэшем и перепроверкой через If-None-Match.
+
+        Возвращает (status_code, data). Пока запись свежая, запрос не делается;
+        после истечения TTL сервер отвечает 304 без тела, если данные не менялись.
+        """
+        key = (path, telegram_id)
+        data = cache.get(key)
+        if data is not None:
+            return 200, data
+
+        etag, stale = cache.get_stale(key)
+        headers = kwargs.pop('headers', {})
+        if etag:
+            headers['If-None-Match'] = etag
+
+        response = await self.get(path, telegram_id=telegram_id, headers=headers, **kwargs)
+        if response.status_code == 304 and stale is not None:
+            cache.set(key, stale, etag=etag)
+            return 200, stale
+        if response.status_code == 200:
+            data = response.json()
+            cache.set(key, data, etag=response.headers.get('ETag'))
+            return 200, data
+
+        cache.invalidate(key)
+        return response.status_code, None
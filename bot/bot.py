@@ -1,53 +1,90 @@
 import os
-import requests
+import asyncio
 import logging
+from datetime import timedelta
+import httpx
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
+from api_client import ApiClient, ResponseCache
+from ratelimit import TelegramRateLimiter
+from outbox import Outbox, OutboxFlusher
 
 # Конфигурация
 API_URL = os.environ.get('API_URL', 'https://time-tracker-z6co.onrender.com/api/v1')
 TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN')
 
+# Режим webhook включается, если задан публичный адрес бота
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+WEBHOOK_PORT = int(os.environ.get('PORT', 8443))
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/telegram/webhook')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+BOT_CONCURRENCY = int(os.environ.get('BOT_CONCURRENCY', 32))
+
+# Локальная очередь записей: быстрые события сохраняются, даже если API недоступно
+OUTBOX_PATH = os.environ.get('OUTBOX_PATH', 'bot_outbox.db')
+QUICK_EVENT_MINUTES = 60
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Общий асинхронный клиент API (пул соединений, таймауты, повторы)
+api = ApiClient(API_URL)
+
+# Кэш клавиатур категорий (перепроверяется по ETag) и статуса авторизации
+categories_cache = ResponseCache(ttl=60)
+auth_cache = ResponseCache(ttl=300)
+
+# Создаются при запуске приложения (post_init)
+outbox = None
+flusher = None
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
     user = update.effective_user
     
-    # Проверяем/регистрируем пользователя в системе
-    response = requests.post(f'{API_URL}/telegram/auth', json={
-        'telegram_id': str(user.id),
-        'username': user.username or user.first_name
-    })
-    
-    if response.status_code == 200:
-        data = response.json()
+    # Проверяем/регистрируем пользователя в системе (авторизованных кэшируем)
+    data = auth_cache.get(user.id)
+    if data is None:
+        try:
+            response = await api.post('/telegram/auth', json={
+                'telegram_id': str(user.id),
+                'username': user.username or user.first_name
+            })
+        except httpx.HTTPError:
+            logger.exception('API request failed')
+            await update.message.reply_text('Ошибка подключения к серверу. Попробуйте позже.')
+            return
+        
+        if response.status_code not in (200, 404):
+            await update.message.reply_text('Ошибка подключения к серверу. Попробуйте позже.')
+            return
         
+        data = response.json()
         if data['status'] == 'authenticated':
-            keyboard = [
-                [InlineKeyboardButton("➕ Добавить событие", callback_data='add_event')],
-                [InlineKeyboardButton("📊 Статистика", callback_data='stats')],
-                [InlineKeyboardButton("🏷️ Мои категории", callback_data='categories')],
-            ]
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await update.message.reply_text(
-                f'Привет, {user.first_name}! 👋\n'
-                f'Вы авторизованы как {data["username"]}\n'
-                'Выберите действие:',
-                reply_markup=reply_markup
-            )
-        else:
-            await update.message.reply_text(
-                'Для использования бота необходимо сначала зарегистрироваться '
-                'через веб-интерфейс:\n'
-                f'{data["registration_url"]}'
-            )
+            auth_cache.set(user.id, data)
+    
+    if data['status'] == 'authenticated':
+        keyboard = [
+            [InlineKeyboardButton("➕ Добавить событие", callback_data='add_event')],
+            [InlineKeyboardButton("📊 Статистика", callback_data='stats')],
+            [InlineKeyboardButton("🏷️ Мои категории", callback_data='categories')],
+        ]
+        
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
+        await update.message.reply_text(
+            f'Привет, {user.first_name}! 👋\n'
+            f'Вы авторизованы как {data["username"]}\n'
+            'Выберите действие:',
+            reply_markup=reply_markup
+        )
     else:
-        await update.message.reply_text('Ошибка подключения к серверу. Попробуйте позже.')
+        await update.message.reply_text(
+            'Для использования бота необходимо сначала зарегистрироваться '
+            'через веб-интерфейс:\n'
+            f'{data["registration_url"]}'
+        )
 
 async def add_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Добавление события через бота"""
@@ -56,13 +93,15 @@ async def add_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Получаем категории пользователя
     user_id = query.from_user.id
-    response = requests.get(
-        f'{API_URL}/telegram/categories',
-        headers={'X-Telegram-ID': str(user_id)}
-    )
+    try:
+        status, data = await api.get_cached('/telegram/categories', categories_cache, telegram_id=user_id)
+    except httpx.HTTPError:
+        logger.exception('API request failed')
+        await query.edit_message_text('Ошибка подключения к серверу. Попробуйте позже.')
+        return
     
-    if response.status_code == 200:
-        categories = response.json()['quick_replies']
+    if status == 200:
+        categories = data['quick_replies']
         
         keyboard = []
         row = []
@@ -84,31 +123,48 @@ async def add_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text('Сначала создайте категории через веб-интерфейс.')
 
 async def quick_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Быстрое добавление события по коду"""
-    message_text = update.message.text.strip().upper()
-    user_id = update.effective_user.id
+    """Быстрое добавление события по коду.
+
+    Запись сохраняется в локальную очередь и подтверждается сразу, на сервер
+    она уходит в фоне пакетом. Ответ пользователю не зависит от задержки API.
+    Сообщения со временем ("9-10 пара; 40 мин спорт") идут через ту же
+    очередь целиком, их разбирает сервер.
+    """
+    message_text = update.message.text.strip()
+    start_time = update.message.date.replace(tzinfo=None)
     
-    # Пытаемся создать событие по коду
-    response = requests.post(
-        f'{API_URL}/telegram/quick',
-        headers={'X-Telegram-ID': str(user_id)},
-        json={'code': message_text, 'duration': 60}
-    )
+    if any(ch.isdigit() for ch in message_text) or ';' in message_text:
+        outbox.put(update.update_id, update.effective_user.id, update.effective_chat.id, {
+            'text': message_text,
+            'date': start_time.isoformat(),
+            'source': 'telegram'
+        })
+        flusher.notify()
+        await update.message.reply_text('✅ Принято, события будут добавлены')
+        return
     
-    if response.status_code == 201:
-        data = response.json()
-        await update.message.reply_text(f'✅ Добавлено: {data["category"]} (60 мин)')
-    else:
-        await update.message.reply_text('Категория не найдена. Используйте /start для выбора.')
+    code = message_text.upper()
+    outbox.put(update.update_id, update.effective_user.id, update.effective_chat.id, {
+        'code': code,
+        'type': 'fact',
+        'start_time': start_time.isoformat(),
+        'end_time': (start_time + timedelta(minutes=QUICK_EVENT_MINUTES)).isoformat(),
+        'source': 'telegram_quick'
+    })
+    flusher.notify()
+    
+    await update.message.reply_text(f'✅ Записано: {code} ({QUICK_EVENT_MINUTES} мин)')
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Получение статистики"""
     user_id = update.effective_user.id
     
-    response = requests.get(
-        f'{API_URL}/telegram/stats',
-        headers={'X-Telegram-ID': str(user_id)}
-    )
+    try:
+        response = await api.get('/telegram/stats', telegram_id=user_id)
+    except httpx.HTTPError:
+        logger.exception('API request failed')
+        await update.message.reply_text('Не удалось получить статистику.')
+        return
     
     if response.status_code == 200:
         stats = response.json()
@@ -122,9 +178,45 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         await update.message.reply_text('Не удалось получить статистику.')
 
-def main():
-    """Запуск бота"""
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+async def report_rejected(application, chat_id, payload, error):
+    """Сообщить пользователю, что запись из очереди сервер не принял"""
+    if 'text' in payload:
+        text = f'Не удалось добавить "{payload["text"]}": {error}'
+    elif 'Category not found' in (error or ''):
+        text = f'Категория "{payload["code"]}" не найдена. Используйте /start для выбора.'
+    else:
+        text = f'Не удалось сохранить "{payload["code"]}": {error}'
+    await application.bot.send_message(chat_id, text)
+
+async def start_outbox(application: Application):
+    """Открытие очереди и запуск фоновой отправки"""
+    global outbox, flusher
+    outbox = Outbox(OUTBOX_PATH)
+    
+    async def on_failed(chat_id, payload, error):
+        await report_rejected(application, chat_id, payload, error)
+    
+    flusher = OutboxFlusher(outbox, api, on_failed=on_failed)
+    flusher.start()
+    # Записи, оставшиеся с прошлого запуска
+    flusher.notify()
+
+async def close_api(application: Application):
+    """Отправка остатка очереди и закрытие пула соединений API при остановке бота"""
+    if flusher:
+        await flusher.stop()
+    if outbox:
+        outbox.close()
+    await api.close()
+
+def build_application(token=TELEGRAM_TOKEN, request=None, rate_limiter=True):
+    """Приложение бота с обработчиками (request подменяется в бенчмарках)"""
+    builder = Application.builder().token(token).post_init(start_outbox).post_shutdown(close_api)
+    if request is not None:
+        builder = builder.request(request)
+    if rate_limiter:
+        builder = builder.rate_limiter(TelegramRateLimiter())
+    application = builder.build()
     
     # Регистрация обработчиков
     application.add_handler(CommandHandler("start", start))
@@ -132,9 +224,21 @@ def main():
     application.add_handler(CallbackQueryHandler(add_event, pattern='^add_event$'))
     application.add_handler(CallbackQueryHandler(add_event, pattern='^cat_'))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, quick_event))
+    return application
+
+def main():
+    """Запуск бота"""
+    application = build_application()
     
-    # Запуск бота
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if WEBHOOK_URL:
+        # Webhook: разные чаты обрабатываются параллельно, один чат - по порядку
+        from webhook import serve_webhook
+        asyncio.run(serve_webhook(
+            application, WEBHOOK_URL, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET, max_concurrency=BOT_CONCURRENCY
+        ))
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ChatOrderedDispatcher:
+    """Параллельная обработка обновлений с сохранением порядка внутри чата.
+
+    Обновления разных чатов обрабатываются одновременно (не больше
+    max_concurrency), обновления одного чата - строго по очереди: каждое
+    ждет завершения предыдущего, не занимая при этом слот семафора.
+    """
+
+    def __init__(self, process, max_concurrency=32, max_pending=10000):
+        self.process = process
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tails = {}
+        self._tasks = set()
+
+    @property
+    def pending(self):
+        return len(self._tasks)
+
+    @property
+    def overloaded(self):
+        return len(self._tasks) >= self.max_pending
+
+    @staticmethod
+    def chat_key(update):
+        chat = getattr(update, 'effective_chat', None)
+        return chat.id if chat else None
+
+    def submit(self, update):
+        """Поставить обновление в обработку, не дожидаясь результата"""
+        key = self.chat_key(update)
+        previous = self._tails.get(key) if key is not None else None
+        task = asyncio.create_task(self._run(update, previous))
+
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if key is not None:
+            self._tails[key] = task
+            task.add_done_callback(lambda t, key=key: self._release_tail(key, t))
+        return task
+
+    def _release_tail(self, key, task):
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _run(self, update, previous):
+        if previous is not None:
+            # Ошибка предыдущего обновления не должна останавливать очередь чата
+            await asyncio.wait([previous])
+        async with self._semaphore:
+            try:
+                await self.process(update)
+            except Exception:
+                logger.exception('Update processing failed')
+
+    async def join(self):
+        """Дождаться обработки всех принятых обновлений"""
+        while self._tasks:
+            await asyncio.wait(set(self._tasks))
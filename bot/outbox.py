@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import time
+import httpx
+
+logger = logging.getLogger(__name__)
+
+class Outbox:
+    """Локальная очередь записей в SQLite, ключ - update_id Telegram.
+
+    Повторная доставка того же обновления не создает вторую запись.
+    Операции - короткие локальные транзакции, поэтому выполняются прямо
+    в event loop.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                update_id INTEGER PRIMARY KEY,
+                telegram_id TEXT NOT NULL,
+                chat_id INTEGER,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+        ''')
+
+    def put(self, update_id, telegram_id, chat_id, payload):
+        """Добавить запись. False, если обновление уже было в очереди"""
+        cursor = self.db.execute(
+            'INSERT OR IGNORE INTO outbox (update_id, telegram_id, chat_id, payload, created_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (update_id, str(telegram_id), chat_id, json.dumps(payload), time.time())
+        )
+        return cursor.rowcount == 1
+
+    def pending(self, limit=500):
+        """Самые старые записи: [(update_id, telegram_id, chat_id, payload)]"""
+        rows = self.db.execute(
+            'SELECT update_id, telegram_id, chat_id, payload FROM outbox ORDER BY update_id LIMIT ?',
+            (limit,)
+        ).fetchall()
+        return [(update_id, telegram_id, chat_id, json.loads(payload))
+                for update_id, telegram_id, chat_id, payload in rows]
+
+    def remove(self, update_ids):
+        if update_ids:
+            self.db.executemany('DELETE FROM outbox WHERE update_id = ?', [(i,) for i in update_ids])
+
+    def mark_attempt(self, update_ids):
+        if update_ids:
+            self.db.executemany('UPDATE outbox SET attempts = attempts + 1 WHERE update_id = ?',
+                                [(i,) for i in update_ids])
+
+    def exhausted(self, update_ids, max_attempts):
+        """Из update_ids - записи, у которых уже max_attempts неудачных попыток"""
+        if not update_ids:
+            return set()
+        placeholders = ','.join('?' * len(update_ids))
+        return {update_id for (update_id,) in self.db.execute(
+            f'SELECT update_id FROM outbox WHERE attempts >= ? AND update_id IN ({placeholders})',
+            (max_attempts, *update_ids)
+        )}
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+def retry_after(error):
+    """Retry-After из ответа API в секундах (0, если заголовка нет)"""
+    response = getattr(error, 'response', None)
+    try:
+        return min(float(response.headers.get('Retry-After', 0)), 300.0) if response is not None else 0.0
+    except ValueError:
+        return 0.0
+
+class OutboxFlusher:
+    """Фоновая отправка очереди в /events/batch (и событий, и сообщений).
+
+    Записи, пришедшие почти одновременно, собираются в один запрос на
+    пользователя (linger). Пока API недоступно, попытки повторяются с
+    экспоненциальной задержкой; записи удаляются только после ответа
+    сервера. idempotency_key = update_id, поэтому повтор пакета после
+    обрыва связи не создает дубликатов. on_failed(chat_id, payload, error)
+    вызывается для записей, которые сервер отклонил окончательно.
+
+    Попыткой считается ошибка сервера (5xx), а не недоступность API: запись,
+    на которой сервер падает max_attempts раз подряд, удаляется из очереди
+    и сообщается через on_failed, чтобы не держать отправку остальных
+    на максимальной задержке.
+    """
+
+    def __init__(self, outbox, api, on_failed=None, batch_size=200, linger=0.2,
+                 interval=5.0, backoff=1.0, max_backoff=60.0, max_attempts=10):
+        self.outbox = outbox
+        self.api = api
+        self.on_failed = on_failed
+        self.batch_size = batch_size
+        self.linger = linger
+        self.interval = interval
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self._wake = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._task = None
+        self._failures = 0
+
+    def notify(self):
+        """Сообщить о новой записи в очереди"""
+        self._wake.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self, drain_timeout=5.0):
+        """Остановить фоновую отправку после последней попытки отправить остаток.
+
+        Задача не прерывается посреди запроса: иначе уже принятые сервером
+        записи остались бы в очереди и ушли повторно.
+        """
+        if not self._task:
+            return
+        self._stopping.set()
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task = None
+        if len(self.outbox):
+            logger.warning('Outbox not drained, %d entries left for next start', len(self.outbox))
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self._stopping.is_set():
+                # Небольшая пауза собирает всплеск сообщений в один пакет
+                await asyncio.sleep(self.linger)
+            self._wake.clear()
+
+            try:
+                await self.flush()
+                self._failures = 0
+            except httpx.HTTPError as e:
+                if self._stopping.is_set():
+                    return
+                self._failures += 1
+                delay = min(self.max_backoff, self.backoff * 2 ** (self._failures - 1))
+                delay *= 0.5 + random.random() / 2
+                # 429/503 от API: пауза не короче указанной сервером
+                delay = max(delay, retry_after(e))
+                logger.warning('Outbox flush failed (%s), %d pending, retry in %.1fs',
+                               e, len(self.outbox), delay)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    # Повтор сразу после паузы, не дожидаясь новых записей
+                    self._wake.set()
+
+            if self._stopping.is_set():
+                return
+
+    async def flush(self):
+        """Отправить всю очередь. httpx.HTTPError, если API недоступно"""
+        while True:
+            entries = self.outbox.pending(self.batch_size)
+            if not entries:
+                return
+            by_user = {}
+            for entry in entries:
+                by_user.setdefault(entry[1], []).append(entry)
+            # Пакеты разных пользователей уходят параллельно (в пределах лимита ApiClient)
+            results = await asyncio.gather(
+                *(self._send(telegram_id, user_entries) for telegram_id, user_entries in by_user.items()),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+    async def _send(self, telegram_id, entries):
+        update_ids = [update_id for update_id, _, _, _ in entries]
+        response = await self.api.post('/events/batch', telegram_id=telegram_id, json={
+            'events': [dict(payload, idempotency_key=f'tg-{update_id}')
+                       for update_id, _, _, payload in entries]
+        })
+
+        if response.status_code >= 500 or response.status_code in (409, 429):
+            if response.status_code >= 500:
+                self.outbox.mark_attempt(update_ids)
+                exhausted = self.outbox.exhausted(update_ids, self.max_attempts)
+                if exhausted:
+                    self.outbox.remove(list(exhausted))
+                    await self._report([
+                        (entry, f'API returned {response.status_code} {self.max_attempts} times, giving up')
+                        for entry in entries if entry[0] in exhausted
+                    ])
+                    if len(exhausted) == len(entries):
+                        return
+            raise httpx.HTTPStatusError(f'API returned {response.status_code}',
+                                        request=response.request, response=response)
+
+        if response.status_code in (200, 201):
+            results = response.json()['results']
+            failed = [(entry, result.get('error')) for entry, result in zip(entries, results)
+                      if result['status'] == 'error']
+        else:
+            # Пользователь не зарегистрирован или запрос неверен - повтор не поможет
+            failed = [(entry, f'API returned {response.status_code}') for entry in entries]
+
+        self.outbox.remove(update_ids)
+        await self._report(failed)
+
+    async def _report(self, failed):
+        """[(запись, ошибка)] - удаленные из очереди без сохранения на сервере"""
+        for (_, _, chat_id, payload), error in failed:
+            logger.warning('Outbox entry rejected: %s (%s)', error, payload)
+            if self.on_failed:
+                try:
+                    await self.on_failed(chat_id, payload, error)
+                except Exception:
+                    logger.exception('Failed to report rejected entry')
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+class TelegramRateLimiter(BaseRateLimiter):
+    """Ограничение исходящих запросов к Bot API по лимитам Telegram.
+
+    Не больше overall_per_second сообщений в секунду всего, одно сообщение
+    в секунду в личный чат и group_per_minute в минуту в группу. Слоты
+    резервируются заранее, поэтому ожидание не требует блокировок. Ответ
+    429 (RetryAfter) повторяется после указанной паузы.
+    """
+
+    def __init__(self, overall_per_second=30, chat_interval=1.0, group_per_minute=20,
+                 max_retries=2, max_tracked_chats=10000):
+        self.overall_interval = 1 / overall_per_second if overall_per_second else 0
+        self.chat_interval = chat_interval
+        self.group_interval = 60 / group_per_minute if group_per_minute else 0
+        self.max_retries = max_retries
+        self.max_tracked_chats = max_tracked_chats
+        self._next_overall = 0.0
+        self._next_chat = {}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @staticmethod
+    def is_group(chat_id):
+        # У групп и каналов отрицательный id, каналы могут задаваться как @name
+        return isinstance(chat_id, str) or chat_id < 0
+
+    def _reserve_chat(self, chat_id, now):
+        if len(self._next_chat) > self.max_tracked_chats:
+            self._next_chat = {k: v for k, v in self._next_chat.items() if v > now}
+        interval = self.group_interval if self.is_group(chat_id) else self.chat_interval
+        start = max(now, self._next_chat.get(chat_id, now))
+        self._next_chat[chat_id] = start + interval
+        return start - now
+
+    def _reserve_overall(self, now):
+        start = max(now, self._next_overall)
+        self._next_overall = start + self.overall_interval
+        return start - now
+
+    async def _wait(self, chat_id):
+        loop = asyncio.get_running_loop()
+        delay = self._reserve_chat(chat_id, loop.time())
+        if delay > 0:
+            await asyncio.sleep(delay)
+        delay = self._reserve_overall(loop.time())
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        for attempt in range(self.max_retries + 1):
+            # Лимиты касаются сообщений в чаты; getMe, setWebhook и т.п. не ограничиваются
+            if chat_id is not None:
+                await self._wait(chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning('Telegram rate limit hit (%s), retry in %ss', endpoint, e.retry_after)
+                await asyncio.sleep(e.retry_after)
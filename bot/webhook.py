@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from aiohttp import web
+from telegram import Update
+from dispatcher import ChatOrderedDispatcher
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+def create_webhook_app(application, dispatcher, path='/telegram/webhook', secret_token=None):
+    """aiohttp-приложение, принимающее обновления Telegram.
+
+    Обновление сразу передается диспетчеру, ответ 200 не ждет обработки.
+    При переполнении очереди отвечаем 503 - Telegram повторит доставку позже.
+    """
+    async def receive(request):
+        if secret_token and request.headers.get(SECRET_HEADER) != secret_token:
+            return web.Response(status=403)
+        if dispatcher.overloaded:
+            return web.Response(status=503)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        dispatcher.submit(Update.de_json(data, application.bot))
+        return web.Response()
+
+    async def health(request):
+        return web.json_response({'status': 'ok', 'pending': dispatcher.pending})
+
+    app = web.Application()
+    app.router.add_post(path, receive)
+    app.router.add_get('/healthz', health)
+    return app
+
+async def serve_webhook(application, webhook_url, listen='0.0.0.0', port=8443,
+                        path='/telegram/webhook', secret_token=None, max_concurrency=32):
+    """Запуск бота в режиме webhook до остановки процесса"""
+    dispatcher = ChatOrderedDispatcher(application.process_update, max_concurrency=max_concurrency)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    await application.bot.set_webhook(
+        webhook_url.rstrip('/') + path,
+        secret_token=secret_token,
+        allowed_updates=Update.ALL_TYPES,
+        max_connections=max_concurrency
+    )
+
+    runner = web.AppRunner(create_webhook_app(application, dispatcher, path, secret_token))
+    await runner.setup()
+    await web.TCPSite(runner, listen, port).start()
+    logger.info('Webhook listening on %s:%s%s', listen, port, path)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await dispatcher.join()
+        await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -1,8 +1,88 @@
 import os
 from datetime import timedelta
 
+def database_url():
+    url = os.environ.get('DATABASE_URL') or 'sqlite:///time_tracker.db'
+    if url.startswith('postgres://'):
+        url = url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
 class Config:
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'BD_Kursach'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///time_tracker.db'
+    SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
+    SQLALCHEMY_DATABASE_URI = database_url()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+    
+    # Метрики: заголовок Server-Timing и доступ к /metrics.
+    # С METRICS_TOKEN нужен заголовок "Authorization: Bearer <токен>", без него
+    # /metrics отвечает только на запросы с 127.0.0.1/::1 (за обратным прокси на
+    # той же машине это значит "всем" - тогда токен обязателен)
+    METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Живые обновления дашборда через Server-Sent Events (/api/my/stream).
+    # Каждая открытая вкладка держит поток воркера до минуты, поэтому включать
+    # только с воркерами для долгих ответов: gunicorn -k gthread --threads 32
+    # (или -k gevent). По умолчанию дашборд опрашивает /api/my/stats раз в 30 с.
+    LIVE_UPDATES_SSE = os.environ.get('LIVE_UPDATES_SSE', '').lower() in ('1', 'true', 'yes')
+    
+    # События старше стольких полных месяцев переносит в архив flask archive-events
+    EVENTS_HOT_MONTHS = env_int('EVENTS_HOT_MONTHS', 6)
+    
+    # Ограничение частоты запросов API бота (/api/v1): (запросов в минуту, пачка)
+    # по X-Telegram-ID и по IP. Все запросы бота приходят с одного IP, поэтому
+    # лимит по IP заметно выше. RATELIMIT_STORAGE: memory (у каждого воркера свой)
+    # или sqlite:////путь/ratelimit.db (общий для воркеров на одной машине)
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE', 'memory')
+    RATELIMIT_TRUSTED_PROXIES = env_int('RATELIMIT_TRUSTED_PROXIES', 0)
+    RATELIMIT_DEFAULT = {'telegram_id': (120, 30), 'ip': (1200, 200)}
+    RATELIMIT_ENDPOINTS = {
+        'api.telegram_auth': {'telegram_id': (20, 5), 'ip': (300, 50)},
+        'api.telegram_categories': {'telegram_id': (60, 20)},
+        'api.telegram_create_event': {'telegram_id': (30, 10)},
+        'api.telegram_quick_event': {'telegram_id': (60, 20)},
+        'api.telegram_message': {'telegram_id': (30, 10)},
+        'api.batch_create_events': {'telegram_id': (30, 10)}
+    }
+    
+    # Сброс нагрузки: дешевые чтения отклоняются с 503, если одновременных
+    # запросов в процессе больше SHED_MAX_INFLIGHT или среднее ожидание
+    # соединения из пула БД выше SHED_POOL_WAIT_MS
+    SHED_MAX_INFLIGHT = env_int('SHED_MAX_INFLIGHT', 64)
+    SHED_POOL_WAIT_MS = env_int('SHED_POOL_WAIT_MS', 200)
+    SHED_ENDPOINTS = ('api.telegram_auth', 'api.telegram_categories')
+    
+    # SQLite: PRAGMA для каждого нового соединения.
+    # WAL - читатели не блокируются писателем, NORMAL - fsync только на checkpoint
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'cache_size': -env_int('SQLITE_CACHE_KB', 20000),
+        'temp_store': 'MEMORY'
+    }
+    
+    # PostgreSQL: пул соединений и ограничение времени запроса
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 10)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 20)
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)
+    DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 1800)
+    DB_STATEMENT_TIMEOUT_MS = env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+    
+    @classmethod
+    def engine_options(cls, uri):
+        """SQLALCHEMY_ENGINE_OPTIONS для выбранной СУБД"""
+        if uri.startswith('postgresql'):
+            return {
+                'pool_size': cls.DB_POOL_SIZE,
+                'max_overflow': cls.DB_MAX_OVERFLOW,
+                'pool_timeout': cls.DB_POOL_TIMEOUT,
+                'pool_recycle': cls.DB_POOL_RECYCLE,
+                'pool_pre_ping': True,
+                'connect_args': {'options': f'-c statement_timeout={cls.DB_STATEMENT_TIMEOUT_MS}'}
+            }
+        return {}
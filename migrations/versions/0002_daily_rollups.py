@@ -0,0 +1,64 @@
+"""daily rollups
+
+Агрегаты событий по дням (app/rollups.py). Для уже существующих событий
+агрегаты заполняются здесь же, как flask rebuild-rollups.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 20:12:42.000000
+
+"""
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    rollups = op.create_table('daily_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=10), nullable=False),
+    sa.Column('total_minutes', sa.Integer(), nullable=False),
+    sa.Column('event_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day', 'category_id', 'type')
+    )
+    backfill(rollups)
+
+
+def backfill(rollups):
+    """Агрегаты по событиям, созданным до появления daily_rollups"""
+    if op.get_context().as_sql:
+        return
+    events = sa.table('events',
+        sa.column('user_id', sa.Integer), sa.column('category_id', sa.Integer),
+        sa.column('start_time', sa.DateTime), sa.column('end_time', sa.DateTime),
+        sa.column('type', sa.String)
+    )
+    totals = defaultdict(lambda: [0, 0])
+    query = sa.select(events.c.user_id, events.c.start_time, events.c.end_time,
+                      events.c.category_id, events.c.type)
+    for user_id, start_time, end_time, category_id, event_type in op.get_bind().execute(query):
+        total = totals[(user_id, start_time.date(), category_id, event_type)]
+        # Минуты считаются как app.rollups.event_minutes
+        total[0] += int((end_time - start_time).total_seconds() / 60)
+        total[1] += 1
+    if totals:
+        op.bulk_insert(rollups, [{
+            'user_id': user_id, 'day': day, 'category_id': category_id, 'type': event_type,
+            'total_minutes': minutes, 'event_count': count
+        } for (user_id, day, category_id, event_type), (minutes, count) in totals.items()])
+
+
+def downgrade():
+    op.drop_table('daily_rollups')
@@ -0,0 +1,34 @@
+"""idempotency keys
+
+Ключи идемпотентности пакетной загрузки событий (/api/v1/events/batch).
+event_id без внешнего ключа: событие может быть перенесено в events_archive.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 20:12:43.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_keys',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=128), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'key')
+    )
+
+
+def downgrade():
+    op.drop_table('idempotency_keys')
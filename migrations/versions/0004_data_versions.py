@@ -0,0 +1,32 @@
+"""data versions
+
+Версии данных пользователя по таблицам (ETag для API бота).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 20:12:44.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_versions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'kind')
+    )
+
+
+def downgrade():
+    op.drop_table('data_versions')
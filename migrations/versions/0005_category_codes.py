@@ -0,0 +1,33 @@
+"""category codes
+
+Короткие коды категорий для быстрого ввода в Telegram.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 20:12:45.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('category_codes',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('code', sa.String(length=20), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'code')
+    )
+
+
+def downgrade():
+    op.drop_table('category_codes')
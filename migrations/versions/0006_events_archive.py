@@ -0,0 +1,41 @@
+"""events archive
+
+Архив старых событий (flask archive-events), на PostgreSQL - секции по месяцам.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 20:12:46.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('events_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('end_time', sa.DateTime(), nullable=False),
+    sa.Column('type', sa.String(length=10), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('source', sa.String(length=20), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id', 'start_time'),
+    postgresql_partition_by='RANGE (start_time)'
+    )
+    op.create_index('idx_event_archive_user_time', 'events_archive', ['user_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_event_archive_user_time', table_name='events_archive')
+    op.drop_table('events_archive')
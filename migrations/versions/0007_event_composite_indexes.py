@@ -0,0 +1,45 @@
+"""event composite indexes
+
+Составные индексы под горячие запросы (проверка: python -m benchmarks.plans).
+На PostgreSQL индексы строятся CONCURRENTLY, без блокировки записи в events.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 20:13:42.500582
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('idx_event_user_type_time', 'events', ['user_id', 'type', 'start_time'], False),
+    ('idx_event_category_time', 'events', ['category_id', 'start_time'], False),
+    ('idx_template_user', 'templates', ['user_id'], False),
+    # Не уникальный: в существующих базах имена могут повторяться
+    ('idx_user_username', 'users', ['username'], False),
+)
+
+
+def concurrently():
+    return {'postgresql_concurrently': op.get_context().dialect.name == 'postgresql'}
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, **concurrently())
+        # Избыточен: совпадает с префиксом idx_event_user_time
+        op.drop_index('idx_event_user', table_name='events', **concurrently())
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index('idx_event_user', 'events', ['user_id'], **concurrently())
+        for name, table, columns, unique in reversed(INDEXES):
+            op.drop_index(name, table_name=table, **concurrently())
@@ -0,0 +1,42 @@
+"""events autoincrement
+
+На SQLite id удаленной строки с наибольшим id выдается снова. После
+переноса самых новых по id событий в архив новое событие получило бы id
+архивного и столкнулось с ним в объединенной ленте, поэтому events
+пересоздается с AUTOINCREMENT, а счетчик начинается после архивных id.
+На PostgreSQL последовательность id не откатывается, миграция пустая.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 20:14:10.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('events', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'events'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'events', COALESCE(MAX(id), 0) FROM ("
+        "SELECT MAX(id) AS id FROM events UNION ALL SELECT MAX(id) FROM events_archive)"
+    )
+
+
+def downgrade():
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('events', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
@@ -3,4 +3,11 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
+    # Локальный запуск: один процесс, поэтому схему и администратора можно
+    # создать здесь. В продакшене - flask init-db перед стартом воркеров.
+    from app.commands import init_db, seed_admin
+    with app.app_context():
+        init_db()
+        if seed_admin():
+            print("✅ Created default admin user")
     app.run()
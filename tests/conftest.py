@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+PASSWORD = 'test-password'
+
+@pytest.fixture
+def config_class(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        RATELIMIT_ENABLED = False
+    return TestConfig
+
+@pytest.fixture
+def app(config_class):
+    """Приложение на временной SQLite, схема - миграциями (flask init-db)"""
+    from app import create_app, db
+    from app.cache import CACHES
+    from app.commands import init_db
+
+    app = create_app(config_class)
+    with app.app_context():
+        init_db()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    # Кэши общие для процесса, а id пользователей в новых базах повторяются
+    for cache in CACHES.values():
+        cache.clear()
+
+@pytest.fixture
+def user(app):
+    """(id, username, telegram_id, [id категорий])"""
+    from app import db
+    from app.models import User, Category
+
+    with app.app_context():
+        user = User(username='alice', telegram_id='1001')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.flush()
+        categories = [Category(user_id=user.id, name=name) for name in ('Учеба', 'Работа')]
+        db.session.add_all(categories)
+        db.session.commit()
+        return user.id, user.username, user.telegram_id, [category.id for category in categories]
+
+@pytest.fixture
+def web(app, user):
+    """Клиент с выполненным входом"""
+    client = app.test_client()
+    response = client.post('/login', data={'identifier': user[1], 'password': PASSWORD})
+    assert response.status_code == 302
+    return client
+
+@pytest.fixture
+def bot(app, user):
+    """Клиент API бота с заголовком X-Telegram-ID"""
+    client = app.test_client()
+    client.environ_base['HTTP_X_TELEGRAM_ID'] = user[2]
+    return client
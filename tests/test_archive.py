@@ -0,0 +1,50 @@
+from datetime import datetime
+
+CUTOFF = datetime(2025, 6, 1)
+
+def batch(bot, category_id, key, start='2025-01-10T09:00:00', end='2025-01-10T10:00:00'):
+    return bot.post('/api/v1/events/batch', json={'events': [{
+        'category_id': category_id, 'type': 'fact',
+        'start_time': start, 'end_time': end, 'idempotency_key': key}]})
+
+def test_archive_keeps_idempotency_keys(app, user, bot):
+    from app.archive import archive_events
+
+    assert batch(bot, user[3][0], 'tg-1').status_code == 201
+    with app.app_context():
+        assert archive_events(cutoff=CUTOFF) == 1
+
+    response = batch(bot, user[3][0], 'tg-1')
+    assert response.status_code == 200
+    assert response.get_json()['duplicate'] == 1
+
+def test_archived_ids_are_not_reused(app, user, web, bot):
+    from app import db
+    from app.archive import archive_events
+    from app.models import Event, ArchivedEvent
+
+    # Самое новое по id событие - старое по времени и уходит в архив
+    batch(bot, user[3][0], 'a', '2025-09-01T09:00:00', '2025-09-01T10:00:00')
+    batch(bot, user[3][0], 'b')
+    with app.app_context():
+        archived_id = db.session.query(Event.id).filter(Event.start_time < CUTOFF).scalar()
+        assert archive_events(cutoff=CUTOFF) == 1
+        assert db.session.get(ArchivedEvent, (archived_id, datetime(2025, 1, 10, 9))) is not None
+
+    batch(bot, user[3][0], 'c', '2025-09-02T09:00:00', '2025-09-02T10:00:00')
+    ids = [item['id'] for item in web.get('/api/my/events?start_date=2024-01-01&limit=100').get_json()]
+    assert len(ids) == 3
+    assert len(set(ids)) == 3
+    assert max(ids) > archived_id
+
+def test_stats_unchanged_by_archive(app, user, web, bot):
+    from app.archive import archive_events
+    from app.cache import CACHES
+
+    batch(bot, user[3][0], 'a')
+    batch(bot, user[3][0], 'b', '2025-09-01T09:00:00', '2025-09-01T11:00:00')
+    before = web.get('/api/my/stats').get_json()
+    with app.app_context():
+        archive_events(cutoff=CUTOFF)
+    CACHES['stats'].clear()
+    assert web.get('/api/my/stats').get_json() == before
@@ -0,0 +1,83 @@
+def post_batch(bot, *events):
+    return bot.post('/api/v1/events/batch', json={'events': list(events)})
+
+def test_idempotency_key_replay(app, user, bot):
+    item = {'category_id': user[3][0], 'type': 'fact', 'idempotency_key': 'tg-1',
+            'start_time': '2025-10-01T09:00:00', 'end_time': '2025-10-01T10:00:00'}
+    first = post_batch(bot, item)
+    assert first.status_code == 201
+    replay = post_batch(bot, item).get_json()
+    assert (replay['created'], replay['duplicate']) == (0, 1)
+    assert replay['results'][0]['event_id'] == first.get_json()['results'][0]['event_id']
+
+def test_duplicate_key_within_batch(app, user, bot):
+    item = {'category_id': user[3][0], 'idempotency_key': 'k',
+            'start_time': '2025-10-01T09:00:00', 'end_time': '2025-10-01T10:00:00'}
+    body = post_batch(bot, item, dict(item)).get_json()
+    assert [r['status'] for r in body['results']] == ['created', 'error']
+
+def test_foreign_category_rejected(app, user, bot):
+    body = post_batch(bot, {'category_id': 9999,
+                            'start_time': '2025-10-01T09:00:00', 'end_time': '2025-10-01T10:00:00'})
+    assert body.get_json()['results'][0]['error'] == 'Category not found'
+
+def test_message_item(app, user, bot):
+    from app import db
+    from app.models import CategoryCode, Event
+
+    with app.app_context():
+        db.session.add_all([CategoryCode(user_id=user[0], code='пара', category_id=user[3][0]),
+                            CategoryCode(user_id=user[0], code='обед', category_id=user[3][1])])
+        db.session.commit()
+
+    item = {'text': '9-10 пара; 11-12 обед', 'date': '2025-10-01T18:00:00', 'idempotency_key': 'tg-7'}
+    body = post_batch(bot, item).get_json()
+    result = body['results'][0]
+    assert result['status'] == 'created'
+    assert len(result['event_ids']) == 2
+
+    replay = post_batch(bot, item).get_json()
+    assert replay['results'][0] == {'index': 0, 'status': 'duplicate', 'event_id': result['event_ids'][0]}
+    with app.app_context():
+        assert db.session.query(Event).count() == 2
+
+def test_message_item_parse_error(app, user, bot):
+    body = post_batch(bot, {'text': '100500', 'idempotency_key': 'tg-8'}).get_json()
+    assert body['results'][0]['status'] == 'error'
+    assert 'unexpected' in body['results'][0]['error']
+
+def stored_times(app, event_id):
+    from app import db
+    from app.models import Event
+
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        return event.start_time.isoformat(), event.end_time.isoformat()
+
+def test_offsets_converted_to_utc(app, user, bot):
+    body = post_batch(bot, {'category_id': user[3][0],
+                            'start_time': '2025-10-01T12:00:00+03:00',
+                            'end_time': '2025-10-01T10:30:00Z'}).get_json()
+    assert body['results'][0]['status'] == 'created'
+    assert stored_times(app, body['results'][0]['event_id']) == ('2025-10-01T09:00:00', '2025-10-01T10:30:00')
+
+def test_mixed_aware_and_naive_times(app, user, bot):
+    response = post_batch(bot, {'category_id': user[3][0],
+                                'start_time': '2025-10-01T09:00:00',
+                                'end_time': '2025-10-01T12:00:00+03:00'})
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['error'] == 'end_time must be later than start_time'
+
+def test_message_date_offset(app, user, bot):
+    from app import db
+    from app.models import CategoryCode
+
+    with app.app_context():
+        db.session.add(CategoryCode(user_id=user[0], code='сон', category_id=user[3][0]))
+        db.session.commit()
+
+    # 01:30 по Москве - еще 30 сентября в UTC, "вчера" - 29 сентября
+    response = bot.post('/api/v1/telegram/message', json={
+        'text': 'вчера 9-10 сон', 'date': '2025-10-01T01:30:00+03:00'})
+    assert response.status_code == 201
+    assert response.get_json()['events'][0]['start_time'] == '2025-09-29T09:00:00'
@@ -0,0 +1,26 @@
+def test_categories_etag(app, user, bot, web):
+    first = bot.get('/api/v1/telegram/categories')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    again = bot.get('/api/v1/telegram/categories', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+
+    web.post('/categories', data={'name': 'Спорт', 'color': '#ff0000'})
+    changed = bot.get('/api/v1/telegram/categories', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert 'Спорт' in [category['name'] for category in changed.get_json()['categories']]
+
+def test_etag_is_per_user(app, user, bot):
+    from app import db
+    from app.models import User
+
+    with app.app_context():
+        db.session.add(User(username='bob', telegram_id='2002'))
+        db.session.commit()
+    etag = bot.get('/api/v1/telegram/categories').headers['ETag']
+    other = app.test_client().get('/api/v1/telegram/categories',
+                                  headers={'X-Telegram-ID': '2002', 'If-None-Match': etag})
+    assert other.status_code == 200
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+@pytest.fixture
+def events(app, user, bot):
+    """25 событий, по два с одинаковым start_time (порядок задает id)"""
+    items = [{'category_id': user[3][number % 2], 'type': 'fact',
+              'start_time': f'2025-10-{1 + number // 2:02d}T09:00:00',
+              'end_time': f'2025-10-{1 + number // 2:02d}T10:00:00'} for number in range(25)]
+    assert bot.post('/api/v1/events/batch', json={'events': items}).status_code == 201
+
+def test_keyset_pages_cover_all_events(events, web):
+    seen, cursor = [], None
+    while True:
+        response = web.get('/api/my/events?limit=7' + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        page = response.get_json()
+        seen.extend(page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        assert len(page) == 7
+    assert len(seen) == 25
+    assert len({event['id'] for event in seen}) == 25
+    keys = [(event['start_time'], event['id']) for event in seen]
+    assert keys == sorted(keys, reverse=True)
+
+def test_filters(events, web, user):
+    page = web.get(f'/api/my/events?category_id={user[3][0]}&start_date=2025-10-05').get_json()
+    assert page and all(event['category'] == 'Учеба' and event['start_time'] >= '2025-10-05' for event in page)
+    assert web.get('/api/my/events?type=plan').get_json() == []
+
+def test_invalid_cursor(events, web):
+    assert web.get('/api/my/events?cursor=not-a-cursor').status_code == 400
+
+def test_ndjson_stream(events, web):
+    response = web.get('/api/my/events', headers={'Accept': 'application/x-ndjson'})
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 25
+    assert json.loads(lines[0])['start_time'] == '2025-10-13T09:00:00'
@@ -0,0 +1,99 @@
+import io
+
+CSV = '''category,type,start_time,end_time,duration_minutes
+Учеба,fact,2025-10-01T12:00:00+03:00,2025-10-01T10:30:00Z,
+Учеба,fact,2025-10-01T09:00:00,2025-10-01T11:00:00+03:00,
+Спорт,план,2025-10-02T18:00:00,,45
+,fact,2025-10-03T09:00:00,2025-10-03T10:00:00,
+Спорт,fact,не время,2025-10-03T10:00:00,
+'''
+
+ICS = '''BEGIN:VCALENDAR
+BEGIN:VEVENT
+SUMMARY:Работа (Факт)
+DTSTART:20251001T090000Z
+DTEND:20251001T100000Z
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Работа (План)
+DTSTART:20251001T100000Z
+END:VEVENT
+END:VCALENDAR
+'''
+
+def upload(web, content, filename):
+    return web.post('/api/my/import', data={'file': (io.BytesIO(content.encode()), filename)},
+                    content_type='multipart/form-data')
+
+def test_csv_import_with_offsets_and_bad_rows(app, user, web):
+    from app import db
+    from app.models import Event
+
+    response = upload(web, CSV, 'events.csv')
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['imported'], body['errors'], body['categories_created']) == (2, 3, 1)
+    assert [error['line'] for error in body['error_report']] == [3, 5, 6]
+    assert body['error_report'][0]['error'] == 'end_time must be later than start_time'
+
+    with app.app_context():
+        times = sorted((e.start_time.isoformat(), e.end_time.isoformat(), e.type)
+                       for e in db.session.query(Event))
+    assert times == [('2025-10-01T09:00:00', '2025-10-01T10:30:00', 'fact'),
+                     ('2025-10-02T18:00:00', '2025-10-02T18:45:00', 'plan')]
+
+def test_ics_import(app, user, web):
+    body = upload(web, ICS, 'events.ics').get_json()
+    assert (body['imported'], body['errors']) == (1, 1)
+    # Категория "Работа" уже есть у пользователя
+    assert body['categories_created'] == 0
+
+def test_unsupported_format(app, user, web):
+    assert upload(web, 'x', 'events.txt').status_code == 400
+
+def test_failed_rows_do_not_create_categories(app, user, web):
+    from app import db
+    from app.models import Category
+
+    body = upload(web, 'category,type,start_time,end_time\nМусор,fact,не время,\n', 'events.csv').get_json()
+    assert (body['imported'], body['errors'], body['categories_created']) == (0, 1, 0)
+    with app.app_context():
+        assert db.session.query(Category).filter_by(name='Мусор').count() == 0
+
+def test_non_utf8_file_rejected(app, user, web):
+    response = web.post('/api/my/import', content_type='multipart/form-data',
+                        data={'file': (io.BytesIO('Учеба,fact'.encode('cp1251')), 'events.csv')})
+    assert response.status_code == 400
+    assert 'UTF-8' in response.get_json()['error']
+
+ICS_TZ = '''BEGIN:VCALENDAR
+BEGIN:VEVENT
+SUMMARY:Работа
+DTSTART;TZID=Europe/Moscow:20251001T090000
+DTEND;TZID=Europe/Moscow:20251001T100000
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Работа
+DTSTART:20251002T090000Z
+DURATION:PT1H30M
+END:VEVENT
+BEGIN:VEVENT
+SUMMARY:Работа
+DTSTART;TZID=Mars/Olympus:20251003T090000
+DURATION:PT1H
+END:VEVENT
+END:VCALENDAR
+'''
+
+def test_ics_tzid_and_duration(app, user, web):
+    from app import db
+    from app.models import Event
+
+    body = upload(web, ICS_TZ, 'events.ics').get_json()
+    assert (body['imported'], body['errors']) == (2, 1)
+    assert body['error_report'][0]['error'] == 'unknown TZID: Mars/Olympus'
+
+    with app.app_context():
+        times = sorted((e.start_time.isoformat(), e.end_time.isoformat()) for e in db.session.query(Event))
+    assert times == [('2025-10-01T06:00:00', '2025-10-01T07:00:00'),
+                     ('2025-10-02T09:00:00', '2025-10-02T10:30:00')]
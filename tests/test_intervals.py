@@ -0,0 +1,33 @@
+from sqlalchemy import text
+
+URL = '/api/my/free-slots?from=2025-10-01T08:00&to=2025-10-01T12:00'
+
+def slots(web):
+    return [(slot['start_time'], slot['end_time']) for slot in web.get(URL).get_json()['slots']]
+
+def test_free_slots_after_local_write(app, user, web, bot):
+    assert slots(web) == [('2025-10-01T08:00:00', '2025-10-01T12:00:00')]
+    bot.post('/api/v1/events/batch', json={'events': [{
+        'category_id': user[3][0], 'start_time': '2025-10-01T09:00:00', 'end_time': '2025-10-01T10:00:00'}]})
+    assert slots(web) == [('2025-10-01T08:00:00', '2025-10-01T09:00:00'),
+                          ('2025-10-01T10:00:00', '2025-10-01T12:00:00')]
+
+def test_free_slots_see_writes_of_other_workers(app, user, web):
+    from app import db
+    from app.cache import CACHES
+
+    assert len(slots(web)) == 1
+    # Другой воркер: событие и версия, без уведомлений этого процесса
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO events (user_id, category_id, start_time, end_time, type) "
+                "VALUES (:user_id, :category_id, '2025-10-01 09:00:00', '2025-10-01 10:00:00', 'fact')"
+            ), {'user_id': user[0], 'category_id': user[3][0]})
+            connection.execute(text(
+                "INSERT INTO data_versions (user_id, kind, version) VALUES (:user_id, 'events', 1)"
+            ), {'user_id': user[0]})
+    # Истек TTL кэша версий (индексы недель остаются в кэше)
+    CACHES['versions'].clear()
+
+    assert len(slots(web)) == 2
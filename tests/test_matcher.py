@@ -0,0 +1,51 @@
+from sqlalchemy import text
+
+from app.matcher import CategoryMatcher, MATCH_CODE, MATCH_EXACT, MATCH_PREFIX, MATCH_INITIALS, MATCH_SUBSTRING
+
+def test_match_levels():
+    matcher = CategoryMatcher([(1, 'Английский язык'), (2, 'Английский'), (3, 'Спорт')], [('en', 1)])
+    assert matcher.match('EN') == (1, MATCH_CODE)
+    assert matcher.match('английский') == (2, MATCH_EXACT)
+    assert matcher.match('англ') == (2, MATCH_PREFIX)
+    assert matcher.match('ая') == (1, MATCH_INITIALS)
+    assert matcher.match('порт') == (3, MATCH_SUBSTRING)
+    assert matcher.match('музыка') is None
+
+def test_dollar_in_category_names():
+    matcher = CategoryMatcher([(1, 'Доход $'), (2, 'Доход'), (3, 'a$b'), (4, 'a'), (5, 'C$')])
+    assert matcher.match('доход $') == (1, MATCH_EXACT)
+    assert matcher.match('дох') == (2, MATCH_PREFIX)
+    assert matcher.match('a$') == (3, MATCH_PREFIX)
+    assert matcher.match('c$') == (5, MATCH_EXACT)
+
+def test_category_added_by_other_worker(app, user, bot):
+    from app import db
+    from app.cache import CACHES
+
+    assert bot.post('/api/v1/telegram/quick', json={'code': 'спорт'}).status_code == 404
+
+    # Другой воркер: новая категория и версия, без уведомлений этого процесса
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text("INSERT INTO categories (name, user_id) VALUES ('Спорт', :user_id)"),
+                               {'user_id': user[0]})
+            connection.execute(text(
+                "UPDATE data_versions SET version = version + 1 WHERE user_id = :user_id AND kind = 'categories'"
+            ), {'user_id': user[0]})
+    # Истек TTL кэша версий (индекс категорий остается в кэше)
+    CACHES['versions'].clear()
+
+    response = bot.post('/api/v1/telegram/quick', json={'code': 'спорт'})
+    assert response.status_code == 201
+    assert response.get_json()['category'] == 'Спорт'
+
+def test_local_rename_visible_immediately(app, user, bot):
+    from app import db
+    from app.models import Category
+
+    assert bot.post('/api/v1/telegram/quick', json={'code': 'учеба'}).status_code == 201
+    with app.app_context():
+        db.session.get(Category, user[3][0]).name = 'Лекции'
+        db.session.commit()
+    assert bot.post('/api/v1/telegram/quick', json={'code': 'учеба'}).status_code == 404
+    assert bot.post('/api/v1/telegram/quick', json={'code': 'лекции'}).status_code == 201
@@ -0,0 +1,15 @@
+REMOTE = {'REMOTE_ADDR': '203.0.113.7'}
+
+def test_metrics_local_only_without_token(app):
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base=REMOTE).status_code == 403
+
+def test_metrics_require_token(app):
+    app.config['METRICS_TOKEN'] = 'secret'
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', environ_base=REMOTE, headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert 'db_n_plus_one_total' in response.get_data(as_text=True)
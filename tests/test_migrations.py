@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import inspect, text
+
+@pytest.fixture
+def baseline_app(config_class):
+    """База, созданная db.create_all() до появления миграций: таблицы 0001 без alembic_version"""
+    from flask_migrate import upgrade
+    from app import create_app, db
+
+    app = create_app(config_class)
+    with app.app_context():
+        upgrade(revision='0001')
+        with db.engine.begin() as connection:
+            connection.execute(text('DROP TABLE alembic_version'))
+            # Повторяющиеся имена в старых базах не мешают индексу по username
+            connection.execute(text(
+                "INSERT INTO users (id, username, telegram_id) VALUES (1, 'bob', '1'), (2, 'bob', '2')"
+            ))
+            connection.execute(text("INSERT INTO categories (id, name, user_id) VALUES (1, 'Работа', 1)"))
+            connection.execute(text(
+                "INSERT INTO events (user_id, category_id, start_time, end_time, type) "
+                "VALUES (1, 1, '2025-10-01 09:00:00', '2025-10-01 10:30:00', 'fact')"
+            ))
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+def test_init_db_upgrades_baseline_database(baseline_app):
+    from app import db
+    from app.commands import init_db
+    from app.models import Event, DailyRollup
+
+    with baseline_app.app_context():
+        init_db()
+        inspector = inspect(db.engine)
+        tables = set(inspector.get_table_names())
+        assert {'daily_rollups', 'idempotency_keys', 'data_versions',
+                'category_codes', 'events_archive'} <= tables
+        indexes = {index['name'] for index in inspector.get_indexes('users')}
+        assert 'idx_user_username' in indexes
+        assert db.session.query(Event).count() == 1
+        # Агрегаты заполнены по существующим событиям
+        rollup = db.session.query(DailyRollup).one()
+        assert (rollup.user_id, rollup.total_minutes, rollup.event_count) == (1, 90, 1)
+        sql = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = 'events'")).scalar()
+        assert 'AUTOINCREMENT' in sql
+        assert {'idx_event_user_time', 'idx_event_user_type_time', 'idx_event_category_time'} <= \
+            {index['name'] for index in inspector.get_indexes('events')}
+        version = db.session.execute(text('SELECT version_num FROM alembic_version')).scalar()
+        assert version == current_head(baseline_app)
+
+def test_models_match_migrations(app):
+    from benchmarks.plans import schema_drift
+    from app import db
+
+    with app.app_context():
+        assert schema_drift(db) == []
+
+def test_init_db_is_idempotent(app):
+    from app import db
+    from app.commands import init_db
+
+    with app.app_context():
+        init_db()
+        assert 'events' in inspect(db.engine).get_table_names()
+
+def current_head(app):
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory(app.extensions['migrate'].directory).get_current_head()
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bot'))
+
+from outbox import Outbox, OutboxFlusher
+
+class FakeApi:
+    """POST /events/batch: заданный статус для всех пакетов"""
+
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    async def post(self, path, telegram_id=None, json=None):
+        self.calls += 1
+        request = httpx.Request('POST', f'http://api{path}')
+        if self.status >= 400:
+            return httpx.Response(self.status, json={'error': 'boom'}, request=request)
+        results = [{'index': index, 'status': 'created', 'event_id': index}
+                   for index in range(len(json['events']))]
+        return httpx.Response(201, json={'results': results}, request=request)
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / 'outbox.db'))
+    yield outbox
+    outbox.close()
+
+def test_entry_dropped_after_max_attempts(outbox):
+    failed = []
+
+    async def on_failed(chat_id, payload, error):
+        failed.append((chat_id, payload, error))
+
+    async def run():
+        flusher = OutboxFlusher(outbox, FakeApi(500), on_failed=on_failed, max_attempts=3)
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await flusher.flush()
+        assert len(outbox) == 1 and not failed
+        # Третья ошибка сервера - запись удаляется и сообщается
+        await flusher.flush()
+
+    outbox.put(1, '100', 42, {'code': 'ПАРА'})
+    asyncio.run(run())
+    assert len(outbox) == 0
+    assert failed == [(42, {'code': 'ПАРА'}, 'API returned 500 3 times, giving up')]
+
+def test_unavailable_api_is_not_an_attempt(outbox):
+    class DownApi:
+        async def post(self, *args, **kwargs):
+            raise httpx.ConnectError('down')
+
+    async def run():
+        flusher = OutboxFlusher(outbox, DownApi(), max_attempts=1)
+        for _ in range(3):
+            with pytest.raises(httpx.ConnectError):
+                await flusher.flush()
+
+    outbox.put(1, '100', 42, {'code': 'ПАРА'})
+    asyncio.run(run())
+    assert len(outbox) == 1
+
+def test_rate_limited_is_not_an_attempt(outbox):
+    async def run():
+        flusher = OutboxFlusher(outbox, FakeApi(429), max_attempts=1)
+        with pytest.raises(httpx.HTTPStatusError):
+            await flusher.flush()
+
+    outbox.put(1, '100', 42, {'code': 'ПАРА'})
+    asyncio.run(run())
+    assert len(outbox) == 1
+
+def test_sent_entries_removed(outbox):
+    api = FakeApi(201)
+    for update_id in range(3):
+        outbox.put(update_id, str(100 + update_id % 2), 42, {'code': 'ПАРА'})
+    asyncio.run(OutboxFlusher(outbox, api).flush())
+    assert len(outbox) == 0
+    assert api.calls == 2
@@ -0,0 +1,52 @@
+import pytest
+
+from app.ratelimit import MemoryStore, refill_and_take
+
+@pytest.fixture
+def config_class(config_class):
+    class RateLimitedConfig(config_class):
+        RATELIMIT_ENABLED = True
+        RATELIMIT_DEFAULT = {'telegram_id': (60, 3), 'ip': (600, 100)}
+        RATELIMIT_ENDPOINTS = {}
+    return RateLimitedConfig
+
+def test_bucket_refills():
+    store = MemoryStore()
+    assert [store.take('k', 60, 2, now=0)[0] for _ in range(3)] == [True, True, False]
+    allowed, retry_after = store.take('k', 60, 2, now=0)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    assert store.take('k', 60, 2, now=1.0)[0]
+
+def test_refill_is_capped_by_burst():
+    tokens, allowed, _ = refill_and_take(0, 0, 3600, 1.0, 5)
+    assert allowed and tokens == 4
+
+def test_too_many_requests(app, user, bot):
+    statuses = [bot.get('/api/v1/telegram/categories').status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+    response = bot.get('/api/v1/telegram/categories')
+    assert int(response.headers['Retry-After']) >= 1
+    # Лимит у каждого telegram_id свой
+    other = app.test_client().get('/api/v1/telegram/categories', headers={'X-Telegram-ID': '555'})
+    assert other.status_code != 429
+
+def test_shed_when_overloaded(app, user, bot):
+    _, shedder = app.extensions['ratelimit']
+    shedder.max_inflight = 0
+    # Текущий запрос тоже в счетчике: 1 > 0
+    response = bot.get('/api/v1/telegram/categories')
+    assert response.status_code == 503
+    assert shedder.shed == 1
+    assert shedder.inflight == 0
+
+def test_streams_not_counted_as_inflight(app, user, web, monkeypatch):
+    import app.routes.main_routes as routes
+
+    monkeypatch.setattr(routes, 'STREAM_POLL_SECONDS', 0.05)
+    app.config['LIVE_UPDATES_SSE'] = True
+    _, shedder = app.extensions['ratelimit']
+    response = web.get('/api/my/stream', buffered=False)
+    next(iter(response.response))
+    assert shedder.inflight == 0
+    response.close()
+    assert shedder.inflight == 0
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+def add_events(bot, user, *items):
+    events = [{'category_id': user[3][0], 'type': event_type,
+               'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=1)).isoformat()}
+              for event_type, start in items]
+    assert bot.post('/api/v1/events/batch', json={'events': events}).status_code == 201
+
+def test_stats_counts(app, user, web, bot):
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    add_events(bot, user, ('plan', now), ('fact', now), ('fact', now - timedelta(days=3)))
+    stats = web.get('/api/my/stats').get_json()['stats']
+    assert stats == {'categories': 2, 'templates': 0, 'events_today': 2, 'events_total': 3,
+                     'plans_vs_facts': {'plan': 1, 'fact': 2}}
+
+def test_stats_cache_invalidated_on_write(app, user, web, bot):
+    assert web.get('/api/my/stats').get_json()['stats']['events_total'] == 0
+    add_events(bot, user, ('plan', datetime(2025, 10, 1, 9)))
+    assert web.get('/api/my/stats').get_json()['stats']['events_total'] == 1
+
+def test_dashboard_counts_without_n_plus_one(app, user, web, bot):
+    from app.metrics import registry
+    start = datetime(2025, 10, 1, 9)
+    add_events(bot, user, *[('fact', start + timedelta(days=day)) for day in range(6)])
+    registry.reset()
+    page = web.get('/dashboard').get_data(as_text=True)
+    assert '(6)' in page and '(0)' in page
+    assert registry.n_plus_one['main.dashboard'] == 0
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import text
+
+@pytest.fixture
+def fast_stream(app, monkeypatch):
+    import app.routes.main_routes as routes
+
+    app.config['LIVE_UPDATES_SSE'] = True
+    monkeypatch.setattr(routes, 'STREAM_POLL_SECONDS', 0.05)
+    monkeypatch.setattr(routes, 'STREAM_MAX_SECONDS', 2)
+
+def next_event(chunks):
+    for chunk in chunks:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith('event:'):
+            return chunk.split('\n')[0][len('event: '):]
+    return None
+
+def test_stream_sees_writes_of_other_workers(app, user, web, fast_stream):
+    from app import db
+    from app.cache import CACHES
+
+    response = web.get('/api/my/stream', buffered=False)
+    chunks = iter(response.response)
+    assert next_event(chunks) == 'stats'
+
+    # Запись другим воркером: без уведомлений этого процесса, только версия данных
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO events (user_id, category_id, start_time, end_time, type, source, created_at) "
+                "VALUES (:user_id, :category_id, '2025-10-01 09:00:00', '2025-10-01 10:00:00', 'fact', "
+                "'web', '2025-10-01 10:00:00')"
+            ), {'user_id': user[0], 'category_id': user[3][0]})
+            connection.execute(text(
+                "INSERT INTO data_versions (user_id, kind, version) VALUES (:user_id, 'events', 1)"
+            ), {'user_id': user[0]})
+    # Истек TTL кэша версий
+    CACHES['versions'].clear()
+
+    assert next_event(chunks) == 'stats'
+    assert next_event(chunks) == 'events'
+    response.close()
+
+def test_stream_ends(app, user, web, fast_stream, monkeypatch):
+    import app.routes.main_routes as routes
+
+    monkeypatch.setattr(routes, 'STREAM_MAX_SECONDS', 0.2)
+    response = web.get('/api/my/stream', buffered=False)
+    chunks = list(response.response)
+    assert sum(1 for chunk in chunks if b'event: stats' in chunk) == 1
+
+def test_stream_disabled_by_default(app, user, web):
+    assert web.get('/api/my/stream').status_code == 404
+    assert 'const liveUpdates = false' in web.get('/dashboard').get_data(as_text=True)
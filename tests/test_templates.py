@@ -0,0 +1,36 @@
+import json
+
+SCHEDULE = {'slots': [{'weekday': ['mon', 'wed'], 'time': '09:00', 'duration': 90, 'type': 'plan'}]}
+
+def create_template(web, user, name='Неделя'):
+    schedule = {'slots': [dict(SCHEDULE['slots'][0], category_id=user[3][0])]}
+    return web.post('/templates', data={'name': name, 'data': json.dumps(schedule)})
+
+def test_templates_page(app, user, web):
+    assert web.get('/templates').status_code == 200
+    assert create_template(web, user).status_code == 302
+    page = web.get('/templates')
+    assert page.status_code == 200
+    assert 'Неделя' in page.get_data(as_text=True)
+
+def test_invalid_schedule_rejected(app, user, web):
+    response = web.post('/templates', data={'name': 'x', 'data': '{"slots": [{}]}'})
+    assert response.status_code == 302
+    assert 'Неверный формат' in web.get('/templates').get_data(as_text=True)
+
+def test_expand_template(app, user, web):
+    from app import db
+    from app.models import Template
+
+    create_template(web, user)
+    with app.app_context():
+        template_id = db.session.query(Template.id).scalar()
+
+    url = f'/api/my/templates/{template_id}/expand'
+    # 2025-10-06 - понедельник: две недели по два слота
+    preview = web.post(url, json={'from': '2025-10-06', 'to': '2025-10-19', 'dry_run': True}).get_json()
+    assert (preview['created'], len(preview['events'])) == (0, 4)
+    created = web.post(url, json={'from': '2025-10-06', 'to': '2025-10-19'})
+    assert (created.status_code, created.get_json()['created']) == (201, 4)
+    again = web.post(url, json={'from': '2025-10-06', 'to': '2025-10-19'}).get_json()
+    assert (again['created'], again['skipped']) == (0, 4)
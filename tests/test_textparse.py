@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+from app.textparse import parse_message
+
+NOW = datetime(2025, 10, 15, 18, 0)
+
+def test_ranges_and_durations():
+    entries = parse_message('вчера 9:00-10:30 пара; 11-12 обед, 40 мин спорт', NOW)
+    assert [(e.start_time, e.end_time, e.code) for e in entries] == [
+        (datetime(2025, 10, 14, 9, 0), datetime(2025, 10, 14, 10, 30), 'пара'),
+        (datetime(2025, 10, 14, 11, 0), datetime(2025, 10, 14, 12, 0), 'обед'),
+        (datetime(2025, 10, 14, 18, 0), datetime(2025, 10, 14, 18, 40), 'спорт'),
+    ]
+
+def test_range_over_midnight():
+    entry, = parse_message('23:00-1:00 сон', NOW)
+    assert entry.end_time == datetime(2025, 10, 16, 1, 0)
+
+@pytest.mark.parametrize('text, unexpected', [
+    ('100500', '"100500"'),
+    ('9-10 пара!', '"!"'),
+    ('спорт 40 мин; обед ?', 'Entry 2: unexpected "?"'),
+])
+def test_unknown_characters_rejected(text, unexpected):
+    with pytest.raises(ValueError, match=unexpected):
+        parse_message(text, NOW)
+
+@pytest.mark.parametrize('text', ['', ' ; ', '25:00-26:00 пара', '9-10 40 мин пара'])
+def test_invalid_messages(text):
+    with pytest.raises(ValueError):
+        parse_message(text, NOW)